@@ -1,35 +1,45 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-from typing import Dict, List, Any
-from services.qdrant_manager import QdrantManager
-from services.embeddings import create_embedding
+from typing import Dict, List, Any, Optional
+from services.qdrant_manager import QdrantManager, get_sync_client, match_filter, point_id_for
+from services.embeddings import create_embedding, get_clip_model, CLIP_BATCH_SIZE
+from services.embedding_cache import file_digest, get_image_cache
+from services.executors import run_io, run_inference, get_cpu_pool
+from services.document_render import pdf_info, render_pages
+from services.document_text import check_text_layer, has_templates, MATCH as TEXT_MATCH
+from services.perceptual_hash import get_perceptual_index, image_hashes
+from services.document_jobs import JobQueueFull, get_document_job_queue
+from services.upload_store import UploadRejected, get_upload_store
 import numpy as np
 EMBEDDING_SIZE = 384
-from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct
+from qdrant_client.models import PointStruct, HasIdCondition, OrderBy, Direction, SetPayload, SetPayloadOperation, QueryRequest
 import uuid
+import base64
 from datetime import datetime
 import logging
 import json
 import random
-import sys
 import os
-import torch
-import shutil
-from pathlib import Path
-from PIL import Image
-from pdf2image import convert_from_path
-from transformers import CLIPProcessor, CLIPModel
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-client = QdrantClient(host="localhost", port=6333)
 
 # Document fraud detection configuration
 DOCUMENT_COLLECTION_NAME = "document_risk_engine"
 FRAUD_THRESHOLD = 0.96 
 SUSPICION_THRESHOLD = 0.85
+# Subtracted from the visual score of a PDF whose text layer matches a
+# genuine template; the visual checks still run, text layers can be copied
+GENUINE_TEMPLATE_DISCOUNT = float(os.getenv("GENUINE_TEMPLATE_DISCOUNT", "0.05"))
+# Largest page returned by GET /applications
+MAX_PAGE_SIZE = 500
+# Largest batch accepted by POST /applications/update-outcomes
+MAX_BULK_UPDATES = 10000
+# Image cache variant for un-preprocessed document page vectors
+DOCUMENT_CACHE_VARIANT = "document"
+# Pages per CLIP pass / batched Qdrant query when scanning a PDF
+DOCUMENT_PAGE_BATCH = int(os.getenv("DOCUMENT_PAGE_BATCH", str(CLIP_BATCH_SIZE)))
 
 # Default locations used when creating credit history points
 # Populate with representative region names (including Tunisian cities)
@@ -40,22 +50,9 @@ LOCATIONS = [
     "Tataouine", "Zaghouan", "Beja", "Jendouba",
 ]
 
-# Load CLIP model for document analysis
-try:
-    clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-    clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-except Exception as e:
-    logger.warning(f"Could not load CLIP model for document analysis: {e}")
-    clip_model = None
-    clip_processor = None
-
-# Initialize Qdrant manager for fraud pattern storage
+# Shared Qdrant manager (async client); document checks run in worker threads and use get_sync_client()
 qdrant_manager = QdrantManager()
 
-# Upload directory configuration
-UPLOADS_DIR = os.path.join(os.path.dirname(__file__), '../../uploads')
-os.makedirs(UPLOADS_DIR, exist_ok=True)
-
 class ApplicationSubmission(BaseModel):
     applicant: Dict[str, Any]
     documents: List[str] = []
@@ -65,10 +62,12 @@ class ApplicationResponse(BaseModel):
     status: str
     message: str
     created_point: Dict[str, Any] = {}
+    document_job_id: Optional[str] = None
 
 class ApplicationListResponse(BaseModel):
     applications: List[Dict[str, Any]] = []
     total: int = 0
+    next_cursor: Optional[str] = None
 
 class CreditHistorySubmission(BaseModel):
     name: str
@@ -86,38 +85,170 @@ class OutcomeUpdateRequest(BaseModel):
     outcome: str
     actual_outcome: str
 
+class BulkOutcomeUpdateRequest(BaseModel):
+    updates: List[OutcomeUpdateRequest]
 
-def get_document_vector(image):
-    """Converts a PIL Image object into a normalized 512-dim vector using CLIP."""
+
+def load_document_model():
+    """Return the shared (model, processor) CLIP pair, or (None, None) if it cannot be loaded."""
+    try:
+        return get_clip_model()
+    except Exception as e:
+        logger.warning(f"Could not load CLIP model for document analysis: {e}")
+        return None, None
+
+
+def get_document_vectors(images) -> Optional[np.ndarray]:
+    """Converts PIL images into normalized 512-dim CLIP vectors in one forward pass.
+
+    Runs on whichever backend INFERENCE_BACKEND selects (torch or ONNX Runtime).
+    Returns a (len(images), 512) float32 array, or None if CLIP is unavailable.
+    """
+    import torch
+
+    clip_model, clip_processor = load_document_model()
     if clip_model is None or clip_processor is None:
         return None
     
-    inputs = clip_processor(images=image, return_tensors="pt")
+    inputs = clip_processor(images=images, return_tensors="pt")
     with torch.no_grad():
         output = clip_model.get_image_features(**inputs)
     
     # Extract tensor from output object if needed
     image_features = output.pooler_output if hasattr(output, 'pooler_output') else output
     
-    # Ensure it's a tensor and normalize
+    # Ensure it's a tensor and normalize for Cosine Similarity
     if not isinstance(image_features, torch.Tensor):
         image_features = torch.tensor(image_features)
-    
-    # Normalize for Cosine Similarity
-    return image_features / image_features.norm(p=2, dim=-1, keepdim=True)
+    image_features = image_features / image_features.norm(p=2, dim=-1, keepdim=True)
+    return image_features.detach().cpu().numpy().astype(np.float32)
+
+
+def get_document_vector(image):
+    """Converts a PIL Image object into a normalized (1, 512) CLIP vector."""
+    vectors = get_document_vectors([image])
+    return None if vectors is None else vectors[:1]
+
+
+def _page_cache_variant(page: int) -> str:
+    # Page 1 keeps the original single-page variant so existing entries stay valid
+    return DOCUMENT_CACHE_VARIANT if page == 1 else f"{DOCUMENT_CACHE_VARIANT}:p{page}"
+
+
+def _risk_level(score: float) -> str:
+    if score >= FRAUD_THRESHOLD:
+        return "fraud"
+    if score >= SUSPICION_THRESHOLD:
+        return "suspicious"
+    return "safe"
+
+
+def _page_vectors(file_path: str, digest: str, pages: List[int], is_pdf: bool, info: Optional[Dict[str, Any]] = None):
+    """CLIP vectors for a run of pages, from the image cache or one batched render + forward pass
+
+    `info` is the PDF's pdf_info(), reused for the render DPI.
+
+    Every page is checked against the perceptual-hash index first, with its
+    hashes cached next to its vector so cached pages are not re-rendered;
+    returns (None, (page, match)) when one is a known fake, so CLIP never
+    runs for it. Otherwise returns (vectors or None, None).
+    """
+    image_cache = get_image_cache()
+    variants = [_page_cache_variant(page) for page in pages]
+    vectors = [image_cache.get(digest, variant) for variant in variants]
+    hashes = [image_cache.get_hashes(digest, variant) for variant in variants]
+    # Pages cached before their hashes were stored are rendered once to hash them
+    to_render = [page for page, vector, page_hashes in zip(pages, vectors, hashes)
+                 if vector is None or page_hashes is None]
+    images = {}
+    if to_render:
+        if is_pdf:
+            # Rasterize in the process pool; only these pages are rendered (cached by digest)
+            rendered = get_cpu_pool().submit(render_pages, file_path, to_render, digest=digest, info=info).result()
+        else:
+            from PIL import Image
+            with Image.open(file_path) as img:
+                rendered = [img.convert("RGB")]
+        images = dict(zip(to_render, rendered))
+
+    phash_index = get_perceptual_index()
+    for i, page in enumerate(pages):
+        if hashes[i] is None:
+            hashes[i] = image_hashes(images[page])
+            if vectors[i] is not None:
+                image_cache.put_hashes(digest, variants[i], hashes[i])
+        match = phash_index.match_hashes(hashes[i])
+        if match is not None:
+            return None, (page, match)
+
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        fresh = get_document_vectors([images[pages[i]] for i in missing])
+        if fresh is None:
+            return None, None
+        for i, vector in zip(missing, fresh):
+            image_cache.put(digest, variants[i], vector)
+            image_cache.put_hashes(digest, variants[i], hashes[i])
+            vectors[i] = vector
+    return np.stack(vectors).astype(np.float32), None
+
+
+def _hash_match_result(page: int, match: Dict[str, Any], page_count: int) -> Dict[str, Any]:
+    """Verdict for a page that is a near-exact copy of a known fake"""
+    where = f" on page {page}" if page_count > 1 else ""
+    logger.warning(f"Known fake matched by perceptual hash{where}: {match.get('filename')} "
+                   f"(pHash distance {match['phash_distance']}, dHash distance {match['dhash_distance']})")
+    return {
+        "forged": True,
+        "reason": f"Document{where} is a near-exact copy of known fraud pattern {match.get('filename') or match['id']}",
+        "risk_level": "fraud",
+        "indicators": ["visual_match_to_fake", "perceptual_hash_match"],
+        "score": 1.0,
+        "pages": [{"page": page, "score": 1.0, "risk_level": "fraud"}],
+        "page_count": page_count,
+        "pages_scanned": page,
+        "matched_pattern": match.get("filename"),
+        "hash_distance": {"phash": match["phash_distance"], "dhash": match["dhash_distance"]}
+    }
+
+
+def _fraud_template_result(text_check: Dict[str, Any]) -> Dict[str, Any]:
+    """Verdict for a PDF whose text layer fully matches a registered fraud template"""
+    template = text_check["template"]
+    logger.warning(f"Document text layer matches known fraud template {template}")
+    return {
+        "forged": True,
+        "reason": f"Text layer matches known fraud template '{template}'",
+        "risk_level": "fraud",
+        "indicators": ["known_fraud_template"],
+        "score": 1.0,
+        "text_layer": TEXT_MATCH,
+        "template": template
+    }
 
 
 def analyze_document(file_path: str) -> Dict[str, Any]:
-    """Analyzes a document for fraud by comparing against known fake patterns.
+    """Analyzes a document for fraud by comparing every page against known fake patterns.
+    
+    When templates are registered, born-digital PDFs are first checked by their
+    text layer (services.document_text): a full match with a fraud template is
+    decided at once, a match with a genuine template lowers the visual score by
+    GENUINE_TEMPLATE_DISCOUNT but the hash and visual checks still run.
+    Pages are embedded and queried DOCUMENT_PAGE_BATCH at a time (one CLIP pass
+    and one batched Qdrant request per batch); the scan stops at the first
+    batch containing a page at or above FRAUD_THRESHOLD.
     
     Returns dict with keys:
     - forged: bool (True if high confidence fraud detected)
     - reason: str (explanation)
     - indicators: list (fraud indicators)
     - risk_level: str ('safe', 'suspicious', or 'fraud')
-    - score: float (similarity score to nearest fraud pattern)
+    - score: float (highest similarity to a fraud pattern over scanned pages)
+    - pages: list of per-page {page, score, risk_level}
+    - page_count / pages_scanned: int
     """
     
+    clip_model, clip_processor = load_document_model()
     if clip_model is None or clip_processor is None:
         logger.warning("Document analysis unavailable (CLIP model not loaded)")
         return {"forged": False, "reason": "document analysis unavailable", "risk_level": "unknown", "indicators": [], "score": 0}
@@ -125,61 +256,102 @@ def analyze_document(file_path: str) -> Dict[str, Any]:
     logger.info(f"Analyzing document: {file_path}")
     
     try:
-        # Handle PDF or Image
-        if file_path.lower().endswith('.pdf'):
+        # Repeat uploads of the same file skip rendering and CLIP entirely
+        digest = file_digest(file_path)
+        is_pdf = file_path.lower().endswith('.pdf')
+        text_check = None
+        info = None
+        if is_pdf:
+            if has_templates():
+                try:
+                    text_check = get_cpu_pool().submit(check_text_layer, file_path).result()
+                except Exception as e:
+                    logger.warning(f"Text layer check failed: {e}")
+            if text_check and text_check["status"] == TEXT_MATCH and text_check["verdict"] == "fraud":
+                return _fraud_template_result(text_check)
             try:
-                poppler_path = os.path.join(os.path.dirname(__file__), '../../doc_check/poppler-25.12.0/Library/bin')
-                images = convert_from_path(file_path, poppler_path=poppler_path)
-                query_img = images[0]
+                info = get_cpu_pool().submit(pdf_info, file_path).result()
+                page_count = info["pages"]
             except Exception as e:
-                logger.error(f"Could not convert PDF: {e}")
+                logger.error(f"Could not read PDF: {e}")
                 return {"forged": False, "reason": f"PDF processing error: {e}", "risk_level": "unknown", "indicators": [], "score": 0}
         else:
-            query_img = Image.open(file_path)
-        
-        # Vectorize the document
-        query_vector = get_document_vector(query_img)
-        if query_vector is None:
-            return {"forged": False, "reason": "vectorization failed", "risk_level": "unknown", "indicators": [], "score": 0}
+            page_count = 1
         
-        query_vector = query_vector[0].tolist()
+        # Genuine template match: text layer and fonts agree with a real document
+        genuine_template = text_check["template"] if text_check and text_check["status"] == TEXT_MATCH else None
+        discount = GENUINE_TEMPLATE_DISCOUNT if genuine_template else 0.0
         
-        # Search for similar fraud patterns using qdrant_manager
-        try:
-            hits = qdrant_manager.client.query_points(
-                collection_name=DOCUMENT_COLLECTION_NAME,
-                query=query_vector,
-                limit=3
-            )
-        except Exception as e:
-            logger.error(f"Failed to query fraud patterns: {e}")
-            return {"forged": False, "reason": "database query failed", "risk_level": "unknown", "indicators": [], "score": 0}
+        page_scores = []
+        for start in range(1, page_count + 1, DOCUMENT_PAGE_BATCH):
+            pages = list(range(start, min(start + DOCUMENT_PAGE_BATCH, page_count + 1)))
+            try:
+                vectors, hash_match = _page_vectors(file_path, digest, pages, is_pdf, info)
+            except Exception as e:
+                logger.error(f"Could not render pages {pages[0]}-{pages[-1]}: {e}")
+                return {"forged": False, "reason": f"PDF processing error: {e}", "risk_level": "unknown", "indicators": [], "score": 0}
+            if hash_match is not None:
+                return _hash_match_result(hash_match[0], hash_match[1], page_count)
+            if vectors is None:
+                return {"forged": False, "reason": "vectorization failed", "risk_level": "unknown", "indicators": [], "score": 0}
+            
+            # One batched search for every page in this run
+            try:
+                responses = get_sync_client().query_batch_points(
+                    collection_name=DOCUMENT_COLLECTION_NAME,
+                    requests=[QueryRequest(query=vector.tolist(), limit=1) for vector in vectors]
+                )
+            except Exception as e:
+                logger.error(f"Failed to query fraud patterns: {e}")
+                return {"forged": False, "reason": "database query failed", "risk_level": "unknown", "indicators": [], "score": 0}
+            
+            for page, response in zip(pages, responses):
+                if response.points:
+                    score = max(0.0, response.points[0].score - discount)
+                    page_scores.append({"page": page, "score": score, "risk_level": _risk_level(score)})
+            
+            if any(p["score"] >= FRAUD_THRESHOLD for p in page_scores):
+                break
         
-        if not hits or not hits.points:
+        if not page_scores:
             logger.info("No fraud patterns found in database")
             return {"forged": False, "reason": "no reference patterns available", "risk_level": "safe", "indicators": [], "score": 0}
         
-        top_match = hits.points[0]
-        score = top_match.score
+        worst = max(page_scores, key=lambda p: p["score"])
+        score = worst["score"]
+        page_info = {
+            "pages": page_scores,
+            "page_count": page_count,
+            "pages_scanned": max(p["page"] for p in page_scores),
+            "text_layer": text_check["status"] if text_check else None
+        }
+        if genuine_template:
+            page_info["template"] = genuine_template
+        # Labels of a known template but different fonts/producer: likely edited
+        partial_template = text_check.get("partial") if text_check else None
+        where = f" on page {worst['page']}" if page_count > 1 else ""
         
         # Decision logic
         if score >= FRAUD_THRESHOLD:
-            logger.warning(f"High risk fraud detected: {score:.4f}")
+            logger.warning(f"High risk fraud detected{where}: {score:.4f}")
             return {
                 "forged": True,
-                "reason": f"Visual structure is {score*100:.1f}% identical to known fraud pattern",
+                "reason": f"Visual structure{where} is {score*100:.1f}% identical to known fraud pattern",
                 "risk_level": "fraud",
                 "indicators": ["visual_match_to_fake", "high_similarity"],
-                "score": score
+                "score": score,
+                **page_info
             }
         elif score >= SUSPICION_THRESHOLD:
-            logger.warning(f"Suspicious document detected: {score:.4f}")
+            logger.warning(f"Suspicious document detected{where}: {score:.4f}")
             return {
                 "forged": False,
-                "reason": f"Document layout matches known fakes but with variance (similarity: {score:.4f})",
+                "reason": f"Document layout{where} matches known fakes but with variance (similarity: {score:.4f})",
                 "risk_level": "suspicious",
-                "indicators": ["layout_similarity", "requires_review"],
-                "score": score
+                "indicators": ["layout_similarity", "requires_review"] + (["template_fonts_changed"] if partial_template else [])
+                              + (["known_genuine_template"] if genuine_template else []),
+                "score": score,
+                **page_info
             }
         else:
             logger.info(f"Document passed fraud check: {score:.4f}")
@@ -187,8 +359,10 @@ def analyze_document(file_path: str) -> Dict[str, Any]:
                 "forged": False,
                 "reason": "Document layout is distinct from known fraud patterns",
                 "risk_level": "safe",
-                "indicators": [],
-                "score": score
+                "indicators": (["template_fonts_changed"] if partial_template else [])
+                              + (["known_genuine_template"] if genuine_template else []),
+                "score": score,
+                **page_info
             }
             
     except Exception as e:
@@ -256,11 +430,11 @@ def document_check_placeholder(documents: List[str], applicant: Dict[str, Any] =
                             fraud_vector_list = fraud_vector_list[:EMBEDDING_SIZE]
                     
                     # Create fraud point
-                    fraud_point_id = int(datetime.utcnow().timestamp() * 1000000) % (2**31 - 1)
+                    fraud_point_id = point_id_for(fraud_id)
                     fraud_point = PointStruct(id=fraud_point_id, payload=fraud_payload, vector=fraud_vector_list)
                     
                     # Upsert to fraud_patterns collection
-                    client.upsert(collection_name="fraud_patterns", points=[fraud_point])
+                    get_sync_client().upsert(collection_name="fraud_patterns", points=[fraud_point])
                     logger.info(f"Created fraud pattern point: fraud_id={fraud_id}, score={result.get('score', 0):.4f}")
                     
                 except Exception as e:
@@ -284,33 +458,24 @@ def document_check_placeholder(documents: List[str], applicant: Dict[str, Any] =
 
 
 @router.post("/applications/upload-documents")
-async def upload_documents(files: List[UploadFile] = File(...)):
-    """Upload documents and return their saved file paths."""
+async def upload_documents(request: Request):
+    """Upload documents (multipart form, any file field) and return their stored file paths."""
     try:
-        uploaded_paths = []
-        
-        for file in files:
-            # Generate unique filename to avoid conflicts
-            file_ext = Path(file.filename).suffix
-            unique_filename = f"{uuid.uuid4().hex}_{file.filename}"
-            file_path = os.path.join(UPLOADS_DIR, unique_filename)
-            
-            # Save file to disk
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            uploaded_paths.append({
-                "original_name": file.filename,
-                "saved_name": unique_filename,
-                "path": file_path
-            })
-            logger.info(f"Document uploaded: {unique_filename}")
-        
+        uploaded_paths, _ = await get_upload_store().save_request(request)
+        if not uploaded_paths:
+            raise HTTPException(status_code=422, detail="At least one file is required")
+        for entry in uploaded_paths:
+            logger.info(f"Document uploaded: {entry['saved_name']}{' (duplicate)' if entry['duplicate'] else ''}")
+
         return {
             "status": "success",
             "count": len(uploaded_paths),
             "files": uploaded_paths
         }
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"File upload failed: {e}")
         raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
@@ -320,54 +485,22 @@ async def upload_documents(files: List[UploadFile] = File(...)):
 async def check_application_status(client_id: str):
     """Check the status of an application by client_id from credit_history_memory."""
     try:
-        # Scroll through credit_history_memory to find the client
-        offset = 0
-        batch_size = 1000
-        max_iterations = 100
-        iterations = 0
-
-        while iterations < max_iterations:
-            iterations += 1
-            try:
-                batch, next_offset = client.scroll(
-                    collection_name="credit_history_memory",
-                    limit=batch_size,
-                    offset=offset,
-                    with_payload=True,
-                    with_vectors=False
-                )
-            except Exception as e:
-                logger.error(f"Failed to scroll credit_history_memory: {e}")
-                break
-
-            if not batch:
-                break
-
-            for point in batch:
-                try:
-                    payload = getattr(point, 'payload', {})
-                    if not payload:
-                        continue
-                    
-                    cid = payload.get('client_id')
-                    if cid == client_id:
-                        # Found the client, return their status
-                        return {
-                            'client_id': client_id,
-                            'status': payload.get('outcome') or payload.get('status') or 'pending',
-                            'outcome': payload.get('outcome') or 'pending',
-                            'rejection_reason': payload.get('actual_outcome') if payload.get('outcome') == 'rejected' else None
-                        }
-                except Exception:
-                    continue
-
-            if next_offset == offset or len(batch) < batch_size:
-                break
-
-            offset = next_offset
+        points = await qdrant_manager.client.retrieve(
+            collection_name="credit_history_memory",
+            ids=[point_id_for(client_id)],
+            with_payload=True,
+            with_vectors=False
+        )
+        if not points:
+            raise HTTPException(status_code=404, detail=f"Client {client_id} not found")
 
-        # Client not found
-        raise HTTPException(status_code=404, detail=f"Client {client_id} not found")
+        payload = points[0].payload or {}
+        return {
+            'client_id': client_id,
+            'status': payload.get('outcome') or payload.get('status') or 'pending',
+            'outcome': payload.get('outcome') or 'pending',
+            'rejection_reason': payload.get('actual_outcome') if payload.get('outcome') == 'rejected' else None
+        }
     except HTTPException:
         raise
     except Exception as e:
@@ -375,125 +508,116 @@ async def check_application_status(client_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _encode_cursor(date: str, ids: List[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"date": date, "ids": ids}).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        after = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not after.get("date") or not isinstance(after.get("ids"), list):
+            raise ValueError("missing fields")
+        return after
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @router.get("/applications", response_model=ApplicationListResponse)
-async def get_applications(client_id: str = None, limit: int = 50):
-    """Fetch recent applications from `credit_history_memory` where payload.outcome == 'pending'."""
+async def get_applications(client_id: str = None, limit: int = 50, cursor: str = None):
+    """Page through pending applications in `credit_history_memory`, newest first.
+
+    Pass `next_cursor` from the previous page as `cursor` to continue.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    after = _decode_cursor(cursor) if cursor else None
     try:
-        applications = []
-        offset = 0
-        batch_size = 1000
-        max_iterations = 100
-        iterations = 0
+        conditions = {'outcome': 'pending'}
+        if client_id:
+            conditions['client_id'] = client_id
+        pending_filter = match_filter(**conditions)
+        total = (await qdrant_manager.client.count(
+            collection_name="credit_history_memory",
+            count_filter=pending_filter,
+            exact=True
+        )).count
+
+        # Ordering by date is inclusive of start_from, so skip the ids
+        # already returned at the boundary date
+        if after:
+            pending_filter.must_not = [HasIdCondition(has_id=after["ids"])]
+        page, _ = await qdrant_manager.client.scroll(
+            collection_name="credit_history_memory",
+            scroll_filter=pending_filter,
+            limit=limit,
+            order_by=OrderBy(key="date", direction=Direction.DESC, start_from=after["date"] if after else None),
+            with_payload=True,
+            with_vectors=False
+        )
 
-        while iterations < max_iterations:
-            iterations += 1
+        # T0 snapshots for the whole page in one request
+        snapshots = {}
+        if page:
             try:
-                batch, next_offset = client.scroll(
-                    collection_name="credit_history_memory",
-                    limit=batch_size,
-                    offset=offset,
+                t0_points = await qdrant_manager.client.retrieve(
+                    collection_name='temporal_risk_memory',
+                    ids=[point_id_for(point.payload.get('client_id'), 'T0_application') for point in page],
                     with_payload=True,
                     with_vectors=False
                 )
+                snapshots = {tpoint.payload.get('client_id'): tpoint for tpoint in t0_points if tpoint.payload}
             except Exception as e:
-                logger.error(f"Failed to scroll credit_history_memory: {e}")
-                break
-
-            if not batch:
-                break
+                logger.debug(f"Temporal lookup failed: {e}")
 
-            for point in batch:
-                try:
-                    payload = getattr(point, 'payload', {})
-                    if not payload:
-                        continue
-                    # Only include pending outcomes
-                    if payload.get('outcome') != 'pending':
-                        continue
-
-                    cid = payload.get('client_id')
-                    if client_id and cid != client_id:
-                        continue
-
-                    # Map to legacy application response shape expected by frontend
-                    debt_ratio = payload.get('debt_ratio')
-                    income_stability = payload.get('income_stability')
-                    payment_regularity = payload.get('payment_regularity')
-
-                    # Compute fallback risk_score if not present in credit_history point
-                    try:
-                        if payload.get('risk_score') is not None:
-                            risk_score = payload.get('risk_score')
-                        else:
-                            dr = float(debt_ratio) if debt_ratio is not None else 0.0
-                            inc = float(income_stability) if income_stability is not None else 0.0
-                            pay = float(payment_regularity) if payment_regularity is not None else 0.0
-                            risk_score = round(dr * 0.6 + (1 - inc) * 0.2 + (1 - pay) * 0.2, 3)
-                    except Exception:
-                        risk_score = payload.get('risk_score')
+        applications = []
+        for point in page:
+            payload = point.payload or {}
+            cid = payload.get('client_id')
 
-                    # Attempt to find matching T0 point in temporal_risk_memory to get authoritative date and risk_score and use its id
-                    temporal_date = None
-                    temporal_risk = None
-                    temporal_id = None
-                    try:
-                        t_offset = 0
-                        t_batch_size = 500
-                        t_iters = 0
-                        while t_iters < 20:
-                            t_iters += 1
-                            t_batch, t_next = client.scroll(
-                                collection_name='temporal_risk_memory',
-                                limit=t_batch_size,
-                                offset=t_offset,
-                                with_payload=True,
-                                with_vectors=False
-                            )
-                            if not t_batch:
-                                break
-                            for tpoint in t_batch:
-                                t_payload = getattr(tpoint, 'payload', {}) or {}
-                                if t_payload.get('client_id') == cid and str(t_payload.get('timestamp', '')).startswith('T0'):
-                                    temporal_date = t_payload.get('date')
-                                    temporal_risk = t_payload.get('risk_score')
-                                    temporal_id = getattr(tpoint, 'id', None)
-                                    break
-                            if temporal_id is not None:
-                                break
-                            if t_next == t_offset or len(t_batch) < t_batch_size:
-                                break
-                            t_offset = t_next
-                    except Exception as e:
-                        logger.debug(f"Temporal lookup failed for {cid}: {e}")
-
-                    # Prefer temporal values if found
-                    final_date = temporal_date or (payload.get('date') or payload.get('created_at') or None)
-                    final_risk = temporal_risk if temporal_risk is not None else risk_score
-                    final_id = temporal_id or getattr(point, 'id', None)
-
-                    applications.append({
-                        'id': final_id,
-                        'client_id': cid,
-                        'timestamp': payload.get('timestamp', 'T0_application'),
-                        'date': final_date,
-                        'risk_score': final_risk,
-                        'status': payload.get('status') or payload.get('outcome') or 'pending',
-                        'debt_ratio': debt_ratio,
-                        'income_stability': income_stability,
-                        'payment_regularity': payment_regularity
-                    })
-                except Exception:
-                    continue
-
-            if next_offset == offset or len(batch) < batch_size:
-                break
+            # Map to legacy application response shape expected by frontend
+            debt_ratio = payload.get('debt_ratio')
+            income_stability = payload.get('income_stability')
+            payment_regularity = payload.get('payment_regularity')
 
-            offset = next_offset
+            # Compute fallback risk_score if not present in credit_history point
+            try:
+                if payload.get('risk_score') is not None:
+                    risk_score = payload.get('risk_score')
+                else:
+                    dr = float(debt_ratio) if debt_ratio is not None else 0.0
+                    inc = float(income_stability) if income_stability is not None else 0.0
+                    pay = float(payment_regularity) if payment_regularity is not None else 0.0
+                    risk_score = round(dr * 0.6 + (1 - inc) * 0.2 + (1 - pay) * 0.2, 3)
+            except Exception:
+                risk_score = payload.get('risk_score')
+
+            # Prefer the T0 snapshot's date, risk_score and id when present
+            tpoint = snapshots.get(cid)
+            t_payload = tpoint.payload if tpoint is not None else {}
+            final_date = t_payload.get('date') or payload.get('date') or payload.get('created_at')
+            final_risk = t_payload.get('risk_score') if t_payload.get('risk_score') is not None else risk_score
+            final_id = tpoint.id if tpoint is not None else point.id
+
+            applications.append({
+                'id': final_id,
+                'client_id': cid,
+                'timestamp': payload.get('timestamp', 'T0_application'),
+                'date': final_date,
+                'risk_score': final_risk,
+                'status': payload.get('status') or payload.get('outcome') or 'pending',
+                'debt_ratio': debt_ratio,
+                'income_stability': income_stability,
+                'payment_regularity': payment_regularity
+            })
 
-        # Sort by id descending as a proxy for recency
-        applications.sort(key=lambda x: x.get('id') or 0, reverse=True)
+        next_cursor = None
+        if len(page) == limit:
+            last_date = page[-1].payload.get('date')
+            boundary_ids = [point.id for point in page if point.payload.get('date') == last_date]
+            if after and after["date"] == last_date:
+                boundary_ids += after["ids"]
+            next_cursor = _encode_cursor(last_date, boundary_ids)
 
-        return ApplicationListResponse(applications=applications[:limit], total=len(applications))
+        return ApplicationListResponse(applications=applications, total=total, next_cursor=next_cursor)
     except Exception as e:
         logger.error(f"Failed to fetch applications: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -535,7 +659,7 @@ async def submit_application(request: ApplicationSubmission):
                 'payment_regularity': payment_regularity,
                 'monthly_income': float(applicant.get('monthly_income', 0))
             }
-            vector = create_embedding(temp_data)
+            vector = await run_inference(create_embedding, temp_data)
             # normalize if numpy array
             try:
                 vector = np.array(vector)
@@ -551,7 +675,7 @@ async def submit_application(request: ApplicationSubmission):
                     logger.warning(f"Embedding length {len(vector_list)} != {EMBEDDING_SIZE}, attempting fallback using full applicant data")
                     # Try fallback embedding using full applicant dict
                     try:
-                        fb_vector = create_embedding(applicant)
+                        fb_vector = await run_inference(create_embedding, applicant)
                         fb_vector = np.array(fb_vector)
                         norm = np.linalg.norm(fb_vector)
                         if norm > 0:
@@ -583,8 +707,7 @@ async def submit_application(request: ApplicationSubmission):
             vector_list = [0.0] * EMBEDDING_SIZE
 
         # Upsert point into temporal_risk_memory
-        # Use integer point id (temporal points in populate_qdrant use integer ids)
-        point_id = int(datetime.utcnow().timestamp() * 1000)
+        point_id = point_id_for(client_id, payload["timestamp"])
         payload["client_id"] = client_id
         point = PointStruct(id=point_id, payload=payload, vector=vector_list)
 
@@ -601,24 +724,36 @@ async def submit_application(request: ApplicationSubmission):
         logger.info(f"Upserting temporal point id={point_id} client_id={client_id} vector_len={v_len}")
 
         try:
-            client.upsert(collection_name="temporal_risk_memory", points=[point])
+            await qdrant_manager.client.upsert(collection_name="temporal_risk_memory", points=[point])
         except Exception as e:
             # Some qdrant-client versions use upsert_points
             logger.error(f"Upsert failed (first attempt): {e}")
             try:
-                client.upsert_points(collection_name="temporal_risk_memory", points=[point])
+                await qdrant_manager.client.upsert_points(collection_name="temporal_risk_memory", points=[point])
             except Exception as e2:
                 logger.error(f"Upsert failed (fallback attempt): {e2}")
                 raise HTTPException(status_code=500, detail=f"Failed to store application point: {e2}")
 
         # Run document check and create fraud patterns if needed
-        doc_result = document_check_placeholder(request.documents, applicant)
+        # Document checks run in the background; poll /applications/{client_id}/document-checks
+        job_id = None
+        if request.documents:
+            try:
+                # The job row is a SQLite INSERT, so keep it off the event loop
+                queue = get_document_job_queue()
+                job_id = await run_io(
+                    queue.submit, client_id, request.documents, document_check_placeholder, applicant
+                )
+            except JobQueueFull as e:
+                # Point ids are derived from client_id, so resubmitting is safe
+                raise HTTPException(status_code=503, detail=f"Document check queue is full, retry later: {e}")
 
         return ApplicationResponse(
             client_id=client_id,
             status="submitted",
             message="Application received and stored.",
-            created_point=payload
+            created_point=payload,
+            document_job_id=job_id
         )
     except HTTPException:
         raise
@@ -627,76 +762,40 @@ async def submit_application(request: ApplicationSubmission):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/applications/{client_id}/document-checks")
+async def get_document_checks(client_id: str, job_id: str = None):
+    """Status and results of a client's background document checks, newest first."""
+    queue = get_document_job_queue()
+    if job_id:
+        job = await run_io(queue.get, job_id)
+        if not job or job["client_id"] != client_id:
+            raise HTTPException(status_code=404, detail=f"Document check {job_id} not found")
+        return job
+    jobs = await run_io(queue.for_client, client_id)
+    return {"client_id": client_id, "jobs": jobs}
+
+
 @router.post("/applications/update-outcome", response_model=Dict[str, Any])
 async def update_outcome(request: OutcomeUpdateRequest):
     """Update application outcome in credit_history_memory."""
     try:
-        # Get all points and find the one with matching client_id
-        all_points = []
-        offset = 0
-        batch_size = 1000
-        
-        while True:
-            batch, next_offset = client.scroll(
-                collection_name="credit_history_memory",
-                limit=batch_size,
-                offset=offset,
-                with_payload=True,
-                with_vectors=True
-            )
-            if not batch:
-                break
-            all_points.extend(batch)
-            if next_offset == offset or len(batch) < batch_size:
-                break
-            offset = next_offset
-        
-        # Find point with matching client_id
-        target_point = None
-        for point in all_points:
-            if point.payload.get('client_id') == request.client_id:
-                target_point = point
-                break
-        
-        if not target_point:
+        point_id = point_id_for(request.client_id)
+        points = await qdrant_manager.client.retrieve(
+            collection_name="credit_history_memory",
+            ids=[point_id],
+            with_payload=False,
+            with_vectors=False
+        )
+        if not points:
             raise HTTPException(status_code=404, detail=f"Client {request.client_id} not found")
-        
-        # Update payload
-        target_point.payload['outcome'] = request.outcome
-        target_point.payload['actual_outcome'] = request.actual_outcome
-        
-        # Convert scrolled Record into PointStruct for upsert
-        try:
-            vec = None
-            # Record may have attribute 'vector' or 'vectors'
-            if hasattr(target_point, 'vector'):
-                vec = getattr(target_point, 'vector')
-            elif hasattr(target_point, 'vectors'):
-                vec = getattr(target_point, 'vectors')
-
-            upsert_point = PointStruct(
-                id=getattr(target_point, 'id', None),
-                payload=getattr(target_point, 'payload', {}),
-                vector=vec
-            )
 
-            client.upsert(
-                collection_name="credit_history_memory",
-                points=[upsert_point]
-            )
-        except Exception as e:
-            # Fallback: try to build a dict payload accepted by the client
-            try:
-                point_dict = {
-                    'id': getattr(target_point, 'id', None),
-                    'payload': getattr(target_point, 'payload', {}),
-                    'vector': getattr(target_point, 'vector', None) or getattr(target_point, 'vectors', None)
-                }
-                client.upsert(collection_name="credit_history_memory", points=[point_dict])
-            except Exception as e2:
-                logger.error(f"Failed to upsert updated point: {e2}")
-                raise
-        
+        # Partial payload update: the vector and other fields stay in place
+        await qdrant_manager.client.set_payload(
+            collection_name="credit_history_memory",
+            payload={'outcome': request.outcome, 'actual_outcome': request.actual_outcome},
+            points=[point_id]
+        )
+
         logger.info(f"Updated {request.client_id}: outcome={request.outcome}, actual_outcome={request.actual_outcome}")
         
         return {
@@ -705,11 +804,61 @@ async def update_outcome(request: OutcomeUpdateRequest):
             'outcome': request.outcome,
             'actual_outcome': request.actual_outcome
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to update outcome: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/applications/update-outcomes", response_model=Dict[str, Any])
+async def update_outcomes(request: BulkOutcomeUpdateRequest):
+    """Apply many outcome decisions in credit_history_memory with one batched update."""
+    if len(request.updates) > MAX_BULK_UPDATES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_UPDATES} updates per call")
+    try:
+        # Last decision wins for a repeated client_id
+        decisions = {u.client_id: (u.outcome, u.actual_outcome) for u in request.updates}
+        ids = {point_id_for(cid): cid for cid in decisions}
+
+        existing = await qdrant_manager.client.retrieve(
+            collection_name="credit_history_memory",
+            ids=list(ids),
+            with_payload=False,
+            with_vectors=False
+        )
+        found = {ids[str(point.id)] for point in existing}
+        not_found = [cid for cid in decisions if cid not in found]
+
+        # One set_payload operation per distinct decision, all in one request
+        groups: Dict[tuple, List[str]] = {}
+        for cid in found:
+            groups.setdefault(decisions[cid], []).append(point_id_for(cid))
+        operations = [
+            SetPayloadOperation(set_payload=SetPayload(
+                payload={'outcome': outcome, 'actual_outcome': actual_outcome},
+                points=point_ids
+            ))
+            for (outcome, actual_outcome), point_ids in groups.items()
+        ]
+        if operations:
+            await qdrant_manager.client.batch_update_points(
+                collection_name="credit_history_memory",
+                update_operations=operations
+            )
+
+        logger.info(f"Bulk outcome update: {len(found)} updated, {len(not_found)} not found")
+
+        return {
+            'status': 'success',
+            'updated': len(found),
+            'not_found': not_found
+        }
+    except Exception as e:
+        logger.error(f"Failed to update outcomes: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/applications/add-to-credit-history", response_model=Dict[str, Any])
 async def add_to_credit_history(request: CreditHistorySubmission):
     """Create a 384-dim vector point in credit_history_memory with pending outcomes and random location."""
@@ -727,7 +876,7 @@ async def add_to_credit_history(request: CreditHistorySubmission):
             'monthly_income': request.monthly_income
         }
         
-        vector = create_embedding(applicant_data)
+        vector = await run_inference(create_embedding, applicant_data)
         vector = np.array(vector)
         norm = np.linalg.norm(vector)
         if norm > 0:
@@ -757,15 +906,15 @@ async def add_to_credit_history(request: CreditHistorySubmission):
             'outcome': 'pending',
             'actual_outcome': 'pending',
             'location': random.choice(LOCATIONS),
+            'date': datetime.utcnow().isoformat(),
             'social_network': '[]'  # Empty social network for new applicant
         }
         
-        # Use timestamp-based id for uniqueness
-        point_id = int(datetime.utcnow().timestamp() * 1000000) % (2**31 - 1)
+        point_id = point_id_for(client_id)
         point = PointStruct(id=point_id, vector=vector_list, payload=payload)
         
         # Upsert into credit_history_memory
-        client.upsert(collection_name="credit_history_memory", points=[point])
+        await qdrant_manager.client.upsert(collection_name="credit_history_memory", points=[point])
         logger.info(f"✅ Created credit history point id={point_id} client_id={client_id} location={payload['location']}")
         
         return {
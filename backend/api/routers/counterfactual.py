@@ -2,15 +2,16 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Dict, List, Any
 from services.qdrant_manager import QdrantManager
-from services.embeddings import create_embedding
+from services.batching import embed_client
 from services.credit_oracle import get_oracle
-import numpy as np
+from services.executors import run_io
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-qdrant = QdrantManager(host="localhost", port=6333)
+qdrant = QdrantManager()
 
 class CounterfactualRequest(BaseModel):
     original_client: Dict[str, Any]
@@ -113,14 +114,22 @@ async def analyze_counterfactual(request: CounterfactualRequest):
     What-if analysis: How would changes affect credit decision?
     """
     try:
-        # Create embedding for original client
-        original_vector = create_embedding(request.original_client)
+        # Apply modifications
+        modified_client = apply_modifications(request.original_client, request.modifications)
+        
+        # Embed original and modified clients in the same micro-batch
+        original_vector, modified_vector = await asyncio.gather(
+            embed_client(request.original_client),
+            embed_client(modified_client)
+        )
         
         # Search with original
-        original_results = qdrant.search(
+        original_results = await qdrant.search(
             collection_name="credit_history_memory",
             query_vector=original_vector.tolist(),
-            limit=50
+            limit=50,
+            exclude_client_id=request.original_client.get('client_id'),
+            with_payload=["actual_outcome"]
         )
         
         # Calculate original confidence
@@ -128,17 +137,13 @@ async def analyze_counterfactual(request: CounterfactualRequest):
         original_confidence = original_repaid / len(original_results) if original_results else 0
         original_risk = calculate_risk_level(original_confidence)
         
-        # Apply modifications
-        modified_client = apply_modifications(request.original_client, request.modifications)
-        
-        # Create embedding for modified client
-        modified_vector = create_embedding(modified_client)
-        
         # Search with modified
-        modified_results = qdrant.search(
+        modified_results = await qdrant.search(
             collection_name="credit_history_memory",
             query_vector=modified_vector.tolist(),
-            limit=50
+            limit=50,
+            exclude_client_id=request.original_client.get('client_id'),
+            with_payload=["actual_outcome"]
         )
         
         # Calculate modified confidence
@@ -160,7 +165,8 @@ async def analyze_counterfactual(request: CounterfactualRequest):
         
         logger.info(f"Counterfactual: {original_risk} -> {modified_risk} ({risk_change})")
         oracle = get_oracle()
-        improvement_path = oracle.generate_improvement_path(
+        improvement_path = await run_io(
+            oracle.generate_improvement_path,
             original_data = request.original_client,
             modifications = request.modifications,
             risk_change = {
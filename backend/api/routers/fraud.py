@@ -2,17 +2,18 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Dict, List, Any
 from services.qdrant_manager import QdrantManager
-from services.embeddings import create_embedding
+from services.batching import embed_client
 import logging
 from services.credit_oracle import get_oracle
-from qdrant_client.models import PointStruct
-import uuid
-from datetime import datetime
+from services.executors import run_io
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-qdrant = QdrantManager(host="localhost", port=6333)
+qdrant = QdrantManager()
+
+# fraud_patterns payload fields read from the top matches
+FRAUD_RESULT_FIELDS = ["fraud_id", "fraud_type", "fraud_indicators", "debt_ratio", "income_stability"]
 
 class FraudCheckRequest(BaseModel):
     client_data: Dict[str, Any]
@@ -32,13 +33,14 @@ async def check_fraud(request: FraudCheckRequest):
     """
     try:
         # Create embedding
-        vector = create_embedding(request.client_data)
+        vector = await embed_client(request.client_data)
         
         # Search fraud collection using qdrant client
-        fraud_results = qdrant.client.query_points(
+        fraud_results = await qdrant.client.query_points(
             collection_name="fraud_patterns",
             query=vector.tolist() if hasattr(vector, 'tolist') else vector,
-            limit=5
+            limit=5,
+            with_payload=FRAUD_RESULT_FIELDS
         )
         
         if not fraud_results or not fraud_results.points:
@@ -86,7 +88,8 @@ async def check_fraud(request: FraudCheckRequest):
         
         # Generate AI explanation
         oracle = get_oracle()
-        oracle_narrative = oracle.explain_fraud(
+        oracle_narrative = await run_io(
+            oracle.explain_fraud,
             fraud_score=fraud_score,
             fraud_type=fraud_type if is_suspicious else 'none',
             similar_frauds=[
@@ -2,27 +2,25 @@
 Multimodal endpoints for document upload and processing
 """
 
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import os
-import shutil
-from pathlib import Path
 import json
+import asyncio
 import logging
 
-from services.embeddings import create_multimodal_embedding, MULTIMODAL_AVAILABLE
-from services.qdrant_manager import QdrantManager
+from services.embeddings import combine_multimodal_embedding, MULTIMODAL_AVAILABLE
+from services.batching import embed_client, embed_image
+from services.qdrant_manager import QdrantManager, SIMILAR_CLIENT_FIELDS
 from services.credit_oracle import get_oracle
+from services.executors import run_io
+from services.upload_store import IMAGE_TYPES, UploadRejected, get_upload_store
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Upload directory
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
-
-qdrant = QdrantManager(host="localhost", port=6333)
+qdrant = QdrantManager()
 
 
 class MultimodalSearchRequest(BaseModel):
@@ -41,14 +39,12 @@ class MultimodalSearchResponse(BaseModel):
 
 
 @router.post("/upload-documents")
-async def upload_documents(
-    files: List[UploadFile] = File(...),
-    client_id: str = Form(...)
-):
+async def upload_documents(request: Request):
     """
     Upload multiple document images for a client
     
-    Supported: invoices, receipts, ID cards, bank statements
+    Multipart form with a `client_id` field and one or more image files.
+    Supported: invoices, receipts, ID cards, bank statements (PNG / JPEG)
     """
     
     if not MULTIMODAL_AVAILABLE:
@@ -57,30 +53,24 @@ async def upload_documents(
             detail="Multimodal features not available. Install transformers and torch."
         )
     
-    uploaded_paths = []
-    
-    # Create client directory
-    client_dir = UPLOAD_DIR / client_id
-    client_dir.mkdir(exist_ok=True)
-    
-    for file in files:
-        # Validate file type
-        if not file.content_type.startswith('image/'):
-            logger.warning(f"Skipping non-image file: {file.filename}")
-            continue
-        
-        # Save file
-        file_path = client_dir / file.filename
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        uploaded_paths.append(str(file_path))
-        logger.info(f"Saved document: {file_path}")
+    store = get_upload_store()
+    try:
+        stored, fields = await store.save_request(request, allowed=IMAGE_TYPES)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    client_id = fields.get("client_id")
+    if not client_id or not stored:
+        await run_io(store.discard, stored)
+        raise HTTPException(status_code=422, detail="client_id and at least one file are required")
+    await run_io(store.link_client, client_id, stored)
+
+    for entry in stored:
+        logger.info(f"Saved document: {entry['path']}{' (duplicate)' if entry['duplicate'] else ''}")
     
     return {
         "client_id": client_id,
-        "uploaded_files": len(uploaded_paths),
-        "paths": uploaded_paths
+        "uploaded_files": len(stored),
+        "paths": [entry["path"] for entry in stored]
     }
 
 
@@ -101,29 +91,27 @@ async def search_with_documents(request: MultimodalSearchRequest):
     try:
         # Get uploaded documents for this client
         client_id = request.client_data.get('client_id', 'unknown')
-        client_dir = UPLOAD_DIR / client_id
-        
-        image_paths = []
-        if client_dir.exists():
-            image_paths = [
-                str(p) for p in client_dir.glob("*")
-                if p.suffix.lower() in ['.jpg', '.jpeg', '.png']
-            ]
+        image_paths = await run_io(get_upload_store().documents_for, client_id, IMAGE_TYPES)
         
         logger.info(f"Found {len(image_paths)} documents for client {client_id}")
         
-        # Create multimodal embedding
-        multimodal_embedding = create_multimodal_embedding(
-            client_data=request.client_data,
-            image_paths=image_paths
+        # Create multimodal embedding; images share CLIP passes with concurrent requests
+        # Max 5 images to avoid over-weighting
+        base_embedding, image_results = await asyncio.gather(
+            embed_client(request.client_data),
+            asyncio.gather(*[embed_image(p) for p in image_paths[:5]], return_exceptions=True)
         )
+        image_embeddings = [r for r in image_results if not isinstance(r, Exception)]
+        multimodal_embedding = combine_multimodal_embedding(base_embedding, image_embeddings)
         
         # Search Qdrant
         # Note: Need to update collection to support 896-dim vectors
-        results = qdrant.search(
+        results = await qdrant.search(
             collection_name="credit_history_memory",
             query_vector=multimodal_embedding.tolist(),
-            limit=request.top_k
+            limit=request.top_k,
+            exclude_client_id=request.client_data.get('client_id'),
+            with_payload=SIMILAR_CLIENT_FIELDS
         )
         
         # Process results (same as regular search)
@@ -156,7 +144,8 @@ async def search_with_documents(request: MultimodalSearchRequest):
         
         # Get Oracle explanation
         oracle = get_oracle()
-        explanation = oracle.explain_credit_decision(
+        explanation = await run_io(
+            oracle.explain_credit_decision,
             client_data=request.client_data,
             similar_clients=similar_clients,
             decision='approve' if confidence >= 0.7 else 'reject',
@@ -184,19 +173,15 @@ async def search_with_documents(request: MultimodalSearchRequest):
 async def list_documents(client_id: str):
     """List uploaded documents for a client"""
     
-    client_dir = UPLOAD_DIR / client_id
-    
-    if not client_dir.exists():
-        return {"client_id": client_id, "documents": []}
+    paths = await run_io(get_upload_store().documents_for, client_id)
     
     documents = [
         {
-            "filename": p.name,
-            "size": p.stat().st_size,
-            "path": str(p)
+            "filename": os.path.basename(p),
+            "size": os.path.getsize(p),
+            "path": p
         }
-        for p in client_dir.glob("*")
-        if p.is_file()
+        for p in paths
     ]
     
     return {
@@ -8,12 +8,12 @@ from typing import List, Dict, Any
 import json
 import logging
 
-from services.qdrant_manager import QdrantManager
+from services.qdrant_manager import QdrantManager, point_id_for
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-qdrant = QdrantManager(host="localhost", port=6333)
+qdrant = QdrantManager()
 
 
 class NetworkBuildRequest(BaseModel):
@@ -41,26 +41,16 @@ async def build_trust_network(request: NetworkBuildRequest):
         # Fetch all client data
         all_clients = [request.center_client_id] + request.related_clients[:20]
         
-        client_data_map = {}
-        
-        for client_id in all_clients:
-            try:
-                results = qdrant.client.scroll(
-                    collection_name="credit_history_memory",
-                    scroll_filter={
-                        "must": [
-                            {"key": "client_id", "match": {"value": client_id}}
-                        ]
-                    },
-                    limit=1
-                )
-                
-                if results and len(results[0]) > 0:
-                    payload = results[0][0].payload
-                    client_data_map[client_id] = payload
-            except Exception as e:
-                logger.warning(f"Could not fetch data for {client_id}: {e}")
-                continue
+        # One retrieve call for every client in the graph
+        points = await qdrant.client.retrieve(
+            collection_name="credit_history_memory",
+            ids=[point_id_for(client_id) for client_id in all_clients]
+        )
+        client_data_map = {
+            point.payload['client_id']: point.payload
+            for point in points
+            if point.payload and point.payload.get('client_id')
+        }
         
         # Build nodes
         for client_id, data in client_data_map.items():
@@ -124,20 +114,15 @@ async def analyze_network_position(client_id: str):
     
     try:
         # Fetch client data
-        results = qdrant.client.scroll(
+        points = await qdrant.client.retrieve(
             collection_name="credit_history_memory",
-            scroll_filter={
-                "must": [
-                    {"key": "client_id", "match": {"value": client_id}}
-                ]
-            },
-            limit=1
+            ids=[point_id_for(client_id)]
         )
         
-        if not results or len(results[0]) == 0:
+        if not points:
             raise HTTPException(status_code=404, detail=f"Client {client_id} not found")
         
-        payload = results[0][0].payload
+        payload = points[0].payload
         social_network_str = payload.get('social_network', '[]')
         social_network = json.loads(social_network_str)
         
@@ -145,26 +130,21 @@ async def analyze_network_position(client_id: str):
         degree = len(social_network)
         avg_strength = sum(c.get('strength', 0) for c in social_network) / degree if degree > 0 else 0
         
-        # Fetch connected clients' outcomes
+        # Fetch connected clients' outcomes in one retrieve call
         connected_outcomes = []
-        for connection in social_network:
-            conn_id = connection.get('connection_id')
+        conn_ids = [c.get('connection_id') for c in social_network if c.get('connection_id')]
+        if conn_ids:
             try:
-                conn_results = qdrant.client.scroll(
+                conn_points = await qdrant.client.retrieve(
                     collection_name="credit_history_memory",
-                    scroll_filter={
-                        "must": [
-                            {"key": "client_id", "match": {"value": conn_id}}
-                        ]
-                    },
-                    limit=1
+                    ids=[point_id_for(conn_id) for conn_id in conn_ids]
                 )
-                if conn_results and len(conn_results[0]) > 0:
-                    outcome = conn_results[0][0].payload.get('actual_outcome')
+                for conn_point in conn_points:
+                    outcome = (conn_point.payload or {}).get('actual_outcome')
                     if outcome:
                         connected_outcomes.append(outcome)
-            except:
-                continue
+            except Exception as e:
+                logger.warning(f"Could not fetch connections for {client_id}: {e}")
         
         # Calculate trust score
         repaid_count = sum(1 for o in connected_outcomes if o == 'repaid')
@@ -1,15 +1,97 @@
 from fastapi import APIRouter, HTTPException
-from models.schemas import SearchRequest, SearchResponse, SimilarClient
-from services.qdrant_manager import  QdrantManager
-from services.embeddings import create_embedding
+from models.schemas import SearchRequest, SearchResponse, SimilarClient, BatchSearchRequest, ExistingClientSearchRequest
+from services.qdrant_manager import  QdrantManager, point_id_for, exclude_filter, SIMILAR_CLIENT_FIELDS
+from services.batching import embed_client, embed_clients
+from services.executors import run_inference
+from qdrant_client.models import QueryRequest, Filter, HasIdCondition
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+import asyncio
+import json
 import logging
-from services.credit_oracle import CreditOracle
+import os
+from services.credit_oracle import get_oracle
+from services.explanations import get_explanation_store
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # Initialize Qdrant
-qdrant = QdrantManager(host="localhost", port=6333)
+qdrant = QdrantManager()
+
+# Stored payload fields the oracle prompt needs for an existing client
+ORACLE_PROFILE_FIELDS = ["client_id", "archetype", "employment_type", "years_active", "debt_ratio"]
+
+# Applicants per /search/similar/batch call, and per grouped Qdrant query
+MAX_BATCH_APPLICANTS = int(os.getenv("MAX_BATCH_APPLICANTS", "10000"))
+QUERY_BATCH_SIZE = int(os.getenv("QUERY_BATCH_SIZE", "256"))
+
+
+def _summarize(results):
+    """Score kNN results (the applicant's own point already excluded by the query).
+
+    Returns the SearchResponse fields: similar_clients, risk_level,
+    confidence, recommendation, repaid_count and total_count.
+    """
+    similar_clients = []
+    repaid_count = 0
+
+    for result in results:
+        outcome = result.payload.get('actual_outcome', 'REJECTED').lower()
+        if outcome == 'repaid':
+            repaid_count += 1
+
+        similar_clients.append(SimilarClient(
+            client_id=result.payload.get('client_id', 'unknown'),
+            similarity=result.score,
+            outcome=outcome,
+            loan_source=result.payload.get('loan_source', 'unknown'),
+            debt_ratio=result.payload.get('debt_ratio', 0.0),
+            years_active=result.payload.get('years_active', 0.0)
+        ))
+
+    # Calculate metrics
+    total = len(results)
+    confidence = repaid_count / total if total > 0 else 0
+
+    # Determine risk level
+    if confidence >= 0.8:
+        risk_level = "LOW"
+    elif confidence >= 0.6:
+        risk_level = "MEDIUM"
+    elif confidence >= 0.4:
+        risk_level = "HIGH"
+    else:
+        risk_level = "CRITICAL"
+
+    # Generate recommendation
+    if confidence >= 0.7:
+        recommendation = f"APPROVE: {repaid_count}/{total} similar clients were approved successfully"
+    else:
+        recommendation = f"REVIEW REQUIRED: Only {repaid_count}/{total} similar clients were approved"
+
+    return {
+        "similar_clients": similar_clients,
+        "risk_level": risk_level,
+        "confidence": confidence,
+        "recommendation": recommendation,
+        "repaid_count": repaid_count,
+        "total_count": total
+    }
+
+def _start_explanation(client_data, results, summary):
+    """Start the oracle explanation in the background; returns its explanation_id.
+
+    Stream it from /search/explanations/{explanation_id}/stream or fetch it when done.
+    """
+    return get_explanation_store().start(get_oracle().stream_decision(
+        client_data=client_data,
+        similar_clients=results,
+        decision='approve' if summary["confidence"] >= 0.7 else 'reject',
+        confidence=summary["confidence"],
+        repaid_count=summary["repaid_count"],
+        total_count=summary["total_count"]
+    ))
 
 @router.post("/search/similar", response_model=SearchResponse)
 async def search_similar(request: SearchRequest):
@@ -29,107 +111,211 @@ async def search_similar(request: SearchRequest):
             archetype = getattr(request.client_data, 'archetype', 'unknown')
         
         logger.info(f"Creating embedding for: {archetype}")
-        vector = create_embedding(request.client_data)
+        vector = await embed_client(request.client_data)
         
-        # Search Qdrant - request limit + 1 to account for filtering
-        results = qdrant.search(
+        # Search Qdrant; the requesting client is excluded server-side
+        results = await qdrant.search(
             collection_name="credit_history_memory",
             query_vector=vector.tolist(),
-            limit=request.top_k + 1
+            limit=request.top_k,
+            exclude_client_id=request_client_id,
+            with_payload=SIMILAR_CLIENT_FIELDS
         )
 
         logger.info(f"Found {len(results)} similar clients from Qdrant")
 
-        # Filter out the requesting client_id if present in the results
-        filtered_results = []
-        for r in results:
-            payload = getattr(r, 'payload', {}) or {}
-            result_client_id = payload.get('client_id')
-            
-            logger.info(f"Checking result - client_id: {result_client_id} (type: {type(result_client_id).__name__}), request_client_id: {request_client_id} (type: {type(request_client_id).__name__})")
-            
-            # Skip if this is the requesting client (handle both string and int comparison)
-            if request_client_id is not None:
-                # Convert to string for comparison to handle int/str mismatches
-                if str(result_client_id) == str(request_client_id):
-                    logger.info(f"FILTERING OUT: {result_client_id} matches {request_client_id}")
-                    continue
-            
-            filtered_results.append(r)
-
-        logger.info(f"After filtering: {len(filtered_results)} clients remaining")
-
-        # Parse results
-        similar_clients = []
-        repaid_count = 0
-
-        for result in filtered_results:
-            outcome = result.payload.get('actual_outcome', 'REJECTED').lower()
-            if outcome == 'repaid':
-                repaid_count += 1
-            
-            similar_clients.append(SimilarClient(
-                client_id=result.payload.get('client_id', 'unknown'),
-                similarity=result.score,
-                outcome=outcome,
-                loan_source=result.payload.get('loan_source', 'unknown'),
-                debt_ratio=result.payload.get('debt_ratio', 0.0),
-                years_active=result.payload.get('years_active', 0.0)
-            ))
-        
-        # Calculate metrics
-        total = len(filtered_results)
-        confidence = repaid_count / total if total > 0 else 0
-        
-        # Determine risk level
-        if confidence >= 0.8:
-            risk_level = "LOW"
-        elif confidence >= 0.6:
-            risk_level = "MEDIUM"
-        elif confidence >= 0.4:
-            risk_level = "HIGH"
-        else:
-            risk_level = "CRITICAL"
-        
-        # Generate recommendation
-        if confidence >= 0.7:
-            recommendation = f"APPROVE: {repaid_count}/{total} similar clients were approved successfully"
-        else:
-            recommendation = f"REVIEW REQUIRED: Only {repaid_count}/{total} similar clients were approved"
-        # Generate AI explanation
-        oracle = CreditOracle()
-        oracle_explanation = oracle.explain_decision(
-            client_data=request.client_data,
-            similar_clients=filtered_results,
-            decision='approve' if confidence >= 0.7 else 'reject',
-            confidence=confidence,
-            repaid_count=repaid_count,
-            total_count=total
-        )
-        print(oracle_explanation)
-    
-        
-        
-    
-        return SearchResponse(
-            similar_clients=similar_clients,
-            risk_level=risk_level,
-            confidence=confidence,
-            recommendation=recommendation,
-            repaid_count=repaid_count,
-            total_count=total,
-            oracle_explanation=oracle_explanation
-        )
+        summary = _summarize(results)
+        explanation_id = _start_explanation(request.client_data, results, summary)
+
+        return SearchResponse(**summary, explanation_id=explanation_id)
     
     except Exception as e:
         logger.error(f"Search failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/search/similar/existing", response_model=SearchResponse)
+async def search_similar_existing(request: ExistingClientSearchRequest):
+    """
+    Find clients similar to one already stored in credit_history_memory.
+
+    Qdrant queries with the client's stored vector (query by point id), so
+    nothing is embedded here and no vector crosses the wire. The client's
+    own point is excluded server-side.
+    """
+    if request.point_id is None and request.client_id is None:
+        raise HTTPException(status_code=422, detail="client_id or point_id is required")
+    point_id = request.point_id or point_id_for(request.client_id)
+
+    try:
+        # The profile lookup (for the oracle prompt) runs alongside the search
+        profile, results = await asyncio.gather(
+            qdrant.client.retrieve(
+                collection_name="credit_history_memory",
+                ids=[point_id],
+                with_payload=ORACLE_PROFILE_FIELDS
+            ),
+            qdrant.client.query_points(
+                collection_name="credit_history_memory",
+                query=point_id,
+                query_filter=Filter(must_not=[HasIdCondition(has_id=[point_id])]),
+                limit=request.top_k,
+                with_payload=SIMILAR_CLIENT_FIELDS
+            ),
+            return_exceptions=True
+        )
+        if isinstance(profile, Exception):
+            raise profile
+        if not profile:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Client {request.client_id or point_id} not found in credit history"
+            )
+        if isinstance(results, Exception):
+            raise results
+
+        summary = _summarize(results.points)
+        explanation_id = _start_explanation(profile[0].payload or {}, results.points, summary)
+
+        return SearchResponse(**summary, explanation_id=explanation_id)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Search by stored vector failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/search/similar/batch")
+async def search_similar_batch(request: BatchSearchRequest):
+    """
+    Score many applicants in one call: one vectorized embedding pass, then
+    kNN searches grouped QUERY_BATCH_SIZE at a time into query_batch_points.
+
+    Streams NDJSON, one line per applicant in request order:
+    {"index", "client_id", "risk_level", "confidence", "recommendation",
+    "repaid_count", "total_count"}, plus "similar_clients" if include_similar
+    and "oracle_explanation" if explain. An applicant whose record cannot be
+    embedded, or whose group search fails, yields an {"index", "client_id",
+    "error"} line and the stream continues.
+    """
+    applicants = request.applicants
+    if len(applicants) > MAX_BATCH_APPLICANTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_BATCH_APPLICANTS} applicants per batch (got {len(applicants)})"
+        )
+
+    # One vectorized pass; a malformed record only fails its own line
+    vectors = await run_inference(embed_clients, [a.client_data for a in applicants])
+
+    logger.info(f"Batch search for {len(applicants)} applicants")
+
+    async def explain(applicant, results, summary):
+        chunks = []
+        async for chunk in get_oracle().stream_decision(
+            client_data=applicant.client_data,
+            similar_clients=results,
+            decision='approve' if summary["confidence"] >= 0.7 else 'reject',
+            confidence=summary["confidence"],
+            repaid_count=summary["repaid_count"],
+            total_count=summary["total_count"]
+        ):
+            chunks.append(chunk)
+        return "".join(chunks).strip()
+
+    async def lines():
+        for start in range(0, len(applicants), QUERY_BATCH_SIZE):
+            group = list(enumerate(applicants[start:start + QUERY_BATCH_SIZE], start))
+            errors = {index: str(vectors[index]) for index, _ in group if isinstance(vectors[index], Exception)}
+            ready = [(index, applicant) for index, applicant in group if index not in errors]
+            for index in errors:
+                logger.error(f"Batch embedding failed for applicant {index}: {errors[index]}")
+
+            responses = []
+            if ready:
+                try:
+                    responses = await qdrant.client.query_batch_points(
+                        collection_name="credit_history_memory",
+                        requests=[
+                            QueryRequest(
+                                query=vectors[index].tolist(),
+                                filter=exclude_filter(client_id=str(applicant.client_id)) if applicant.client_id is not None else None,
+                                limit=applicant.top_k,
+                                with_payload=SIMILAR_CLIENT_FIELDS
+                            )
+                            for index, applicant in ready
+                        ]
+                    )
+                except Exception as e:
+                    logger.error(f"Batch search failed for applicants {start}-{start + len(group) - 1}: {str(e)}")
+                    errors.update({index: str(e) for index, _ in ready})
+                    ready = []
+
+            scored = [(response.points, _summarize(response.points)) for response in responses]
+
+            explanations = [None] * len(ready)
+            if request.explain:
+                # Concurrency and deadlines are enforced by the oracle itself
+                explanations = await asyncio.gather(*[
+                    explain(applicant, results, summary)
+                    for (_, applicant), (results, summary) in zip(ready, scored)
+                ])
+
+            done = {index: (summary, explanation) for (index, _), (_, summary), explanation in zip(ready, scored, explanations)}
+            for index, applicant in group:
+                line = {"index": index, "client_id": applicant.client_id}
+                if index in errors:
+                    line["error"] = errors[index]
+                    yield json.dumps(line) + "\n"
+                    continue
+                summary, explanation = done[index]
+                line.update({k: v for k, v in summary.items() if k != "similar_clients"})
+                if request.include_similar:
+                    line["similar_clients"] = jsonable_encoder(summary["similar_clients"])
+                if explanation is not None:
+                    line["oracle_explanation"] = explanation
+                yield json.dumps(line) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/search/explanations/{explanation_id}")
+async def get_explanation(explanation_id: str):
+    """Oracle explanation for a search: status 'pending' until generation finishes."""
+    entry = get_explanation_store().get(explanation_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Explanation {explanation_id} not found or expired")
+    return {
+        "explanation_id": explanation_id,
+        "status": "done" if entry.done else "pending",
+        "oracle_explanation": entry.text
+    }
+
+
+@router.get("/search/explanations/{explanation_id}/stream")
+async def stream_explanation(explanation_id: str):
+    """Server-sent events: one JSON-encoded text chunk per `data` event, then a `done` event."""
+    store = get_explanation_store()
+    entry = store.get(explanation_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Explanation {explanation_id} not found or expired")
+
+    async def events():
+        async for chunk in store.stream(entry):
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/search/stats")
 async def get_stats():
     """Get collection statistics"""
     try:
-        collection = qdrant.client.get_collection("credit_history_memory")
+        collection = await qdrant.client.get_collection("credit_history_memory")
         return {
             "total_clients": collection.points_count,
             "vector_size": collection.config.params.vectors.size,
@@ -143,8 +329,11 @@ async def get_stats():
 async def get_client_payload(client_id: str):
     """Retrieve the full stored payload for a client by `client_id` from Qdrant."""
     try:
-        # Attempt to fetch the point from the collection
-        point = qdrant.client.get_point(collection_name="credit_history_memory", id=client_id)
+        points = await qdrant.client.retrieve(
+            collection_name="credit_history_memory",
+            ids=[point_id_for(client_id)]
+        )
+        point = points[0] if points else None
 
         if not point or not getattr(point, 'payload', None):
             raise HTTPException(status_code=404, detail=f"Client {client_id} not found")
@@ -7,13 +7,13 @@ from typing import List, Dict, Any
 import json
 import logging
 
-from services.qdrant_manager import QdrantManager
+from services.qdrant_manager import QdrantManager, TEMPORAL_SNAPSHOTS, point_id_for
 from services.credit_oracle import get_oracle
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-qdrant = QdrantManager(host="localhost", port=6333)
+qdrant = QdrantManager()
 
 
 @router.get("/temporal/{client_id}")
@@ -26,23 +26,18 @@ async def get_temporal_evolution(client_id: str):
     """
     
     try:
-        # Search temporal_risk_memory collection for all 3 snapshots of this client
-        results = qdrant.client.scroll(
+        # Fetch all 3 snapshots of this client by id
+        points = await qdrant.client.retrieve(
             collection_name="temporal_risk_memory",
-            scroll_filter={
-                "must": [
-                    {"key": "client_id", "match": {"value": client_id}}
-                ]
-            },
-            limit=3
+            ids=[point_id_for(client_id, snapshot) for snapshot in TEMPORAL_SNAPSHOTS]
         )
         
-        if not results or len(results[0]) == 0:
+        if not points:
             raise HTTPException(status_code=404, detail=f"Client {client_id} not found")
         
         # Extract all 3 temporal points (T0, T1, T2)
         snapshots = []
-        for point in results[0]:
+        for point in points:
             payload = point.payload
             snapshots.append({
                 "timestamp": payload.get("timestamp", "unknown"),
@@ -1,6 +1,12 @@
+import time
+_process_start = time.perf_counter()
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from api.routers import search,counterfactual,fraud,multimodal,temporal,network,voice,applications
+from fastapi.responses import JSONResponse
+import asyncio
+import importlib
+import os
 import uvicorn
 import logging
 
@@ -8,6 +14,39 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Per-module import cost in ms. Shared dependencies are charged to the
+# first module that imports them, so services are timed before routers.
+IMPORT_TIMES = {}
+
+def _timed_import(module_name):
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    IMPORT_TIMES[module_name] = round((time.perf_counter() - start) * 1000, 1)
+    return module
+
+for _service in ["services.model_registry", "services.qdrant_manager", "services.embeddings", "services.credit_oracle"]:
+    _timed_import(_service)
+
+search = _timed_import("api.routers.search")
+counterfactual = _timed_import("api.routers.counterfactual")
+fraud = _timed_import("api.routers.fraud")
+multimodal = _timed_import("api.routers.multimodal")
+temporal = _timed_import("api.routers.temporal")
+network = _timed_import("api.routers.network")
+voice = _timed_import("api.routers.voice")
+applications = _timed_import("api.routers.applications")
+
+from services.embeddings import get_archetype_table, is_archetype_table_ready, MULTIMODAL_AVAILABLE
+from services.model_registry import get_model, get_registry, memory_report
+from services.batching import batching_metrics
+from services.executors import executor_metrics, get_inference_pool, monitor_loop_lag, shutdown_executors
+from services.document_jobs import get_document_job_queue, shutdown_document_jobs
+from services.explanation_cache import get_explanation_cache
+from services.qdrant_manager import close_clients, ensure_payload_indexes_async, get_async_client
+
+# Set WARMUP_MODELS=0 to load models only on first request
+WARMUP_MODELS = os.getenv("WARMUP_MODELS", "1") != "0"
+
 # Create FastAPI app
 app = FastAPI(
     title="Vector CM API",
@@ -24,6 +63,55 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+_warmup_state = {"started": False, "finished": False, "seconds": 0.0, "errors": {}}
+
+def warm_up_models():
+    """Load the archetype table, the text encoder and CLIP into the registry"""
+    start = time.perf_counter()
+    try:
+        get_archetype_table()
+        # Still needed for archetypes missing from the table
+        get_model("text_encoder")
+    except Exception as e:
+        logger.warning(f"Text model warm-up failed: {e}")
+        _warmup_state["errors"]["text_encoder"] = str(e)
+    if MULTIMODAL_AVAILABLE:
+        try:
+            get_model("clip")
+        except Exception as e:
+            logger.warning(f"CLIP warm-up failed: {e}")
+            _warmup_state["errors"]["clip"] = str(e)
+    _warmup_state["seconds"] = round(time.perf_counter() - start, 2)
+    _warmup_state["finished"] = True
+    logger.info(f"🔥 Model warm-up finished in {_warmup_state['seconds']}s")
+
+@app.on_event("startup")
+async def start_warmup():
+    """Warm models in the background so /health answers immediately"""
+    startup_ms = round((time.perf_counter() - _process_start) * 1000, 1)
+    slowest = sorted(IMPORT_TIMES.items(), key=lambda kv: kv[1], reverse=True)[:3]
+    logger.info(f"⏱️  App imported in {startup_ms} ms (slowest: {slowest})")
+    app.state.loop_lag_task = asyncio.create_task(monitor_loop_lag())
+    if WARMUP_MODELS:
+        _warmup_state["started"] = True
+        loop = asyncio.get_running_loop()
+        app.state.warmup_task = loop.run_in_executor(get_inference_pool(), warm_up_models)
+
+@app.on_event("startup")
+async def create_payload_indexes():
+    """Make sure lookup fields are indexed on existing collections"""
+    try:
+        await ensure_payload_indexes_async(get_async_client())
+    except Exception as e:
+        logger.warning(f"Could not create payload indexes: {e}")
+
+@app.on_event("shutdown")
+async def stop_background_work():
+    app.state.loop_lag_task.cancel()
+    shutdown_document_jobs()
+    shutdown_executors()
+    await close_clients()
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -39,6 +127,62 @@ async def health():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness check: 200 once every model is warm, 503 before"""
+    models = {m["name"]: m["loaded"] for m in get_registry().report()}
+    if not MULTIMODAL_AVAILABLE:
+        models.pop("clip", None)
+    models["archetype_table"] = is_archetype_table_ready()
+    is_ready = all(models.values())
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"ready": is_ready, "models": models, "warmup": _warmup_state}
+    )
+
+@app.get("/startup-report")
+async def startup_report():
+    """Import cost per module and model load times"""
+    return {
+        "import_ms": dict(sorted(IMPORT_TIMES.items(), key=lambda kv: kv[1], reverse=True)),
+        "total_import_ms": round(sum(IMPORT_TIMES.values()), 1),
+        "model_load_seconds": {m["name"]: m["load_seconds"] for m in get_registry().report() if m["loaded"]},
+        "warmup": _warmup_state
+    }
+
+@app.get("/metrics/batching")
+async def batching():
+    """Micro-batch sizes, queue wait and queue depth per encoder"""
+    return batching_metrics()
+
+@app.get("/metrics/executors")
+async def executors():
+    """Executor pool usage and event-loop lag"""
+    return executor_metrics()
+
+@app.get("/metrics/document-jobs")
+async def document_jobs():
+    """Background document check queue depth and job counts by status"""
+    return get_document_job_queue().metrics()
+
+@app.get("/metrics/explanations")
+async def explanations():
+    """Oracle explanation cache size, hit rate and coalesced misses"""
+    return get_explanation_cache().stats()
+
+@app.get("/models")
+async def models():
+    """Report which models are resident and their memory usage"""
+    report = memory_report()
+    try:
+        from services.embedding_cache import get_image_cache
+        report["image_cache"] = get_image_cache().stats()
+    except Exception as e:
+        report["image_cache"] = {"error": str(e)}
+    from services.perceptual_hash import get_perceptual_index
+    report["perceptual_hash_index"] = get_perceptual_index().stats()
+    return report
+
 app.include_router(search.router, prefix="/api/v1", tags=["search"])
 app.include_router(counterfactual.router, prefix="/api/v1", tags=["counterfactual"])
 app.include_router(fraud.router, prefix="/api/v1", tags=["fraud"])
@@ -54,6 +198,7 @@ if __name__ == "__main__":
     print(f"📍 API: http://localhost:8000")
     print(f"📚 Docs: http://localhost:8000/docs")
     print(f"💚 Health: http://localhost:8000/health")
+    print(f"🟢 Ready: http://localhost:8000/ready")
     print("="*60 + "\n")
     
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
\ No newline at end of file
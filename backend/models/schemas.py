@@ -6,6 +6,16 @@ class SearchRequest(BaseModel):
     client_id: Optional[str] = None  # Optional: client_id to filter out from results
     top_k: int = 50
 
+class ExistingClientSearchRequest(BaseModel):
+    client_id: Optional[str] = None  # client already in credit_history_memory
+    point_id: Optional[str] = None  # or its Qdrant point id
+    top_k: int = 50
+
+class BatchSearchRequest(BaseModel):
+    applicants: List[SearchRequest]
+    explain: bool = False  # add the oracle explanation to each result line
+    include_similar: bool = False  # add the matched clients to each result line
+
 class SimilarClient(BaseModel):
     client_id: str
     similarity: float
@@ -21,4 +31,5 @@ class SearchResponse(BaseModel):
     recommendation: str
     repaid_count: int
     total_count: int
-    oracle_explanation: str = ""
\ No newline at end of file
+    oracle_explanation: str = ""
+    explanation_id: Optional[str] = None  # oracle text streams from /search/explanations/{id}/stream
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+Micro-batching scheduler for the text and image encoders
+
+Concurrent requests submit single items; a per-encoder worker collects up
+to `max_batch_size` items or waits at most `max_wait_ms` after the first
+one, runs one batched call in the inference pool and resolves every waiting
+future. Batch size, queue wait and queue depth are exposed as metrics so
+throughput can be tuned against tail latency.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from .executors import run_inference
+
+logger = logging.getLogger(__name__)
+
+TEXT_BATCH_MAX_SIZE = int(os.getenv("TEXT_BATCH_MAX_SIZE", "64"))
+TEXT_BATCH_MAX_WAIT_MS = float(os.getenv("TEXT_BATCH_MAX_WAIT_MS", "2"))
+IMAGE_BATCH_MAX_SIZE = int(os.getenv("IMAGE_BATCH_MAX_SIZE", "8"))
+IMAGE_BATCH_MAX_WAIT_MS = float(os.getenv("IMAGE_BATCH_MAX_WAIT_MS", "10"))
+BATCH_MAX_QUEUE = int(os.getenv("BATCH_MAX_QUEUE", "1024"))
+
+# Recent samples kept for percentile metrics
+_METRIC_WINDOW = 1000
+
+
+class BatcherOverloaded(Exception):
+    """Raised when the batch queue is full"""
+
+
+class MicroBatcher:
+    """
+    Collects single-item requests into batches for `batch_fn`
+
+    `batch_fn(items)` runs in the inference thread pool and must return one
+    result per item, in order. A result that is an Exception is raised to
+    that item's caller only.
+    """
+
+    def __init__(self, name: str, batch_fn: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int, max_wait_ms: float, max_queue: int = BATCH_MAX_QUEUE):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+
+        self._queue = None
+        self._worker = None
+        self._loop = None
+
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self.max_depth = 0
+        self._batch_sizes = deque(maxlen=_METRIC_WINDOW)
+        self._queue_waits = deque(maxlen=_METRIC_WINDOW)
+        self._run_times = deque(maxlen=_METRIC_WINDOW)
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result"""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        try:
+            self._queue.put_nowait((item, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise BatcherOverloaded(f"{self.name} batch queue is full ({self.max_queue})")
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        return await future
+
+    async def _collect(self):
+        """Block for the first item, then gather until full or the deadline"""
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            started = time.perf_counter()
+            items = [entry[0] for entry in batch]
+            for _, _, enqueued in batch:
+                self._queue_waits.append(started - enqueued)
+
+            try:
+                results = await run_inference(self.batch_fn, items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name} batch returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                logger.error(f"{self.name} batch of {len(items)} failed: {e}")
+                results = [e] * len(items)
+
+            self.batches += 1
+            self.items += len(items)
+            self._batch_sizes.append(len(items))
+            self._run_times.append(time.perf_counter() - started)
+
+            for (_, future, _), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "rejected": self.rejected,
+            "avg_batch_size": round(float(np.mean(self._batch_sizes)), 2) if self._batch_sizes else 0.0,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self.max_depth,
+            "queue_wait_ms": _percentiles(self._queue_waits),
+            "batch_run_ms": _percentiles(self._run_times)
+        }
+
+
+def _percentiles(samples) -> Dict[str, float]:
+    if not samples:
+        return {"p50": 0.0, "p99": 0.0}
+    values = np.asarray(samples) * 1000
+    return {
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3)
+    }
+
+
+# ========= ENCODER BATCHES =========
+
+def embed_clients(records: List[Dict[str, Any]]) -> List[Any]:
+    """create_embeddings for a batch of records, one vector or Exception per record"""
+    from .embeddings import create_embeddings
+
+    try:
+        return list(create_embeddings(records))
+    except Exception as e:
+        if len(records) == 1:
+            return [e]
+        # One malformed record (e.g. a non-numeric feature) must not fail the
+        # whole batch: redo it item by item so only the bad caller gets the error
+        logger.warning(f"text_encoder batch of {len(records)} failed ({e}); retrying per item")
+    results = []
+    for record in records:
+        try:
+            results.append(create_embeddings([record])[0])
+        except Exception as item_error:
+            results.append(item_error)
+    return results
+
+
+def _embed_images(image_paths: List[str]) -> List[Any]:
+    from .embeddings import create_image_embeddings
+
+    embeddings, errors = create_image_embeddings(image_paths)
+    results, row = [], 0
+    for path in image_paths:
+        if path in errors:
+            results.append(ValueError(errors[path]))
+        else:
+            results.append(embeddings[row])
+            row += 1
+    return results
+
+
+text_batcher = MicroBatcher("text_encoder", embed_clients, TEXT_BATCH_MAX_SIZE, TEXT_BATCH_MAX_WAIT_MS)
+image_batcher = MicroBatcher("image_encoder", _embed_images, IMAGE_BATCH_MAX_SIZE, IMAGE_BATCH_MAX_WAIT_MS)
+
+
+async def embed_client(client_data: Dict[str, Any]) -> np.ndarray:
+    """Batched create_embedding for use from async handlers"""
+    return await text_batcher.submit(client_data)
+
+
+async def embed_image(image_path: str) -> np.ndarray:
+    """Batched create_image_embedding for use from async handlers"""
+    return await image_batcher.submit(image_path)
+
+
+def batching_metrics() -> Dict[str, Any]:
+    return {
+        "text_encoder": text_batcher.metrics(),
+        "image_encoder": image_batcher.metrics()
+    }
@@ -1,9 +1,27 @@
 import os
+import time
+import asyncio
 import logging
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, AsyncIterator, Optional
+
+from .executors import run_io
+from .explanation_cache import get_explanation_cache, prompt_key
 
 logger = logging.getLogger(__name__)
 
+ORACLE_MODEL = "gemini-2.5-flash"
+
+# Async generation limits (streamed explanations)
+ORACLE_TIMEOUT = float(os.getenv("ORACLE_TIMEOUT", "20"))
+ORACLE_MAX_CONCURRENCY = int(os.getenv("ORACLE_MAX_CONCURRENCY", "4"))
+ORACLE_MAX_OUTPUT_TOKENS = int(os.getenv("ORACLE_MAX_OUTPUT_TOKENS", "1000"))
+# Point the Gemini REST client elsewhere, e.g. a local stub server
+ORACLE_API_ENDPOINT = os.getenv("ORACLE_API_ENDPOINT", "")
+# Prompt inputs are rounded to these steps so similar cases hit the explanation cache
+RATIO_BUCKET = 0.05
+YEARS_BUCKET = 0.5
+
 try:
     from google import generativeai as genai
     from dotenv import load_dotenv
@@ -13,6 +31,14 @@ except ImportError:
     HAS_GEMINI = False
     logger.warning("Google Generative AI not installed. Run: pip install google-generativeai")
 
+
+def _bucket(value: Any, step: float) -> float:
+    """Round to the nearest step so near-identical inputs share a prompt (and a cache entry)"""
+    try:
+        return round(round(float(value) / step) * step, 4)
+    except (TypeError, ValueError):
+        return 0.0
+
 class CreditOracle:
     """
     AI-powered explanation generator for credit decisions.
@@ -24,8 +50,15 @@ class CreditOracle:
 
         if HAS_GEMINI and self.api_key:
             try:
-                genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel("gemini-2.5-flash")
+                if ORACLE_API_ENDPOINT:
+                    genai.configure(
+                        api_key=self.api_key,
+                        transport="rest",
+                        client_options={"api_endpoint": ORACLE_API_ENDPOINT}
+                    )
+                else:
+                    genai.configure(api_key=self.api_key)
+                self.model = genai.GenerativeModel(ORACLE_MODEL)
                 self.enabled = True
                 logger.info("✨ Credit Oracle ENABLED")
             except Exception as e:
@@ -36,15 +69,22 @@ class CreditOracle:
             logger.warning("⚠️ Credit Oracle DISABLED")
             logger.warning("   Set GOOGLE_API_KEY in .env to enable")
 
+        self._semaphore = None
+
     # ========= CORE UTILITY =========
 
     def _generate(self, prompt: str, temperature: float = 0.7) -> str:
+        """Generate text, served from the explanation cache when the same prompt was seen"""
+        key = prompt_key(prompt, temperature, ORACLE_MODEL)
+        return get_explanation_cache().get_or_compute(key, lambda: self._generate_uncached(prompt, temperature))
+
+    def _generate_uncached(self, prompt: str, temperature: float) -> str:
         try:
             response = self.model.generate_content(
                 prompt,
                 generation_config={
                     "temperature": temperature,
-                    "max_output_tokens": 1000
+                    "max_output_tokens": ORACLE_MAX_OUTPUT_TOKENS
                 }
             )
             return response.text.strip()
@@ -52,6 +92,134 @@ class CreditOracle:
             logger.error(f"Gemini generation failed: {e}")
             return ""
 
+    async def _stream(self, prompt: str, temperature: float = 0.7, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Stream generated text; at most ORACLE_MAX_CONCURRENCY calls run at once
+        and the whole call (queueing included) must finish within `timeout` seconds.
+        Stops quietly on timeout or error; callers fall back if nothing was produced.
+
+        A cached text is yielded whole; a stream already running for the same
+        prompt is awaited instead of starting another, and only completed
+        streams are cached.
+        """
+        timeout = ORACLE_TIMEOUT if timeout is None else timeout
+        cache = get_explanation_cache()
+        key = prompt_key(prompt, temperature, ORACLE_MODEL)
+        cached = await run_io(cache.get, key)
+        if cached:
+            yield cached
+            return
+
+        pending = cache.join_inflight(key)
+        if pending is not None:
+            try:
+                text = await asyncio.wait_for(asyncio.shield(pending), timeout)
+            except asyncio.TimeoutError:
+                text = None
+            if text:
+                yield text
+            return
+
+        chunks = []
+        complete = False
+        stream = self._stream_uncached(prompt, temperature, timeout)
+        try:
+            async for chunk in stream:
+                if chunk is None:
+                    complete = True
+                    break
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            text = "".join(chunks).strip() if complete else None
+            cache.finish(key, text)
+            try:
+                # Close the model stream here so its concurrency slot is released
+                # now, not whenever the suspended generator gets finalized
+                await stream.aclose()
+            finally:
+                if text:
+                    await run_io(cache.put, key, text)
+
+    async def _stream_uncached(self, prompt: str, temperature: float, timeout: float) -> AsyncIterator[str]:
+        """Model stream; yields None once the response has been read to the end"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(ORACLE_MAX_CONCURRENCY)
+        deadline = time.monotonic() + timeout
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Gemini call skipped: concurrency limit reached before the deadline")
+            return
+        generation_config = {
+            "temperature": temperature,
+            "max_output_tokens": ORACLE_MAX_OUTPUT_TOKENS
+        }
+        chunks = None
+        try:
+            if ORACLE_API_ENDPOINT:
+                # The REST transport has no async streaming client
+                chunks = self._rest_stream(prompt, generation_config)
+            else:
+                response = await asyncio.wait_for(
+                    self.model.generate_content_async(prompt, generation_config=generation_config, stream=True),
+                    max(0.0, deadline - time.monotonic())
+                )
+                chunks = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), max(0.0, deadline - time.monotonic()))
+                except StopAsyncIteration:
+                    yield None
+                    break
+                if chunk.text:
+                    yield chunk.text
+        except asyncio.TimeoutError:
+            logger.warning(f"Gemini stream exceeded its {timeout:.0f}s deadline")
+        except Exception as e:
+            logger.error(f"Gemini streaming failed: {e}")
+        finally:
+            try:
+                if hasattr(chunks, "aclose"):
+                    await chunks.aclose()
+            finally:
+                self._semaphore.release()
+
+    async def _rest_stream(self, prompt: str, generation_config: Dict[str, Any]) -> AsyncIterator[Any]:
+        """Sync streaming call in the I/O pool, its chunks handed over to the event loop"""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                stop.set()  # event loop closed
+
+        def produce():
+            try:
+                for chunk in self.model.generate_content(prompt, generation_config=generation_config, stream=True):
+                    if stop.is_set():
+                        return
+                    put(("chunk", chunk))
+                put(("end", None))
+            except Exception as e:
+                put(("error", e))
+
+        producer = asyncio.ensure_future(run_io(produce))
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == "end":
+                    return
+                if kind == "error":
+                    raise value
+                yield value
+        finally:
+            # The worker notices between chunks; it is not awaited here
+            stop.set()
+            producer.add_done_callback(lambda f: f.cancelled() or f.exception())
+
     # ========= CREDIT DECISION =========
 
     def explain_decision(
@@ -64,13 +232,49 @@ class CreditOracle:
         total_count: int = 0
     ) -> str:
 
+        prompt = self._decision_prompt(client_data, similar_clients, decision, confidence, repaid_count, total_count)
+        text = self._generate(prompt, temperature=0.7)
+        return text if text else self._fallback_explanation(decision, confidence)
+
+    async def stream_decision(
+        self,
+        client_data: Dict[str, Any],
+        similar_clients: List[Any],
+        decision: str,
+        confidence: float,
+        repaid_count: int = 0,
+        total_count: int = 0
+    ) -> AsyncIterator[str]:
+        """explain_decision, streamed in chunks as the model produces them"""
+        produced = False
+        if self.enabled:
+            prompt = self._decision_prompt(client_data, similar_clients, decision, confidence, repaid_count, total_count)
+            stream = self._stream(prompt, temperature=0.7)
+            try:
+                async for chunk in stream:
+                    produced = True
+                    yield chunk
+            finally:
+                # Closed explicitly so an abandoned explanation frees its model slot at once
+                await stream.aclose()
+        if not produced:
+            yield self._fallback_explanation(decision, confidence)
+
+    def _decision_prompt(
+        self,
+        client_data: Dict[str, Any],
+        similar_clients: List[Any],
+        decision: str,
+        confidence: float,
+        repaid_count: int = 0,
+        total_count: int = 0
+    ) -> str:
+
         archetype = client_data.get("archetype", "worker")
         employment = client_data.get("employment_type", "informal")
-        years = client_data.get("years_active", 0)
-        debt = client_data.get("debt_ratio", 0.5)
-        income = client_data.get("monthly_income", 0)
-        income_stability = client_data.get("income_stability", 0.5)
-        payment_regularity = client_data.get("payment_regularity", 0.5)
+        years = _bucket(client_data.get("years_active", 0), YEARS_BUCKET)
+        debt = _bucket(client_data.get("debt_ratio", 0.5), RATIO_BUCKET)
+        confidence = _bucket(confidence, RATIO_BUCKET)
 
         # Handle both dict and Qdrant result objects
         repaid = repaid_count
@@ -87,11 +291,11 @@ APPLICANT PROFILE:
 - Occupation: {archetype.replace('_', ' ')}
 - Employment type: {employment}
 - Years active: {years:.1f}
-- Debt ratio: {debt:.1%}
+- Debt ratio: {debt:.0%}
 - Similar past cases: {repaid} approved, {rejected} not approved out of {total}
 
 DECISION: {decision.upper()}
-Confidence: {confidence:.1%}
+Confidence: {confidence:.0%}
 
 Write 2 short sentences that:
 - Feel human and empathetic
@@ -100,9 +304,7 @@ Write 2 short sentences that:
 - Use “we found”, not “the system decided”
 - Simple language, basic financial literacy
 """
-
-        text = self._generate(prompt, temperature=0.7)
-        return text if text else self._fallback_explanation(decision, confidence)
+        return prompt
 
     # ========= FRAUD EXPLANATION =========
 
@@ -117,12 +319,12 @@ Write 2 short sentences that:
         if not self.enabled:
             return self._fallback_fraud(fraud_score, fraud_type)
 
-        indicators = ", ".join(fraud_indicators[:3]) if fraud_indicators else "unusual patterns"
+        indicators = ", ".join(sorted(fraud_indicators[:3])) if fraud_indicators else "unusual patterns"
 
         prompt = f"""
 You are a professional fraud analyst.
 
-Fraud score: {fraud_score:.1%}
+Fraud score: {_bucket(fraud_score, RATIO_BUCKET):.0%}
 Pattern type: {fraud_type.replace('_', ' ')}
 Similar fraud cases: {len(similar_frauds)}
 Key indicators: {indicators}
@@ -150,16 +352,17 @@ Generate a short 2 phrases professional alert that:
             return self._fallback_improvement(modifications)
 
         changes = []
-        for k, v in modifications.items():
+        for k, v in sorted(modifications.items()):
+            v = round(v, 2)
             if v != 0:
                 changes.append(f"{k.replace('_', ' ')}: {'+' if v > 0 else ''}{v}")
 
         prompt = f"""
 You are a financial advisor helping an informal worker qualify for credit.
 
-Current debt ratio: {original_data.get('debt_ratio', 0):.1%}
-Years active: {original_data.get('years_active', 0):.1f}
-Income stability: {original_data.get('income_stability', 0):.1%}
+Current debt ratio: {_bucket(original_data.get('debt_ratio', 0), RATIO_BUCKET):.0%}
+Years active: {_bucket(original_data.get('years_active', 0), YEARS_BUCKET):.1f}
+Income stability: {_bucket(original_data.get('income_stability', 0), RATIO_BUCKET):.0%}
 Risk change: {risk_change.get('from')} → {risk_change.get('to')}
 
 Required improvements:
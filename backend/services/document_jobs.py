@@ -0,0 +1,164 @@
+"""
+Background job queue for document checks
+
+Application submission hands its documents to this queue and returns a job
+id straight away; a bounded thread pool runs the checks (rasterization,
+CLIP, Qdrant lookups) and records status and results in SQLite, so clients
+can poll for them and results survive a restart. Jobs still queued or
+running when the process stopped are marked failed on the next start.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_JOB_DB = os.getenv(
+    "DOCUMENT_JOB_DB",
+    os.path.join(os.path.dirname(__file__), '..', 'cache', 'document_jobs.sqlite')
+)
+DOCUMENT_JOB_WORKERS = int(os.getenv("DOCUMENT_JOB_WORKERS", "2"))
+DOCUMENT_JOB_MAX_PENDING = int(os.getenv("DOCUMENT_JOB_MAX_PENDING", "256"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    """Raised when too many document checks are already waiting"""
+
+
+class DocumentJobQueue:
+    """Bounded worker pool with job state persisted in SQLite"""
+
+    def __init__(self, db_path: str = DOCUMENT_JOB_DB, workers: int = DOCUMENT_JOB_WORKERS,
+                 max_pending: int = DOCUMENT_JOB_MAX_PENDING):
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="document-job")
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, client_id TEXT NOT NULL, status TEXT NOT NULL, "
+            "documents TEXT NOT NULL, result TEXT, error TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_client ON jobs (client_id, created_at)")
+
+        interrupted = self._db.execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status IN (?, ?)",
+            (FAILED, "interrupted by restart", time.time(), QUEUED, RUNNING)
+        ).rowcount
+        if interrupted:
+            logger.warning(f"Marked {interrupted} interrupted document checks as failed")
+
+    def submit(self, client_id: str, documents: List[str], fn: Callable[..., Dict[str, Any]], *args) -> str:
+        """Queue fn(documents, *args) and return the job id"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"{self._pending} document checks already pending")
+            self._pending += 1
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (job_id, client_id, status, documents, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, client_id, QUEUED, json.dumps(documents), now, now)
+            )
+        self._pool.submit(self._run, job_id, documents, fn, args)
+        logger.info(f"Queued document check {job_id} for {client_id} ({len(documents)} documents)")
+        return job_id
+
+    def _run(self, job_id: str, documents: List[str], fn: Callable, args: tuple):
+        self._set(job_id, RUNNING)
+        try:
+            result = fn(documents, *args)
+            self._set(job_id, DONE, result=json.dumps(result, default=str))
+        except Exception as e:
+            logger.error(f"Document check {job_id} failed: {e}")
+            self._set(job_id, FAILED, error=str(e))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _set(self, job_id: str, status: str, result: str = None, error: str = None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = COALESCE(?, result), error = COALESCE(?, error), "
+                "updated_at = ? WHERE job_id = ?",
+                (status, result, error, time.time(), job_id)
+            )
+
+    def _row_to_job(self, row) -> Dict[str, Any]:
+        job_id, client_id, status, documents, result, error, created_at, updated_at = row
+        return {
+            "job_id": job_id,
+            "client_id": client_id,
+            "status": status,
+            "documents": json.loads(documents),
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "created_at": created_at,
+            "updated_at": updated_at
+        }
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def for_client(self, client_id: str) -> List[Dict[str, Any]]:
+        """All jobs for a client, newest first"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM jobs WHERE client_id = ? ORDER BY created_at DESC", (client_id,)
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "workers": self._pool._max_workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "jobs": counts
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+# ========= SINGLETON =========
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_document_job_queue() -> DocumentJobQueue:
+    global _job_queue
+    if _job_queue is None:
+        with _job_queue_lock:
+            if _job_queue is None:
+                _job_queue = DocumentJobQueue()
+    return _job_queue
+
+
+def shutdown_document_jobs():
+    if _job_queue is not None:
+        _job_queue.shutdown()
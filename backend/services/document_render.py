@@ -0,0 +1,166 @@
+"""
+PDF rasterization helpers
+
+Kept free of model and database imports so these functions can run in the
+process pool (services.executors.get_cpu_pool) without loading the API.
+
+Only the requested pages are rendered, at a DPI chosen so the shorter page
+side comes out at RENDER_TARGET_PX (CLIP resizes to 224 px, so rendering at
+the poppler default of 200 DPI is wasted work). pdftoppm output is read
+from memory, and rendered pages are cached on disk by content hash, page
+and size so a repeat check of the same file renders nothing.
+"""
+
+import hashlib
+import logging
+import math
+import os
+import re
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+POPPLER_PATH = os.getenv(
+    "POPPLER_PATH",
+    os.path.join(os.path.dirname(__file__), '..', 'doc_check', 'poppler-25.12.0', 'Library', 'bin')
+)
+# Shorter page side in pixels; twice the CLIP input keeps small print legible
+RENDER_TARGET_PX = int(os.getenv("RENDER_TARGET_PX", "448"))
+RENDER_CACHE_DIR = os.getenv(
+    "RENDER_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), '..', 'cache', 'renders')
+)
+RENDER_CACHE_MAX_MB = int(os.getenv("RENDER_CACHE_MAX_MB", "256"))
+# The cache directory is walked for pruning only after this much has been
+# written to it (per process) since the last prune
+RENDER_CACHE_PRUNE_EVERY_MB = float(os.getenv("RENDER_CACHE_PRUNE_EVERY_MB", str(max(1, RENDER_CACHE_MAX_MB // 10))))
+
+# US Letter, used when pdfinfo does not report a page size
+_DEFAULT_PAGE_PTS = (612.0, 792.0)
+_PAGE_SIZE = re.compile(r"([\d.]+)\s*x\s*([\d.]+)")
+
+# Bytes written to the render cache since this process last pruned it
+_written_since_prune = 0
+
+
+def _digest(file_path: str) -> str:
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def pdf_info(file_path: str, poppler_path: str = POPPLER_PATH) -> Dict[str, float]:
+    """Page count and first-page size in points"""
+    from pdf2image import pdfinfo_from_path
+
+    info = pdfinfo_from_path(file_path, poppler_path=poppler_path)
+    match = _PAGE_SIZE.search(str(info.get("Page size", "")))
+    width, height = (float(match.group(1)), float(match.group(2))) if match else _DEFAULT_PAGE_PTS
+    return {"pages": int(info.get("Pages", 1)), "width_pts": width, "height_pts": height}
+
+
+def render_dpi(info: Dict[str, float], target_px: int = RENDER_TARGET_PX) -> int:
+    """DPI at which the shorter page side renders to target_px"""
+    short_side_in = min(info["width_pts"], info["height_pts"]) / 72.0
+    return max(1, math.ceil(target_px / short_side_in))
+
+
+def _cache_path(digest: str, page: int, target_px: int) -> str:
+    return os.path.join(RENDER_CACHE_DIR, digest[:2], f"{digest}_p{page}_{target_px}.png")
+
+
+def _note_written(size: int):
+    """Count a cache write; prune once RENDER_CACHE_PRUNE_EVERY_MB has accumulated"""
+    global _written_since_prune
+    _written_since_prune += size
+    if _written_since_prune >= RENDER_CACHE_PRUNE_EVERY_MB * 1024 * 1024:
+        _written_since_prune = 0
+        _prune_cache()
+
+
+def _prune_cache():
+    """Drop the least recently written renders once the cache exceeds its bound"""
+    entries = []
+    for root, _, files in os.walk(RENDER_CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    limit = RENDER_CACHE_MAX_MB * 1024 * 1024
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def _runs(pages: List[int]) -> List[List[int]]:
+    """Split sorted page numbers into contiguous runs"""
+    runs = []
+    for page in pages:
+        if runs and page == runs[-1][-1] + 1:
+            runs[-1].append(page)
+        else:
+            runs.append([page])
+    return runs
+
+
+def render_pages(file_path: str, pages: List[int], digest: Optional[str] = None,
+                 target_px: int = RENDER_TARGET_PX, poppler_path: str = POPPLER_PATH,
+                 info: Optional[Dict[str, float]] = None) -> list:
+    """Render the given 1-based pages of a PDF as RGB PIL images, in order
+
+    `info` is the file's pdf_info(); pass it when already known to spare a
+    pdfinfo call per batch.
+    """
+    from PIL import Image
+    from pdf2image import convert_from_path
+
+    digest = digest or _digest(file_path)
+    rendered = {}
+    missing = []
+    for page in sorted(set(pages)):
+        cached = _cache_path(digest, page, target_px)
+        if os.path.exists(cached):
+            try:
+                with Image.open(cached) as img:
+                    rendered[page] = img.convert("RGB")
+                continue
+            except Exception as e:
+                logger.warning(f"Discarding unreadable render cache entry {cached}: {e}")
+        missing.append(page)
+
+    if missing:
+        dpi = render_dpi(info or pdf_info(file_path, poppler_path), target_px)
+        for run in _runs(missing):
+            images = convert_from_path(
+                file_path, dpi=dpi, first_page=run[0], last_page=run[-1], poppler_path=poppler_path
+            )
+            for page, img in zip(run, images):
+                img = img.convert("RGB")
+                rendered[page] = img
+                cached = _cache_path(digest, page, target_px)
+                try:
+                    os.makedirs(os.path.dirname(cached), exist_ok=True)
+                    tmp = f"{cached}.{os.getpid()}.tmp"
+                    img.save(tmp, format="PNG")
+                    os.replace(tmp, cached)
+                    _note_written(os.path.getsize(cached))
+                except Exception as e:
+                    logger.warning(f"Could not cache render of page {page}: {e}")
+
+    return [rendered[page] for page in pages if page in rendered]
+
+
+def rasterize_first_page(file_path: str, poppler_path: str = POPPLER_PATH, digest: Optional[str] = None):
+    """Render a PDF and return its first page as a PIL image"""
+    return render_pages(file_path, [1], digest=digest, poppler_path=poppler_path)[0]
@@ -0,0 +1,192 @@
+"""
+Text-layer pre-check for born-digital PDFs
+
+Bank statements such as doc_check/Releve_Bancaire.pdf are generated with a
+text layer. Their static labels, fonts and producer identify the template,
+so they can be matched against known templates by hashing. A match with a
+fraud template is conclusive; a match with a genuine template only lowers
+the visual score, since a text layer and fonts are easy to copy into a
+forgery. With no templates registered the check is skipped entirely.
+
+Uses poppler's pdftotext / pdffonts / pdfinfo locally. Like
+document_render, this module has no model or database imports so it can
+run in the process pool.
+
+Register a template (verdict "genuine" or "fraud"):
+    python -m services.document_text register path/to/template.pdf --name releve_bancaire
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import subprocess
+from typing import Any, Dict, List
+
+from .document_render import POPPLER_PATH
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_TEMPLATES_PATH = os.getenv(
+    "DOCUMENT_TEMPLATES_PATH",
+    os.path.join(os.path.dirname(__file__), '..', 'doc_check', 'templates.json')
+)
+# Pages read for the text check; template labels live on the first pages
+TEXT_LAYER_PAGES = int(os.getenv("TEXT_LAYER_PAGES", "2"))
+# Fewer extracted characters than this means the PDF is a scan
+TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", "40"))
+_POPPLER_TIMEOUT = 15
+
+SCANNED = "scanned"
+MATCH = "match"
+AMBIGUOUS = "ambiguous"
+SKIPPED = "skipped"
+
+_SUBSET_TAG = re.compile(r"^[A-Z]{6}\+")
+_DIGITS = re.compile(r"\d")
+_SPACES = re.compile(r"\s+")
+
+
+def _poppler(tool: str, *args: str, poppler_path: str = POPPLER_PATH) -> str:
+    exe = tool + (".exe" if os.name == "nt" else "")
+    candidate = os.path.join(poppler_path, exe) if poppler_path else exe
+    binary = candidate if os.path.exists(candidate) else tool
+    result = subprocess.run(
+        [binary, *args], capture_output=True, timeout=_POPPLER_TIMEOUT, check=True
+    )
+    return result.stdout.decode("utf-8", errors="replace")
+
+
+def extract_text_layer(file_path: str, poppler_path: str = POPPLER_PATH) -> Dict[str, Any]:
+    """Text (first TEXT_LAYER_PAGES pages), fonts and producer of a PDF"""
+    text = _poppler(
+        "pdftotext", "-layout", "-f", "1", "-l", str(TEXT_LAYER_PAGES), file_path, "-",
+        poppler_path=poppler_path
+    )
+
+    fonts = []
+    # pdffonts prints two header lines, then name / type / encoding / emb / sub / uni / object
+    for line in _poppler("pdffonts", file_path, poppler_path=poppler_path).splitlines()[2:]:
+        parts = line.split()
+        if len(parts) < 6:
+            continue
+        name = parts[0]
+        emb = parts[-5] if len(parts) >= 7 else ""
+        fonts.append({"name": _SUBSET_TAG.sub("", name), "embedded": emb == "yes"})
+
+    info = {}
+    for line in _poppler("pdfinfo", file_path, poppler_path=poppler_path).splitlines():
+        key, _, value = line.partition(":")
+        info[key.strip()] = value.strip()
+
+    return {
+        "text": text,
+        "fonts": fonts,
+        "producer": info.get("Producer", ""),
+        "creator": info.get("Creator", "")
+    }
+
+
+def _sha1(value: str) -> str:
+    return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+
+def template_signature(layer: Dict[str, Any]) -> Dict[str, str]:
+    """Hashes of the static parts of a document: labels, fonts and producer
+
+    Labels are the text before ':' on each line with digits masked, so the
+    filled-in values (names, dates, amounts) do not change the hash.
+    """
+    labels = []
+    for line in layer["text"].splitlines():
+        label, sep, _ = line.partition(":")
+        if sep:
+            labels.append(_SPACES.sub(" ", _DIGITS.sub("0", label)).strip().lower())
+    fonts = sorted({(f["name"], f["embedded"]) for f in layer["fonts"]})
+    return {
+        "labels": _sha1("\n".join(labels)),
+        "fonts": _sha1(json.dumps(fonts)),
+        "producer": _sha1(f"{layer['producer']}|{layer['creator']}")
+    }
+
+
+def load_templates(path: str = DOCUMENT_TEMPLATES_PATH) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def has_templates(path: str = DOCUMENT_TEMPLATES_PATH) -> bool:
+    """Whether any template is registered; without one the text check cannot match"""
+    return bool(load_templates(path))
+
+
+def check_text_layer(file_path: str, poppler_path: str = POPPLER_PATH) -> Dict[str, Any]:
+    """Classify a PDF by its text layer
+
+    Returns {"status": ...} with status
+    - "skipped": no templates are registered, nothing was extracted
+    - "scanned": no usable text layer, use the visual check
+    - "match": labels, fonts and producer all match a known template
+      (the result carries its "template" name and "verdict")
+    - "ambiguous": born-digital but not a full template match; "partial"
+      names the template whose labels matched, if any
+    """
+    templates = load_templates()
+    if not templates:
+        return {"status": SKIPPED}
+
+    try:
+        layer = extract_text_layer(file_path, poppler_path)
+    except Exception as e:
+        logger.warning(f"Text layer extraction failed for {file_path}: {e}")
+        return {"status": SCANNED, "error": str(e)}
+
+    if len(layer["text"].strip()) < TEXT_LAYER_MIN_CHARS:
+        return {"status": SCANNED}
+
+    signature = template_signature(layer)
+    partial = None
+    for template in templates:
+        expected = template["signature"]
+        if expected["labels"] != signature["labels"]:
+            continue
+        if expected["fonts"] == signature["fonts"] and expected["producer"] == signature["producer"]:
+            return {"status": MATCH, "template": template["name"], "verdict": template.get("verdict", "genuine")}
+        partial = template["name"]
+
+    return {"status": AMBIGUOUS, "partial": partial, "signature": signature}
+
+
+def register_template(file_path: str, name: str, verdict: str = "genuine",
+                      path: str = DOCUMENT_TEMPLATES_PATH) -> Dict[str, Any]:
+    """Add (or replace) a known template in the registry file"""
+    entry = {
+        "name": name,
+        "verdict": verdict,
+        "signature": template_signature(extract_text_layer(file_path))
+    }
+    templates = [t for t in load_templates(path) if t["name"] != name] + [entry]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(templates, f, indent=2)
+    return entry
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Register document templates or check a PDF's text layer")
+    parser.add_argument("command", choices=["register", "check"])
+    parser.add_argument("pdf")
+    parser.add_argument("--name", help="template name (register)")
+    parser.add_argument("--verdict", choices=["genuine", "fraud"], default="genuine")
+    args = parser.parse_args()
+
+    if args.command == "register":
+        print(json.dumps(register_template(args.pdf, args.name or os.path.splitext(os.path.basename(args.pdf))[0], args.verdict), indent=2))
+    else:
+        print(json.dumps(check_text_layer(args.pdf), indent=2))
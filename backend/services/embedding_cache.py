@@ -0,0 +1,214 @@
+"""
+Content-addressed cache for CLIP image embeddings
+
+Entries are keyed by the SHA-256 of the file bytes, the model version and
+the preprocessing variant, so re-uploads of the same document skip
+decoding, preprocessing and inference. Vectors live in a fixed-size
+float32 memmap (one row per slot); a small SQLite index maps keys to slots
+and tracks last use for LRU eviction once the size bound is reached. The
+index also keeps the page's perceptual hashes next to its vector, so the
+known-fake prefilter still runs when the vector comes from the cache.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from .model_registry import CLIP_MODEL_ID, INFERENCE_BACKEND
+from .upload_store import stored_digest
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_DIR = os.getenv(
+    "IMAGE_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), '..', 'cache', 'images')
+)
+IMAGE_CACHE_MAX_MB = int(os.getenv("IMAGE_CACHE_MAX_MB", "64"))
+IMAGE_EMBEDDING_DIM = 512
+
+# Part of every key: a new model or backend never reuses old vectors
+MODEL_VERSION = f"{CLIP_MODEL_ID}:{INFERENCE_BACKEND}"
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's bytes, read in chunks
+
+    Files in the upload store are named by their digest, so it is not re-read.
+    """
+    digest = stored_digest(path)
+    if digest is not None:
+        return digest
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class EmbeddingCache:
+    """Size-bounded, disk-backed LRU of fixed-size float32 vectors"""
+
+    def __init__(self, directory: str, dim: int = IMAGE_EMBEDDING_DIM, max_mb: int = IMAGE_CACHE_MAX_MB):
+        self.dim = dim
+        self.capacity = max(1, (max_mb * 1024 * 1024) // (dim * 4))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        vectors_path = os.path.join(directory, f"vectors_{dim}.f32")
+        index_path = os.path.join(directory, "index.sqlite")
+
+        self._db = sqlite3.connect(index_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, slot INTEGER UNIQUE NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS hashes (key TEXT PRIMARY KEY, phash TEXT NOT NULL, dhash TEXT NOT NULL)"
+        )
+
+        expected_bytes = self.capacity * dim * 4
+        if os.path.exists(vectors_path) and os.path.getsize(vectors_path) != expected_bytes:
+            # Size bound changed: slots no longer line up, start over
+            logger.info("Image cache size changed, clearing")
+            os.remove(vectors_path)
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM hashes")
+
+        mode = "r+" if os.path.exists(vectors_path) else "w+"
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode=mode, shape=(self.capacity, dim))
+
+    @staticmethod
+    def make_key(digest: str, variant: str) -> str:
+        return f"{variant}:{MODEL_VERSION}:{digest}"
+
+    def get(self, digest: str, variant: str) -> Optional[np.ndarray]:
+        """Cached vector for a file digest, or None"""
+        key = self.make_key(digest, variant)
+        try:
+            with self._lock:
+                # put() in another process can evict this key and reuse its slot;
+                # holding the write lock keeps the index row and the memmap row
+                # consistent until the vector is copied out
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    row = self._db.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()
+                    updated = row is not None and self._db.execute(
+                        "UPDATE entries SET last_used = ? WHERE key = ? AND slot = ?", (time.time(), key, row[0])
+                    ).rowcount == 1
+                    vector = np.array(self._vectors[row[0]]) if updated else None
+                    self._db.execute("COMMIT")
+                except Exception:
+                    self._db.execute("ROLLBACK")
+                    raise
+                if vector is None:
+                    self.misses += 1
+                    return None
+                self.hits += 1
+                return vector
+        except Exception as e:
+            logger.warning(f"Image cache read failed: {e}")
+            return None
+
+    def put(self, digest: str, variant: str, vector: np.ndarray):
+        """Store a vector, evicting the least recently used entry when full"""
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if vector.shape[0] != self.dim:
+            logger.warning(f"Not caching vector of dim {vector.shape[0]} (expected {self.dim})")
+            return
+
+        key = self.make_key(digest, variant)
+        try:
+            with self._lock:
+                # IMMEDIATE serializes slot allocation across worker processes
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    row = self._db.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        slot = row[0]
+                    else:
+                        count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+                        if count < self.capacity:
+                            slot = count
+                        else:
+                            victim, slot = self._db.execute(
+                                "SELECT key, slot FROM entries ORDER BY last_used LIMIT 1"
+                            ).fetchone()
+                            self._db.execute("DELETE FROM entries WHERE key = ?", (victim,))
+                            self._db.execute("DELETE FROM hashes WHERE key = ?", (victim,))
+
+                    # Write the row before the index entry becomes visible
+                    self._vectors[slot] = vector
+                    self._vectors.flush()
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                        (key, slot, time.time())
+                    )
+                    self._db.execute("COMMIT")
+                except Exception:
+                    self._db.execute("ROLLBACK")
+                    raise
+        except Exception as e:
+            logger.warning(f"Image cache write failed: {e}")
+
+    def get_hashes(self, digest: str, variant: str) -> Optional[Dict[str, str]]:
+        """Perceptual hashes stored with put_hashes(), or None"""
+        key = self.make_key(digest, variant)
+        try:
+            with self._lock:
+                row = self._db.execute("SELECT phash, dhash FROM hashes WHERE key = ?", (key,)).fetchone()
+        except Exception as e:
+            logger.warning(f"Image cache read failed: {e}")
+            return None
+        return {"phash": row[0], "dhash": row[1]} if row is not None else None
+
+    def put_hashes(self, digest: str, variant: str, hashes: Dict[str, str]):
+        """Store a page's perceptual hashes (hex, as from image_hashes()) next to
+        its cached vector; ignored when the vector is not cached, and evicted with it"""
+        key = self.make_key(digest, variant)
+        try:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO hashes (key, phash, dhash) "
+                    "SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM entries WHERE key = ?)",
+                    (key, hashes["phash"], hashes["dhash"], key)
+                )
+        except Exception as e:
+            logger.warning(f"Image cache write failed: {e}")
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0
+        }
+
+
+# ========= SINGLETON =========
+
+_image_cache = None
+_image_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> EmbeddingCache:
+    global _image_cache
+    if _image_cache is None:
+        with _image_cache_lock:
+            if _image_cache is None:
+                _image_cache = EmbeddingCache(IMAGE_CACHE_DIR)
+    return _image_cache
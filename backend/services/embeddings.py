@@ -1,20 +1,125 @@
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from functools import lru_cache
+import importlib.util
 import logging
+import os
+
+from .model_registry import get_model, TEXT_MODEL_ID, INFERENCE_BACKEND
 
 logger = logging.getLogger(__name__)
 
-# Singleton model
-_encoder = None
+TEXT_MODEL_NAME = TEXT_MODEL_ID
+TEXT_FEATURE_DIM = 128
+
+# Archetypes of the synthetic dataset (FORMAL_JOBS + INFORMAL_JOBS in data/generate_data.py)
+KNOWN_ARCHETYPES = (
+    'bank_employee', 'teacher', 'government_worker', 'corporate_employee',
+    'nurse_healthcare', 'engineer', 'accountant', 'manager',
+    'market_vendor', 'craftsman', 'gig_worker', 'home_business',
+    'taxi_driver', 'street_vendor', 'construction_worker', 'shop_owner',
+)
+
+# Bump the version whenever KNOWN_ARCHETYPES or the text template changes
+ARCHETYPE_TABLE_VERSION = "v1"
+ARCHETYPE_TABLE_DIR = os.getenv(
+    "ARCHETYPE_TABLE_DIR",
+    os.path.join(os.path.dirname(__file__), '..', 'cache')
+)
+ARCHETYPE_CACHE_SIZE = int(os.getenv("ARCHETYPE_CACHE_SIZE", "256"))
+
+# Images per CLIP forward pass
+CLIP_BATCH_SIZE = int(os.getenv("CLIP_BATCH_SIZE", "8"))
+
+# Archetype -> 128-dim text features (row order follows KNOWN_ARCHETYPES)
+_archetype_table = None
+_archetype_index = {name: i for i, name in enumerate(KNOWN_ARCHETYPES)}
 
 def get_encoder():
-    """Get or create encoder (singleton)"""
-    global _encoder
-    if _encoder is None:
-        logger.info("Loading sentence transformer model...")
-        _encoder = SentenceTransformer('all-MiniLM-L6-v2')
-        logger.info("Model loaded successfully")
-    return _encoder
+    """Get the shared sentence transformer from the model registry"""
+    return get_model("text_encoder")
+
+def archetype_table_path():
+    """Path of the versioned archetype table file"""
+    # ONNX backends produce slightly different features, so keep separate tables
+    backend = "" if INFERENCE_BACKEND == "torch" else f"_{INFERENCE_BACKEND}"
+    return os.path.join(
+        ARCHETYPE_TABLE_DIR,
+        f"archetype_text_{TEXT_MODEL_NAME}{backend}_{ARCHETYPE_TABLE_VERSION}.npy"
+    )
+
+def _encode_archetype_text(archetype):
+    """Run the transformer for one archetype and keep the text block"""
+    text_emb = get_encoder().encode(f"{archetype} business")
+    return np.asarray(text_emb[:TEXT_FEATURE_DIM], dtype=np.float32)
+
+def get_archetype_table():
+    """
+    Get the archetype text-feature table (singleton)
+    
+    Loaded from the versioned .npy file when present, otherwise built
+    with the encoder and persisted for the next process.
+    
+    Returns:
+        numpy array of shape (len(KNOWN_ARCHETYPES), 128), float32
+    """
+    global _archetype_table
+    if _archetype_table is not None:
+        return _archetype_table
+    
+    path = archetype_table_path()
+    table = None
+    
+    if os.path.exists(path):
+        try:
+            table = np.load(path)
+            if table.shape != (len(KNOWN_ARCHETYPES), TEXT_FEATURE_DIM):
+                logger.warning(f"Archetype table {path} has shape {table.shape}, rebuilding")
+                table = None
+            else:
+                logger.info(f"Loaded archetype table from {path}")
+        except Exception as e:
+            logger.warning(f"Could not load archetype table {path}: {e}")
+            table = None
+    
+    if table is None:
+        logger.info(f"Building archetype table for {len(KNOWN_ARCHETYPES)} archetypes...")
+        # One encode per archetype keeps rows bit-identical to the per-call path
+        table = np.stack([_encode_archetype_text(a) for a in KNOWN_ARCHETYPES])
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            np.save(path, table)
+            logger.info(f"Saved archetype table to {path}")
+        except OSError as e:
+            logger.warning(f"Could not persist archetype table: {e}")
+    
+    table.flags.writeable = False
+    _archetype_table = table
+    return _archetype_table
+
+@lru_cache(maxsize=ARCHETYPE_CACHE_SIZE)
+def _unseen_archetype_features(archetype):
+    """LRU fallback for archetypes missing from the table"""
+    logger.debug(f"Archetype '{archetype}' not in table, encoding")
+    features = _encode_archetype_text(archetype)
+    features.flags.writeable = False
+    return features
+
+def is_archetype_table_ready():
+    """Whether the archetype table is already resident"""
+    return _archetype_table is not None
+
+def get_archetype_features(archetype):
+    """
+    Get the 128-dim text block for an archetype without a forward pass
+    when the archetype is known.
+    
+    Returns:
+        read-only numpy array of shape (128,), float32
+    """
+    idx = _archetype_index.get(archetype)
+    if idx is not None:
+        return get_archetype_table()[idx]
+    return _unseen_archetype_features(archetype)
 
 def create_embedding(client_data):
     """
@@ -32,53 +137,92 @@ def create_embedding(client_data):
     Returns:
         numpy array of shape (384,) - L2 normalized
     """
-    encoder = get_encoder()
+    # Single-row batch so scalar and batch outputs are bit-identical
+    return create_embeddings([client_data])[0]
+
+# Feature defaults shared by the scalar and batch paths
+FEATURE_DEFAULTS = {
+    'debt_ratio': 0.5,
+    'years_active': 5,
+    'income_stability': 0.7,
+    'payment_regularity': 0.8,
+    'monthly_income': 1500,
+}
+
+def _feature_column(records, key, default):
+    """Extract one feature as a float64 column from a DataFrame or list of dicts"""
+    if hasattr(records, 'columns'):
+        if key in records.columns:
+            return records[key].to_numpy(dtype=np.float64)
+        return np.full(len(records), float(default))
+    return np.array([float(r.get(key, default)) for r in records], dtype=np.float64)
+
+def create_embeddings(records):
+    """
+    Create 384-dim embeddings for many clients at once
     
-    # Extract features with defaults
-    archetype = str(client_data.get('archetype', 'unknown'))
-    debt_ratio = float(client_data.get('debt_ratio', 0.5))
-    years_active = float(client_data.get('years_active', 5))
-    income_stability = float(client_data.get('income_stability', 0.7))
-    payment_regularity = float(client_data.get('payment_regularity', 0.8))
-    monthly_income = float(client_data.get('monthly_income', 1500))
-    
-    # Part 1: Text embedding (128 dims)
-    text = f"{archetype} business"
-    text_emb = encoder.encode(text)
-    text_features = text_emb[:128]
-    
-    # Part 2: Financial features (128 dims)
-    financial = np.array([
-        debt_ratio,
-        years_active / 20,  # Normalize to [0,1]
-        income_stability,
-        monthly_income / 5000,  # Normalize
-        payment_regularity
-    ])
-    financial_padded = np.pad(financial, (0, 128 - len(financial)))
+    Args:
+        records: pandas DataFrame, or list of dicts/Series, with the same
+                 keys as create_embedding
     
-    # Part 3: Behavioral features (128 dims)
-    behavioral = np.zeros(128)
-    behavioral[0] = calculate_risk_score(client_data)
-    behavioral[1] = income_stability * payment_regularity  # Combined metric
+    Returns:
+        numpy array of shape (N, 384), float32 - each row L2 normalized
+    """
+    if hasattr(records, 'columns'):
+        if 'archetype' in records.columns:
+            archetypes = records['archetype'].astype(str).tolist()
+        else:
+            archetypes = ['unknown'] * len(records)
+    else:
+        records = list(records)
+        archetypes = [str(r.get('archetype', 'unknown')) for r in records]
+    
+    n = len(archetypes)
+    if n == 0:
+        return np.zeros((0, 3 * TEXT_FEATURE_DIM), dtype=np.float32)
+    
+    debt_ratio = _feature_column(records, 'debt_ratio', FEATURE_DEFAULTS['debt_ratio'])
+    years_active = _feature_column(records, 'years_active', FEATURE_DEFAULTS['years_active'])
+    income_stability = _feature_column(records, 'income_stability', FEATURE_DEFAULTS['income_stability'])
+    payment_regularity = _feature_column(records, 'payment_regularity', FEATURE_DEFAULTS['payment_regularity'])
+    monthly_income = _feature_column(records, 'monthly_income', FEATURE_DEFAULTS['monthly_income'])
+    
+    full = np.zeros((n, 3 * TEXT_FEATURE_DIM), dtype=np.float64)
+    
+    # Part 1: Text embedding (128 dims) - one lookup per unique archetype
+    unique_archetypes, inverse = np.unique(archetypes, return_inverse=True)
+    unique_features = np.stack([get_archetype_features(a) for a in unique_archetypes])
+    full[:, :TEXT_FEATURE_DIM] = unique_features[inverse]
     
-    # Combine all parts
-    full_vector = np.concatenate([
-        text_features,
-        financial_padded,
-        behavioral
-    ])
+    # Part 2: Financial features (128 dims, zero padded)
+    financial = full[:, TEXT_FEATURE_DIM:2 * TEXT_FEATURE_DIM]
+    financial[:, 0] = debt_ratio
+    financial[:, 1] = years_active / 20  # Normalize to [0,1]
+    financial[:, 2] = income_stability
+    financial[:, 3] = monthly_income / 5000  # Normalize
+    financial[:, 4] = payment_regularity
+    
+    # Part 3: Behavioral features (128 dims)
+    behavioral = full[:, 2 * TEXT_FEATURE_DIM:]
+    behavioral[:, 0] = _risk_scores(debt_ratio, income_stability, payment_regularity)
+    behavioral[:, 1] = income_stability * payment_regularity  # Combined metric
     
     # CRITICAL: L2 normalize
-    norm = np.linalg.norm(full_vector)
-    if norm > 0:
-        normalized = full_vector / norm
-    else:
-        normalized = full_vector
+    norms = np.linalg.norm(full, axis=1, keepdims=True)
+    np.divide(full, norms, out=full, where=norms > 0)
     
-    logger.debug(f"Created embedding with norm: {np.linalg.norm(normalized):.4f}")
+    logger.debug(f"Created {n} embeddings from {len(unique_archetypes)} archetypes")
     
-    return normalized
+    return full.astype(np.float32)
+
+def _risk_scores(debt_ratio, income_stability, payment_regularity):
+    """Vectorized calculate_risk_score"""
+    risk = (
+        debt_ratio * 0.4 +
+        (1 - income_stability) * 0.3 +
+        (1 - payment_regularity) * 0.3
+    )
+    return np.clip(risk, 0.0, 1.0)
 
 def calculate_risk_score(client_data):
     """Calculate simple risk score [0,1]"""
@@ -98,27 +242,49 @@ def calculate_risk_score(client_data):
 def create_client_embedding(client_data):
     """Alias for create_embedding"""
     return create_embedding(client_data)
+def combine_multimodal_embedding(base_embedding, image_embeddings):
+    """
+    Combine a client embedding with document image embeddings
+    
+    Returns:
+        numpy array - [client_embedding (384)] + [avg_image_embedding or zeros (512)]
+        = 896 dims, L2 normalized
+    """
+    if len(image_embeddings) > 0:
+        # Average image embeddings if multiple
+        avg_image_embedding = np.mean(image_embeddings, axis=0)
+        logger.info(f"Averaged {len(image_embeddings)} image embeddings")
+    else:
+        # No images, or all images failed - use zeros
+        avg_image_embedding = np.zeros(512)
+        logger.info("No image embeddings - using zero padding")
+    
+    # Combine: [client_data: 384] + [images: 512] = 896 dims
+    combined = np.concatenate([base_embedding, avg_image_embedding])
+    
+    # L2 normalize the combined embedding
+    normalized = combined / np.linalg.norm(combined)
+    
+    logger.info(f"Created multimodal embedding: shape={normalized.shape}, norm={np.linalg.norm(normalized):.4f}")
+    
+    return normalized
+
 # ===== MULTIMODAL: CLIP Image Embeddings =====
 
-try:
-    from transformers import CLIPProcessor, CLIPModel
-    from PIL import Image
-    import torch
-    import cv2
-    import numpy as np
+# Checked with find_spec so importing this module does not pull in torch,
+# transformers or cv2; they are imported on first use.
+_MULTIMODAL_MODULES = ('transformers', 'torch', 'PIL', 'cv2')
+_missing_multimodal = [m for m in _MULTIMODAL_MODULES if importlib.util.find_spec(m) is None]
+
+if not _missing_multimodal:
+    from .embedding_cache import file_digest, get_image_cache
     
-    _clip_model = None
-    _clip_processor = None
+    # Cache variant for CLAHE-preprocessed images (see embedding_cache)
+    IMAGE_VARIANT_CLAHE = "clahe"
     
     def get_clip_model():
-        """Get or create CLIP model (singleton)"""
-        global _clip_model, _clip_processor
-        if _clip_model is None:
-            logger.info("Loading CLIP model (openai/clip-vit-base-patch32)...")
-            _clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-            _clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-            logger.info("✅ CLIP model loaded successfully")
-        return _clip_model, _clip_processor
+        """Get the shared CLIP model and processor from the model registry"""
+        return get_model("clip")
     
     def preprocess_document_image(image_path):
         """
@@ -128,6 +294,9 @@ try:
         - Enhance contrast
         - Resize to optimal dimensions
         """
+        import cv2
+        from PIL import Image
+        
         # Read image
         img = cv2.imread(image_path)
         if img is None:
@@ -149,33 +318,113 @@ try:
         
         return pil_img
     
-    def create_image_embedding(image_path):
+    def _clip_features_to_numpy(output):
+        """Extract (batch, 512) numpy features from a get_image_features output"""
+        image_features = output.pooler_output if hasattr(output, 'pooler_output') else output
+        return image_features.detach().cpu().numpy()
+    
+    def _clip_forward(model, processor, images):
+        """One CLIP forward pass over a list of PIL images"""
+        import torch
+        
+        inputs = processor(images=images, return_tensors="pt")
+        with torch.no_grad():
+            output = model.get_image_features(**inputs)
+        return _clip_features_to_numpy(output)
+    
+    def create_image_embeddings(image_paths, batch_size=None):
         """
-        Create CLIP embedding from document image
+        Create CLIP embeddings for several document images in batched passes
+        
+        Images that fail to load or preprocess are skipped without
+        affecting the rest of the batch.
         
         Args:
-            image_path: Path to document image file
+            image_paths: List of document image paths
+            batch_size: Images per forward pass (default CLIP_BATCH_SIZE)
         
         Returns:
-            numpy array of shape (512,) - CLIP image embedding (L2 normalized)
+            (embeddings, errors) - numpy array of shape (k, 512), L2 normalized,
+            for the k images that succeeded (in input order), and a dict
+            mapping each failed path to its error message
         """
-        model, processor = get_clip_model()
+        batch_size = batch_size or CLIP_BATCH_SIZE
+        cache = get_image_cache()
+        
+        # Repeat uploads are served from the content-addressed cache
+        vectors = [None] * len(image_paths)
+        digests = [None] * len(image_paths)
+        pending, images, errors = [], [], {}
+        hits = 0
+        for i, path in enumerate(image_paths):
+            try:
+                digests[i] = file_digest(path)
+                cached = cache.get(digests[i], IMAGE_VARIANT_CLAHE)
+                if cached is not None:
+                    vectors[i] = cached
+                    hits += 1
+                    continue
+                images.append(preprocess_document_image(path))
+                pending.append(i)
+            except Exception as e:
+                errors[path] = str(e)
+                logger.warning(f"Failed to preprocess image {path}: {e}")
         
-        # Preprocess and load image
-        image = preprocess_document_image(image_path)
+        if images:
+            model, processor = get_clip_model()
         
-        # Process image for CLIP
-        inputs = processor(images=image, return_tensors="pt")
+        passes = 0
+        for start in range(0, len(images), batch_size):
+            batch = images[start:start + batch_size]
+            batch_idx = pending[start:start + batch_size]
+            try:
+                features = _clip_forward(model, processor, batch)
+                passes += 1
+                for i, feature in zip(batch_idx, features):
+                    vectors[i] = feature
+            except Exception as e:
+                # Isolate the offending image by retrying one at a time
+                logger.warning(f"Batched CLIP pass failed ({e}), retrying per image")
+                for i, image in zip(batch_idx, batch):
+                    try:
+                        vectors[i] = _clip_forward(model, processor, [image])[0]
+                        passes += 1
+                    except Exception as e_single:
+                        errors[image_paths[i]] = str(e_single)
+                        logger.warning(f"Failed to embed image {image_paths[i]}: {e_single}")
         
-        # Get embedding (no gradient needed)
-        with torch.no_grad():
-            image_features = model.get_image_features(**inputs)
+        done = [i for i, v in enumerate(vectors) if v is not None]
+        if not done:
+            return np.zeros((0, 512), dtype=np.float32), errors
+        
+        embeddings = np.stack([vectors[i] for i in done]).astype(np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms > 0, norms, 1.0)
         
-        # Convert to numpy
-        embedding = image_features.squeeze().cpu().numpy()
+        computed = set(pending)
+        for i, row in zip(done, embeddings):
+            if i in computed:
+                cache.put(digests[i], IMAGE_VARIANT_CLAHE, row)
         
-        # L2 normalize
-        normalized = embedding / np.linalg.norm(embedding)
+        logger.debug(f"Created {len(embeddings)} image embeddings ({hits} cached, {passes} pass(es))")
+        
+        return embeddings, errors
+    
+    def create_image_embedding(image_path):
+        """
+        Create CLIP embedding from document image
+        
+        Args:
+            image_path: Path to document image file
+        
+        Returns:
+            numpy array of shape (512,) - CLIP image embedding (L2 normalized)
+        """
+        embeddings, errors = create_image_embeddings([image_path])
+        if len(embeddings) == 0:
+            raise ValueError(errors.get(image_path, f"Could not embed image: {image_path}"))
+        
+        normalized = embeddings[0]
         
         logger.debug(f"Created image embedding: shape={normalized.shape}, norm={np.linalg.norm(normalized):.4f}")
         
@@ -198,61 +447,34 @@ try:
         base_embedding = create_embedding(client_data)
         
         if not image_paths or len(image_paths) == 0:
-            # No images - pad with zeros
-            padding = np.zeros(512)
-            combined = np.concatenate([base_embedding, padding])
-            normalized = combined / np.linalg.norm(combined)
-            logger.info(f"Created embedding (no images): {normalized.shape}")
-            return normalized
+            return combine_multimodal_embedding(base_embedding, [])
         
-        # Process image embeddings (512 dims each)
-        image_embeddings = []
+        # Process image embeddings (512 dims each) in one batched CLIP pass
+        # Max 5 images to avoid over-weighting
+        image_embeddings, _ = create_image_embeddings(image_paths[:5])
         
-        for img_path in image_paths[:5]:  # Max 5 images to avoid over-weighting
-            try:
-                img_emb = create_image_embedding(img_path)
-                image_embeddings.append(img_emb)
-                logger.info(f"Processed image: {img_path}")
-            except Exception as e:
-                logger.warning(f"Failed to process image {img_path}: {e}")
-                continue
-        
-        # Average image embeddings if multiple
-        if image_embeddings:
-            avg_image_embedding = np.mean(image_embeddings, axis=0)
-            logger.info(f"Averaged {len(image_embeddings)} image embeddings")
-        else:
-            # All images failed - use zeros
-            avg_image_embedding = np.zeros(512)
-            logger.warning("No images processed successfully - using zero padding")
-        
-        # Combine: [client_data: 384] + [images: 512] = 896 dims
-        combined = np.concatenate([base_embedding, avg_image_embedding])
-        
-        # L2 normalize the combined embedding
-        normalized = combined / np.linalg.norm(combined)
-        
-        logger.info(f"Created multimodal embedding: shape={normalized.shape}, norm={np.linalg.norm(normalized):.4f}")
-        
-        return normalized
+        return combine_multimodal_embedding(base_embedding, image_embeddings)
     
     # Mark multimodal as available
     MULTIMODAL_AVAILABLE = True
     logger.info("✅ Multimodal capabilities enabled (CLIP)")
 
-except ImportError as e:
-    logger.warning(f"⚠️  Multimodal features disabled: {e}")
+else:
+    logger.warning(f"⚠️  Multimodal features disabled: missing {', '.join(_missing_multimodal)}")
     logger.warning("   Install: pip install transformers torch pillow opencv-python-headless")
     
     MULTIMODAL_AVAILABLE = False
     
+    def get_clip_model():
+        raise NotImplementedError("CLIP not installed. Multimodal features unavailable.")
+    
+    def create_image_embeddings(image_paths, batch_size=None):
+        raise NotImplementedError("CLIP not installed. Multimodal features unavailable.")
+    
     def create_image_embedding(image_path):
         raise NotImplementedError("CLIP not installed. Multimodal features unavailable.")
     
     def create_multimodal_embedding(client_data, image_paths=None):
         # Fallback to standard embedding
         logger.warning("Multimodal requested but not available - using standard embedding")
-        base = create_embedding(client_data)
-        padding = np.zeros(512)
-        combined = np.concatenate([base, padding])
-        return combined / np.linalg.norm(combined)
\ No newline at end of file
+        return combine_multimodal_embedding(create_embedding(client_data), [])
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+Managed executors for blocking work called from async handlers
+
+- run_io: blocking I/O (sync Qdrant calls, LLM HTTP calls, file writes)
+- run_inference: model inference and OpenCV work; torch and cv2 release
+  the GIL, so threads sized to the core count avoid oversubscription
+- get_cpu_pool: process pool for picklable CPU-bound work (PDF rendering,
+  poppler calls) submitted from worker threads. Workers are started with
+  forkserver (spawn where unavailable), never by forking this process,
+  which by then runs thread pools and may hold loaded models
+
+Pools are sized from the core count and can be overridden with IO_THREADS,
+INFERENCE_THREADS and CPU_PROCESSES. An event-loop lag monitor records how
+late the loop wakes up, which shows whether handlers still block it.
+"""
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CPU_COUNT = os.cpu_count() or 1
+IO_THREADS = int(os.getenv("IO_THREADS", str(min(32, CPU_COUNT + 4))))
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", str(max(1, CPU_COUNT // 2))))
+CPU_PROCESSES = int(os.getenv("CPU_PROCESSES", str(max(1, CPU_COUNT - 1))))
+CPU_START_METHOD = os.getenv(
+    "CPU_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+# Imported once by the fork server so each worker starts with them loaded
+CPU_PRELOAD_MODULES = ["services.document_render", "services.document_text"]
+
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+
+_pools: Dict[str, Any] = {}
+_pools_lock = threading.Lock()
+_in_flight = {"io": 0, "inference": 0}
+_completed = {"io": 0, "inference": 0}
+
+
+def _get_pool(kind: str):
+    pool = _pools.get(kind)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(kind)
+            if pool is None:
+                if kind == "io":
+                    pool = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="io")
+                elif kind == "inference":
+                    pool = ThreadPoolExecutor(max_workers=INFERENCE_THREADS, thread_name_prefix="inference")
+                else:
+                    context = multiprocessing.get_context(CPU_START_METHOD)
+                    if CPU_START_METHOD == "forkserver":
+                        context.set_forkserver_preload(CPU_PRELOAD_MODULES)
+                    pool = ProcessPoolExecutor(max_workers=CPU_PROCESSES, mp_context=context)
+                _pools[kind] = pool
+                logger.info(f"Started {kind} pool")
+    return pool
+
+
+def get_io_pool() -> ThreadPoolExecutor:
+    return _get_pool("io")
+
+
+def get_inference_pool() -> ThreadPoolExecutor:
+    return _get_pool("inference")
+
+
+def get_cpu_pool() -> ProcessPoolExecutor:
+    return _get_pool("cpu")
+
+
+async def _run(kind: str, fn: Callable, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    _in_flight[kind] += 1
+    try:
+        return await loop.run_in_executor(_get_pool(kind), functools.partial(fn, *args, **kwargs))
+    finally:
+        _in_flight[kind] -= 1
+        _completed[kind] += 1
+
+
+async def run_io(fn: Callable, *args, **kwargs):
+    """Run blocking I/O in the I/O thread pool"""
+    return await _run("io", fn, *args, **kwargs)
+
+
+async def run_inference(fn: Callable, *args, **kwargs):
+    """Run model inference / image processing in the inference thread pool"""
+    return await _run("inference", fn, *args, **kwargs)
+
+
+def shutdown_executors():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False)
+        _pools.clear()
+
+
+# ========= EVENT LOOP LAG =========
+
+_lag_samples = deque(maxlen=600)
+_lag_max = 0.0
+
+
+async def monitor_loop_lag():
+    """Sleep for a fixed interval and record how late the loop wakes up"""
+    global _lag_max
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(0.0, time.perf_counter() - start - LOOP_LAG_INTERVAL)
+        _lag_samples.append(lag)
+        _lag_max = max(_lag_max, lag)
+        if lag > 0.5:
+            logger.warning(f"Event loop blocked for {lag * 1000:.0f} ms")
+
+
+def executor_metrics() -> Dict[str, Any]:
+    lag_ms = np.asarray(_lag_samples) * 1000
+    return {
+        "pools": {
+            "io": {"workers": IO_THREADS, "in_flight": _in_flight["io"], "completed": _completed["io"]},
+            "inference": {"workers": INFERENCE_THREADS, "in_flight": _in_flight["inference"], "completed": _completed["inference"]},
+            "cpu": {"workers": CPU_PROCESSES, "start_method": CPU_START_METHOD}
+        },
+        "loop_lag_ms": {
+            "samples": len(lag_ms),
+            "p50": round(float(np.percentile(lag_ms, 50)), 3) if len(lag_ms) else 0.0,
+            "p99": round(float(np.percentile(lag_ms, 99)), 3) if len(lag_ms) else 0.0,
+            "max": round(_lag_max * 1000, 3)
+        }
+    }
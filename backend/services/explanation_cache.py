@@ -0,0 +1,194 @@
+"""
+Cache for generated oracle explanations
+
+CreditOracle builds its prompts from bucketed inputs (debt ratio, years
+active, confidence, ...), so near-identical applicants produce the same
+prompt. Generated text is cached under a hash of the whitespace-normalized
+prompt, temperature and model: an in-memory LRU in front of a SQLite table
+that survives restarts, both with a TTL. Concurrent misses for the same key
+are coalesced so only one request reaches the model.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+EXPLANATION_CACHE_PATH = os.getenv(
+    "EXPLANATION_CACHE_PATH",
+    os.path.join(os.path.dirname(__file__), '..', 'cache', 'explanations.sqlite')
+)
+EXPLANATION_CACHE_TTL = float(os.getenv("EXPLANATION_CACHE_TTL", str(7 * 24 * 3600)))
+EXPLANATION_CACHE_MEMORY_ENTRIES = int(os.getenv("EXPLANATION_CACHE_MEMORY_ENTRIES", "2048"))
+# How long a coalesced caller waits for the in-flight generation
+_SINGLE_FLIGHT_WAIT = 60.0
+
+
+def prompt_key(prompt: str, temperature: float, model: str) -> str:
+    canonical = " ".join(prompt.split())
+    return hashlib.sha256(f"{model}|{temperature:.2f}|{canonical}".encode("utf-8")).hexdigest()
+
+
+class ExplanationCache:
+    """Memory LRU + SQLite, with TTL and single-flight misses"""
+
+    def __init__(self, path: str = EXPLANATION_CACHE_PATH, ttl: float = EXPLANATION_CACHE_TTL,
+                 memory_entries: int = EXPLANATION_CACHE_MEMORY_ENTRIES):
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._async_inflight: Dict[str, asyncio.Future] = {}
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS explanations ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute("DELETE FROM explanations WHERE created_at < ?", (time.time() - ttl,))
+
+    def _lookup(self, key: str, count: bool = True) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += count
+                    return value
+                del self._memory[key]
+
+            try:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM explanations WHERE key = ?", (key,)
+                ).fetchone()
+            except Exception as e:
+                logger.warning(f"Explanation cache read failed: {e}")
+                row = None
+            if row is not None and now - row[1] <= self.ttl:
+                self._remember(key, row[0], row[1])
+                self.disk_hits += count
+                return row[0]
+        return None
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached value or None; a None is counted as a miss once the caller
+        goes on to generate it (get_or_compute / join_inflight)"""
+        return self._lookup(key)
+
+    def put(self, key: str, value: str):
+        if not value:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO explanations (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, value, now)
+                )
+            except Exception as e:
+                logger.warning(f"Explanation cache write failed: {e}")
+
+    def get_or_compute(self, key: str, compute: Callable[[], str]) -> str:
+        """Cached value, or compute() once for all concurrent callers of this key (threads)"""
+        value = self._lookup(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            event.wait(_SINGLE_FLIGHT_WAIT)
+            value = self._lookup(key, count=False)
+            # Leader failed or produced nothing cacheable: compute our own
+            return value if value is not None else compute()
+
+        try:
+            value = compute()
+            self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def join_inflight(self, key: str) -> Optional[asyncio.Future]:
+        """For async callers: the future of an in-flight generation of `key`, or
+        None after registering the caller as the one generating it (put() the
+        result, then finish())"""
+        future = self._async_inflight.get(key)
+        with self._lock:
+            if future is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+        if future is None:
+            self._async_inflight[key] = asyncio.get_running_loop().create_future()
+        return future
+
+    def finish(self, key: str, value: Optional[str]):
+        """Wake async callers waiting on `key` with the generated value (None on failure)"""
+        future = self._async_inflight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(value)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM explanations").fetchone()[0]
+            memory = len(self._memory)
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses + self.coalesced
+        return {
+            "entries": entries,
+            "memory_entries": memory,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round(hits / total, 3) if total else 0.0
+        }
+
+
+# ========= SINGLETON =========
+
+_explanation_cache = None
+_explanation_cache_lock = threading.Lock()
+
+
+def get_explanation_cache() -> ExplanationCache:
+    global _explanation_cache
+    if _explanation_cache is None:
+        with _explanation_cache_lock:
+            if _explanation_cache is None:
+                _explanation_cache = ExplanationCache()
+    return _explanation_cache
@@ -0,0 +1,115 @@
+"""
+Background oracle explanations
+
+Scoring endpoints return their decision at once and start the explanation
+as an asyncio task; its text is collected here under an explanation id so
+the client can stream it (SSE) or fetch it once finished. Entries expire
+after EXPLANATION_TTL seconds and at most EXPLANATION_MAX_ENTRIES are kept.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+EXPLANATION_TTL = float(os.getenv("EXPLANATION_TTL", "600"))
+EXPLANATION_MAX_ENTRIES = int(os.getenv("EXPLANATION_MAX_ENTRIES", "1000"))
+
+
+class Explanation:
+    """Chunks of one explanation, plus a way to wait for more"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.created = time.monotonic()
+        self.task = None
+        self._changed = asyncio.Event()
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks).strip()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self):
+        await self._changed.wait()
+
+
+class ExplanationStore:
+    def __init__(self, ttl: float = EXPLANATION_TTL, max_entries: int = EXPLANATION_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Explanation]" = OrderedDict()
+
+    def start(self, chunks: AsyncIterator[str]) -> str:
+        """Consume an async iterator of text chunks in the background; returns its id"""
+        self._evict()
+        explanation_id = uuid.uuid4().hex
+        entry = Explanation()
+        self._entries[explanation_id] = entry
+        entry.task = asyncio.get_running_loop().create_task(self._run(entry, chunks))
+        return explanation_id
+
+    async def _run(self, entry: Explanation, chunks: AsyncIterator[str]):
+        try:
+            async for chunk in chunks:
+                entry.chunks.append(chunk)
+                entry._notify()
+        except Exception as e:
+            logger.error(f"Explanation failed: {e}")
+        finally:
+            entry.done = True
+            entry._notify()
+
+    def get(self, explanation_id: str) -> Optional[Explanation]:
+        entry = self._entries.get(explanation_id)
+        if entry is not None and time.monotonic() - entry.created > self.ttl:
+            return None
+        return entry
+
+    async def stream(self, entry: Explanation) -> AsyncIterator[str]:
+        """Chunks produced so far, then new ones as they arrive"""
+        sent = 0
+        while True:
+            while sent < len(entry.chunks):
+                yield entry.chunks[sent]
+                sent += 1
+            if entry.done:
+                return
+            await entry.wait()
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._entries:
+            explanation_id, entry = next(iter(self._entries.items()))
+            if len(self._entries) < self.max_entries and now - entry.created <= self.ttl:
+                break
+            self._entries.popitem(last=False)
+            if entry.task is not None and not entry.task.done():
+                entry.task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "running": sum(1 for e in self._entries.values() if not e.done)
+        }
+
+
+# ========= SINGLETON =========
+
+_store = None
+
+
+def get_explanation_store() -> ExplanationStore:
+    global _store
+    if _store is None:
+        _store = ExplanationStore()
+    return _store
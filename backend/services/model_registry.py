@@ -0,0 +1,168 @@
+"""
+Process-wide model registry
+
+Every model is loaded lazily, at most once per process, behind a per-model
+lock so concurrent first requests share a single load. Routers and scripts
+get models from here instead of calling from_pretrained themselves.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+CLIP_MODEL_ID = "openai/clip-vit-base-patch32"
+TEXT_MODEL_ID = "all-MiniLM-L6-v2"
+
+# Intra-op threads for torch/ONNX inference (0 keeps the runtime default)
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))
+
+# "torch" (eager fp32), "onnx" (ONNX Runtime fp32) or "onnx-int8"
+INFERENCE_BACKENDS = ("torch", "onnx", "onnx-int8")
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+if INFERENCE_BACKEND not in INFERENCE_BACKENDS:
+    logger.warning(f"Unknown INFERENCE_BACKEND '{INFERENCE_BACKEND}', using torch")
+    INFERENCE_BACKEND = "torch"
+
+
+def _configure_torch():
+    import torch
+    if TORCH_NUM_THREADS > 0 and torch.get_num_threads() != TORCH_NUM_THREADS:
+        torch.set_num_threads(TORCH_NUM_THREADS)
+        logger.info(f"torch using {TORCH_NUM_THREADS} threads")
+
+
+def _load_text_encoder():
+    if INFERENCE_BACKEND != "torch":
+        from .onnx_backend import load_text_encoder
+        return load_text_encoder(quantized=INFERENCE_BACKEND == "onnx-int8")
+    from sentence_transformers import SentenceTransformer
+    _configure_torch()
+    return SentenceTransformer(TEXT_MODEL_ID)
+
+
+def _load_clip():
+    if INFERENCE_BACKEND != "torch":
+        from .onnx_backend import load_clip
+        return load_clip(quantized=INFERENCE_BACKEND == "onnx-int8")
+    from transformers import CLIPProcessor, CLIPModel
+    _configure_torch()
+    model = CLIPModel.from_pretrained(CLIP_MODEL_ID)
+    model.eval()
+    processor = CLIPProcessor.from_pretrained(CLIP_MODEL_ID)
+    return model, processor
+
+
+class ModelRegistry:
+    """Lazy, thread-safe holder for shared models"""
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._load_seconds: Dict[str, float] = {}
+        self._registry_lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        """Register a loader; the model is not loaded until first use"""
+        with self._registry_lock:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str) -> Any:
+        """Get a model, loading it on first use"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model: {name}")
+
+        with self._locks[name]:
+            # Another thread may have finished loading while we waited
+            model = self._models.get(name)
+            if model is None:
+                logger.info(f"Loading model '{name}'...")
+                start = time.perf_counter()
+                model = self._loaders[name]()
+                self._load_seconds[name] = time.perf_counter() - start
+                self._models[name] = model
+                logger.info(f"✅ Model '{name}' loaded in {self._load_seconds[name]:.1f}s")
+        return model
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def unload(self, name: str):
+        """Drop a resident model so it is reloaded on next use"""
+        with self._locks.get(name, self._registry_lock):
+            self._models.pop(name, None)
+            self._load_seconds.pop(name, None)
+
+    def report(self) -> List[Dict[str, Any]]:
+        """Which models are registered/resident and how much memory they hold"""
+        rows = []
+        for name in sorted(self._loaders):
+            model = self._models.get(name)
+            rows.append({
+                "name": name,
+                "loaded": model is not None,
+                "load_seconds": round(self._load_seconds.get(name, 0.0), 3),
+                "memory_mb": round(estimate_model_bytes(model) / (1024 * 1024), 1) if model is not None else 0.0
+            })
+        return rows
+
+
+def estimate_model_bytes(model: Any) -> int:
+    """Bytes held by parameters and buffers of every torch module in `model`"""
+    modules = model if isinstance(model, (tuple, list)) else [model]
+    total = 0
+    for module in modules:
+        if hasattr(module, "model_bytes"):
+            # ONNX wrappers report the size of their graph
+            total += module.model_bytes
+        elif hasattr(module, "parameters") and hasattr(module, "buffers"):
+            for tensor in list(module.parameters()) + list(module.buffers()):
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def process_rss_mb() -> float:
+    """Peak resident set size of this process in MB"""
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KB on Linux, bytes on macOS
+        return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+    except ImportError:
+        return 0.0
+
+
+# ========= SINGLETON =========
+
+_registry = ModelRegistry()
+_registry.register("text_encoder", _load_text_encoder)
+_registry.register("clip", _load_clip)
+
+
+def get_registry() -> ModelRegistry:
+    return _registry
+
+
+def get_model(name: str) -> Any:
+    return _registry.get(name)
+
+
+def memory_report() -> Dict[str, Any]:
+    """Resident models and their memory usage, for the /models endpoint"""
+    models = _registry.report()
+    return {
+        "backend": INFERENCE_BACKEND,
+        "models": models,
+        "resident_model_mb": round(sum(m["memory_mb"] for m in models), 1),
+        "process_peak_rss_mb": process_rss_mb()
+    }
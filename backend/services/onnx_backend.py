@@ -0,0 +1,312 @@
+"""
+ONNX Runtime inference backend for MiniLM and CLIP on CPU
+
+Selected with INFERENCE_BACKEND=onnx (fp32) or INFERENCE_BACKEND=onnx-int8
+(dynamic int8 quantization). Models are exported from the torch weights on
+first use and cached under ONNX_MODEL_DIR. The wrappers mimic the parts of
+SentenceTransformer / CLIPModel that the rest of the backend calls, so
+get_encoder(), get_clip_model() and get_document_vector() work unchanged.
+
+Usage (from backend/):
+    python -m services.onnx_backend export [--int8]
+    python -m services.onnx_backend parity [--int8]
+"""
+
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .model_registry import CLIP_MODEL_ID, TEXT_MODEL_ID, TORCH_NUM_THREADS
+
+logger = logging.getLogger(__name__)
+
+ONNX_MODEL_DIR = os.getenv(
+    "ONNX_MODEL_DIR",
+    os.path.join(os.path.dirname(__file__), '..', 'cache', 'onnx')
+)
+ONNX_OPSET = 14
+TEXT_MAX_SEQ_LENGTH = 256
+
+
+def _model_path(kind: str, quantized: bool) -> str:
+    suffix = ".int8.onnx" if quantized else ".onnx"
+    return os.path.join(ONNX_MODEL_DIR, kind, f"model{suffix}")
+
+
+def _session(path: str):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if TORCH_NUM_THREADS > 0:
+        options.intra_op_num_threads = TORCH_NUM_THREADS
+    return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+# ========= EXPORT =========
+
+def export_text_encoder() -> str:
+    """Export the MiniLM transformer (without pooling) and its tokenizer"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    class _LastHiddenState(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                token_type_ids=token_type_ids
+            )[0]
+
+    path = _model_path("text_encoder", quantized=False)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    st = SentenceTransformer(TEXT_MODEL_ID)
+    wrapper = _LastHiddenState(st[0].auto_model).eval()
+    dummy = st.tokenizer(["market_vendor business"], return_tensors="pt")
+
+    torch.onnx.export(
+        wrapper,
+        (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+        path,
+        input_names=["input_ids", "attention_mask", "token_type_ids"],
+        output_names=["last_hidden_state"],
+        dynamic_axes={
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "token_type_ids": {0: "batch", 1: "sequence"},
+            "last_hidden_state": {0: "batch", 1: "sequence"}
+        },
+        opset_version=ONNX_OPSET
+    )
+    st.tokenizer.save_pretrained(os.path.dirname(path))
+    logger.info(f"Exported text encoder to {path}")
+    return path
+
+
+def export_clip_vision() -> str:
+    """Export CLIPModel.get_image_features and the CLIP processor"""
+    import torch
+    from transformers import CLIPProcessor, CLIPModel
+
+    class _ImageFeatures(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, pixel_values):
+            output = self.model.get_image_features(pixel_values=pixel_values)
+            return output.pooler_output if hasattr(output, 'pooler_output') else output
+
+    path = _model_path("clip", quantized=False)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    model = CLIPModel.from_pretrained(CLIP_MODEL_ID).eval()
+    processor = CLIPProcessor.from_pretrained(CLIP_MODEL_ID)
+    dummy = torch.zeros(1, 3, 224, 224)
+
+    torch.onnx.export(
+        _ImageFeatures(model),
+        (dummy,),
+        path,
+        input_names=["pixel_values"],
+        output_names=["image_embeds"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+        opset_version=ONNX_OPSET
+    )
+    processor.save_pretrained(os.path.dirname(path))
+    logger.info(f"Exported CLIP vision tower to {path}")
+    return path
+
+
+def ensure_model(kind: str, quantized: bool) -> str:
+    """Path to the requested ONNX graph, exporting/quantizing it if missing"""
+    path = _model_path(kind, quantized)
+    if os.path.exists(path):
+        return path
+
+    fp32_path = _model_path(kind, quantized=False)
+    if not os.path.exists(fp32_path):
+        if kind == "text_encoder":
+            export_text_encoder()
+        elif kind == "clip":
+            export_clip_vision()
+        else:
+            raise ValueError(f"Unknown ONNX model kind: {kind}")
+
+    if quantized:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(fp32_path, path, weight_type=QuantType.QInt8)
+        logger.info(f"Quantized {kind} to int8: {path}")
+    return path
+
+
+# ========= RUNTIME WRAPPERS =========
+
+class OnnxTextEncoder:
+    """SentenceTransformer-compatible encode() over an ONNX MiniLM graph"""
+
+    def __init__(self, quantized: bool = False):
+        from transformers import AutoTokenizer
+
+        path = ensure_model("text_encoder", quantized)
+        self.session = _session(path)
+        self.tokenizer = AutoTokenizer.from_pretrained(os.path.dirname(path))
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.model_bytes = os.path.getsize(path)
+        self.quantized = quantized
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        """Mean-pooled, L2-normalized embeddings; 1-D for a single string"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            batch = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=TEXT_MAX_SEQ_LENGTH,
+                return_tensors="np"
+            )
+            feeds = {k: v.astype(np.int64) for k, v in batch.items() if k in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+
+            mask = batch["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            chunks.append(pooled / np.clip(norms, 1e-12, None))
+
+        embeddings = np.concatenate(chunks).astype(np.float32) if chunks else np.zeros((0, 384), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+
+class OnnxClipModel:
+    """CLIPModel stand-in exposing get_image_features over an ONNX graph"""
+
+    def __init__(self, quantized: bool = False):
+        path = ensure_model("clip", quantized)
+        self.session = _session(path)
+        self.model_bytes = os.path.getsize(path)
+        self.quantized = quantized
+
+    def eval(self):
+        return self
+
+    def get_image_features(self, pixel_values=None, **kwargs):
+        import torch
+
+        pixels = pixel_values.detach().cpu().numpy() if hasattr(pixel_values, 'detach') else np.asarray(pixel_values)
+        features = self.session.run(None, {"pixel_values": pixels.astype(np.float32)})[0]
+        return torch.from_numpy(features)
+
+
+def load_text_encoder(quantized: bool = False) -> OnnxTextEncoder:
+    return OnnxTextEncoder(quantized=quantized)
+
+
+def load_clip(quantized: bool = False):
+    from transformers import CLIPProcessor
+
+    model = OnnxClipModel(quantized=quantized)
+    processor = CLIPProcessor.from_pretrained(os.path.dirname(_model_path("clip", quantized)))
+    return model, processor
+
+
+# ========= PARITY CHECK =========
+
+def _cosine_drift(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    ref = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    cand = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    drift = 1.0 - np.sum(ref * cand, axis=1)
+    return {"mean_drift": round(float(drift.mean()), 6), "max_drift": round(float(drift.max()), 6)}
+
+
+def check_parity(texts: Optional[List[str]] = None,
+                 image_paths: Optional[List[str]] = None,
+                 quantized: bool = True) -> Dict[str, Any]:
+    """
+    Compare the ONNX backend against the torch path
+
+    Returns cosine drift (1 - cosine similarity, mean and max) and the
+    CPU speedup for the text encoder and, if images are given, for CLIP.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from transformers import CLIPProcessor, CLIPModel
+
+    if texts is None:
+        from .embeddings import KNOWN_ARCHETYPES
+        texts = [f"{a} business" for a in KNOWN_ARCHETYPES]
+
+    report: Dict[str, Any] = {"quantized": quantized}
+
+    torch_encoder = SentenceTransformer(TEXT_MODEL_ID)
+    onnx_encoder = load_text_encoder(quantized)
+
+    start = time.perf_counter()
+    reference = torch_encoder.encode(texts)
+    torch_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    candidate = onnx_encoder.encode(texts)
+    onnx_seconds = time.perf_counter() - start
+
+    report["text_encoder"] = {
+        **_cosine_drift(reference, candidate),
+        "speedup": round(torch_seconds / max(onnx_seconds, 1e-9), 2)
+    }
+
+    if image_paths:
+        from PIL import Image
+
+        images = [Image.open(p).convert("RGB") for p in image_paths]
+        processor = CLIPProcessor.from_pretrained(CLIP_MODEL_ID)
+        pixels = processor(images=images, return_tensors="pt")["pixel_values"]
+
+        torch_clip = CLIPModel.from_pretrained(CLIP_MODEL_ID).eval()
+        onnx_clip = OnnxClipModel(quantized)
+
+        start = time.perf_counter()
+        with torch.no_grad():
+            output = torch_clip.get_image_features(pixel_values=pixels)
+        reference = (output.pooler_output if hasattr(output, 'pooler_output') else output).numpy()
+        torch_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        candidate = onnx_clip.get_image_features(pixel_values=pixels).numpy()
+        onnx_seconds = time.perf_counter() - start
+
+        report["clip"] = {
+            **_cosine_drift(reference, candidate),
+            "speedup": round(torch_seconds / max(onnx_seconds, 1e-9), 2)
+        }
+
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import glob
+    import json
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Export ONNX models or check parity with torch")
+    parser.add_argument("command", choices=["export", "parity"])
+    parser.add_argument("--int8", action="store_true", help="use dynamic int8 quantization")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        for kind in ("text_encoder", "clip"):
+            print(ensure_model(kind, args.int8))
+    else:
+        doc_dir = os.path.join(os.path.dirname(__file__), '..', 'doc_check')
+        sample_images = sorted(glob.glob(os.path.join(doc_dir, "*.jpg")))
+        print(json.dumps(check_parity(image_paths=sample_images, quantized=args.int8), indent=2))
@@ -0,0 +1,197 @@
+"""
+Perceptual-hash prefilter for document fraud checks
+
+Fakes from doc_check/fake_gen.py are near pixel-identical renders of one
+template, so a document that reuses a known fake is caught by 64-bit
+perceptual hashes long before CLIP is needed. ingest_fakes.py stores
+`phash` / `dhash` (16-digit hex) in the document_risk_engine payload; this
+module keeps them in an in-memory BK-tree keyed on pHash, reloaded from
+Qdrant every PHASH_INDEX_TTL seconds, and confirms candidates with dHash.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .qdrant_manager import get_sync_client
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_COLLECTION_NAME = "document_risk_engine"
+# Max Hamming distances (of 64 bits) for a match; both hashes must agree
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "4"))
+DHASH_MAX_DISTANCE = int(os.getenv("DHASH_MAX_DISTANCE", "6"))
+PHASH_INDEX_TTL = float(os.getenv("PHASH_INDEX_TTL", "300"))
+
+_DCT_SIZE = 32
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(_DCT_SIZE)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    value = 0
+    for bit in bits.flatten():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def phash(image) -> int:
+    """64-bit DCT hash: low 8x8 frequencies of a 32x32 grayscale, against their median"""
+    from PIL import Image
+
+    pixels = np.asarray(image.convert("L").resize((_DCT_SIZE, _DCT_SIZE), Image.LANCZOS), dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T)[:8, :8]
+    return _bits_to_int(low > np.median(low.flatten()[1:]))
+
+
+def dhash(image) -> int:
+    """64-bit gradient hash: is each pixel brighter than its left neighbour (9x8 grayscale)"""
+    from PIL import Image
+
+    pixels = np.asarray(image.convert("L").resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def image_hashes(image) -> Dict[str, str]:
+    """Both hashes as 16-digit hex, the form stored in Qdrant payloads"""
+    return {"phash": f"{phash(image):016x}", "dhash": f"{dhash(image):016x}"}
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Metric tree over 64-bit hashes under Hamming distance"""
+
+    def __init__(self):
+        self._root = None
+        self.size = 0
+
+    def add(self, key: int, value: Any):
+        node = [key, value, {}]
+        self.size += 1
+        if self._root is None:
+            self._root = node
+            return
+        current = self._root
+        while True:
+            distance = hamming(key, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, key: int, max_distance: int) -> List[Tuple[int, Any]]:
+        """(distance, value) pairs within max_distance, nearest first"""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node_key, value, children = stack.pop()
+            distance = hamming(key, node_key)
+            if distance <= max_distance:
+                found.append((distance, value))
+            # Triangle inequality: only children in [d - r, d + r] can match
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return sorted(found, key=lambda item: item[0])
+
+
+class PerceptualIndex:
+    """BK-tree of known fakes, loaded from document_risk_engine payloads"""
+
+    def __init__(self, ttl: float = PHASH_INDEX_TTL):
+        self.ttl = ttl
+        self._tree = BKTree()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.lookups = 0
+
+    def _load(self):
+        tree = BKTree()
+        offset = None
+        while True:
+            batch, offset = get_sync_client().scroll(
+                collection_name=DOCUMENT_COLLECTION_NAME,
+                limit=1000,
+                offset=offset,
+                with_payload=["phash", "dhash", "filename", "label"],
+                with_vectors=False
+            )
+            for point in batch:
+                payload = point.payload or {}
+                if payload.get("phash") and payload.get("dhash"):
+                    tree.add(int(payload["phash"], 16), {
+                        "id": point.id,
+                        "dhash": int(payload["dhash"], 16),
+                        "filename": payload.get("filename"),
+                        "label": payload.get("label")
+                    })
+            if offset is None:
+                break
+        self._tree = tree
+        self._loaded_at = time.monotonic()
+        logger.info(f"Perceptual hash index loaded: {tree.size} documents")
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            with self._lock:
+                if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+                    try:
+                        self._load()
+                    except Exception as e:
+                        # Keep serving the previous tree; retry after the next TTL
+                        logger.warning(f"Could not load perceptual hash index: {e}")
+                        self._loaded_at = time.monotonic()
+
+    def match(self, image) -> Optional[Dict[str, Any]]:
+        """Closest known fake within both distance limits, or None"""
+        return self.match_hashes(image_hashes(image))
+
+    def match_hashes(self, hashes: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """match() for hashes computed earlier (the image_hashes() form)"""
+        self._ensure_fresh()
+        self.lookups += 1
+        if self._tree.size == 0:
+            return None
+        query_phash, query_dhash = int(hashes["phash"], 16), int(hashes["dhash"], 16)
+        for distance, entry in self._tree.search(query_phash, PHASH_MAX_DISTANCE):
+            d_distance = hamming(query_dhash, entry["dhash"])
+            if d_distance <= DHASH_MAX_DISTANCE:
+                self.hits += 1
+                return {**entry, "phash_distance": distance, "dhash_distance": d_distance}
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"documents": self._tree.size, "lookups": self.lookups, "hits": self.hits}
+
+
+# ========= SINGLETON =========
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_perceptual_index() -> PerceptualIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PerceptualIndex()
+    return _index
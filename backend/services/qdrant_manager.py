@@ -1,35 +1,188 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.models import PayloadSchemaType, Filter, FieldCondition, MatchValue
 import logging
+import os
+import threading
+import uuid
 
 logger = logging.getLogger(__name__)
 
+# Connection settings (override with environment variables)
+QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
+QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "0") == "1"
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "10"))
+QDRANT_MAX_CONNECTIONS = int(os.getenv("QDRANT_MAX_CONNECTIONS", "100"))
+
+# Payload fields used to score credit_history_memory neighbours; searches
+# fetch only these instead of whole payloads
+SIMILAR_CLIENT_FIELDS = ["client_id", "actual_outcome", "loan_source", "debt_ratio", "years_active"]
+
+# Payload indexes per collection, so lookups by these fields are indexed
+# filter queries instead of full-collection scrolls; `date` is a datetime
+# index so listings can be ordered server-side
+_KEYWORD = PayloadSchemaType.KEYWORD
+PAYLOAD_INDEXES = {
+    "credit_history_memory": {
+        "client_id": _KEYWORD, "outcome": _KEYWORD, "actual_outcome": _KEYWORD,
+        "archetype": _KEYWORD, "location": _KEYWORD, "date": PayloadSchemaType.DATETIME
+    },
+    "temporal_risk_memory": {
+        "client_id": _KEYWORD, "timestamp": _KEYWORD, "date": PayloadSchemaType.DATETIME
+    },
+    "fraud_patterns": {"archetype": _KEYWORD},
+}
+
+# Point ids are UUIDv5 of the client_id (plus the snapshot name for
+# temporal points, the fraud_id for fraud patterns) so a client can be
+# fetched by key with a single retrieve call
+POINT_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "vector-cm/points")
+TEMPORAL_SNAPSHOTS = ("T0_application", "T1_3months", "T2_6months")
+
+_async_client = None
+_sync_client = None
+_client_lock = threading.Lock()
+
+
+def _client_kwargs(host=None, port=None):
+    kwargs = {
+        "host": host or QDRANT_HOST,
+        "port": port or QDRANT_PORT,
+        "grpc_port": QDRANT_GRPC_PORT,
+        "prefer_grpc": QDRANT_PREFER_GRPC,
+        "timeout": QDRANT_TIMEOUT,
+    }
+    if not QDRANT_PREFER_GRPC:
+        # Passed through to the underlying httpx client
+        import httpx
+        kwargs["limits"] = httpx.Limits(
+            max_connections=QDRANT_MAX_CONNECTIONS,
+            max_keepalive_connections=QDRANT_MAX_CONNECTIONS
+        )
+    return kwargs
+
+
+def get_async_client() -> AsyncQdrantClient:
+    """Process-wide async client for request handlers"""
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncQdrantClient(**_client_kwargs())
+                transport = "gRPC" if QDRANT_PREFER_GRPC else "HTTP"
+                logger.info(f"Connected to Qdrant at {QDRANT_HOST}:{QDRANT_PORT} (async, {transport})")
+    return _async_client
+
+
+def get_sync_client() -> QdrantClient:
+    """Process-wide sync client for scripts and code running in worker threads"""
+    global _sync_client
+    if _sync_client is None:
+        with _client_lock:
+            if _sync_client is None:
+                _sync_client = QdrantClient(**_client_kwargs())
+                logger.info(f"Connected to Qdrant at {QDRANT_HOST}:{QDRANT_PORT} (sync)")
+    return _sync_client
+
+
+async def close_clients():
+    """Close shared clients on shutdown"""
+    global _async_client, _sync_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
+
+
+def point_id_for(key: str, snapshot: str = None) -> str:
+    """Deterministic point id for a client_id / fraud_id (and temporal snapshot)"""
+    name = key if snapshot is None else f"{key}:{snapshot}"
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, name))
+
+
+def match_filter(**fields) -> Filter:
+    """Filter requiring every given payload field to equal its value"""
+    return Filter(must=[
+        FieldCondition(key=key, match=MatchValue(value=value))
+        for key, value in fields.items()
+    ])
+
+
+def exclude_filter(**fields) -> Filter:
+    """Filter rejecting points whose payload field equals the given value"""
+    return Filter(must_not=[
+        FieldCondition(key=key, match=MatchValue(value=value))
+        for key, value in fields.items()
+    ])
+
+
+def ensure_payload_indexes(client: QdrantClient):
+    """Create the payload indexes on existing collections (sync)"""
+    existing = {c.name for c in client.get_collections().collections}
+    for collection, fields in PAYLOAD_INDEXES.items():
+        if collection not in existing:
+            continue
+        for field, schema in fields.items():
+            client.create_payload_index(
+                collection_name=collection,
+                field_name=field,
+                field_schema=schema
+            )
+        logger.info(f"Payload indexes ready on {collection}: {', '.join(fields)}")
+
+
+async def ensure_payload_indexes_async(client: AsyncQdrantClient):
+    """Create the payload indexes on existing collections (async)"""
+    existing = {c.name for c in (await client.get_collections()).collections}
+    for collection, fields in PAYLOAD_INDEXES.items():
+        if collection not in existing:
+            continue
+        for field, schema in fields.items():
+            await client.create_payload_index(
+                collection_name=collection,
+                field_name=field,
+                field_schema=schema
+            )
+        logger.info(f"Payload indexes ready on {collection}: {', '.join(fields)}")
+
+
 class QdrantManager:
-    """Simple Qdrant manager for Vector CM"""
-    
-    def __init__(self, host="localhost", port=6333):
-        self.client = QdrantClient(host=host, port=port)
-        logger.info(f"Connected to Qdrant at {host}:{port}")
-    
-    def search(self, collection_name, query_vector, limit=50):
+    """Simple Qdrant manager for Vector CM
+
+    All instances share one AsyncQdrantClient per process.
+    """
+
+    @property
+    def client(self) -> AsyncQdrantClient:
+        return get_async_client()
+
+    async def search(self, collection_name, query_vector, limit=50, exclude_client_id=None, with_payload=True):
         """
         Search for similar vectors using new Qdrant API
-        
+
         Args:
             collection_name: Name of collection to search
             query_vector: List of floats (the embedding)
             limit: Number of results to return
-        
+            exclude_client_id: Leave out points with this payload client_id
+                               (filtered server-side, indexed)
+            with_payload: True for full payloads, or a list of fields to return
+
         Returns:
             List of search results with .score and .payload
         """
-        results = self.client.query_points(
+        results = await self.client.query_points(
             collection_name=collection_name,
             query=query_vector,
-            limit=limit
+            query_filter=exclude_filter(client_id=str(exclude_client_id)) if exclude_client_id is not None else None,
+            limit=limit,
+            with_payload=with_payload
         )
         return results.points
-    
-    def get_collection_info(self, collection_name):
+
+    async def get_collection_info(self, collection_name):
         """Get collection information"""
-        return self.client.get_collection(collection_name)
\ No newline at end of file
+        return await self.client.get_collection(collection_name)
@@ -0,0 +1,338 @@
+"""
+Content-addressed store for uploaded documents
+
+Uploads are parsed straight from the request body stream (no framework
+buffering): the SHA-256 and the file type (from magic bytes, not the
+client's filename or content type) are computed while the bytes are
+written to a temp file, and per-file / per-request size limits are
+enforced as they arrive. Finished files land at
+objects/<aa>/<bb>/<sha256><ext>; a file that is already stored is not
+rewritten. A small SQLite index counts the requests that stored each
+object, so rolling back a failed request never removes a file another
+request still refers to, and records which documents belong to which
+client.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from .executors import run_io
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_STORE_DIR = os.path.abspath(os.getenv(
+    "UPLOAD_STORE_DIR",
+    os.path.join(os.path.dirname(__file__), '..', 'uploads')
+))
+UPLOAD_MAX_FILE_MB = float(os.getenv("UPLOAD_MAX_FILE_MB", "20"))
+UPLOAD_MAX_REQUEST_MB = float(os.getenv("UPLOAD_MAX_REQUEST_MB", "50"))
+# Allowance for multipart boundaries, part headers and small form fields
+_FORM_OVERHEAD = 64 * 1024
+_MAX_FIELD_BYTES = 16 * 1024
+# Bytes read before the file type is decided (longest magic prefix is 8)
+_SNIFF_BYTES = 8
+
+# (magic prefix, type, extension); the extension is what downstream code keys on
+_SIGNATURES = [
+    (b"%PDF-", "pdf", ".pdf"),
+    (b"\x89PNG\r\n\x1a\n", "png", ".png"),
+    (b"\xff\xd8\xff", "jpeg", ".jpg"),
+]
+DOCUMENT_TYPES = {"pdf", "png", "jpeg"}
+IMAGE_TYPES = {"png", "jpeg"}
+
+_STORED_NAME = re.compile(r"^[0-9a-f]{64}$")
+
+
+class UploadRejected(Exception):
+    """An upload broke a size or type rule; status_code is the HTTP status to return"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def sniff_type(head: bytes) -> Optional[Dict[str, str]]:
+    for magic, kind, ext in _SIGNATURES:
+        if head.startswith(magic):
+            return {"type": kind, "ext": ext}
+    return None
+
+
+def object_path(digest: str, ext: str) -> str:
+    return os.path.join(UPLOAD_STORE_DIR, "objects", digest[:2], digest[2:4], digest + ext)
+
+
+def stored_digest(path: str) -> Optional[str]:
+    """SHA-256 of a file in the store, read from its name; None for other paths"""
+    path = os.path.abspath(path)
+    if not path.startswith(os.path.join(UPLOAD_STORE_DIR, "objects") + os.sep):
+        return None
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return stem if _STORED_NAME.match(stem) else None
+
+
+class _FilePart:
+    """One file part of a multipart body, hashed and type-checked while it is written"""
+
+    def __init__(self, tmp_dir: str, filename: str, allowed: set, max_bytes: int, file_limit: int):
+        self.filename = filename
+        self.allowed = allowed
+        self.max_bytes = max_bytes
+        self.file_limit = file_limit
+        self.tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+        self._tmp = None
+        self._sha = hashlib.sha256()
+        self._head = b""
+        self.kind = None
+        self.size = 0
+
+    def open(self):
+        self._tmp = open(self.tmp_path, "wb")
+
+    def _check_type(self):
+        self.kind = sniff_type(self._head)
+        if self.kind is None or self.kind["type"] not in self.allowed:
+            raise UploadRejected(415, f"{self.filename}: unsupported file type (allowed: {', '.join(sorted(self.allowed))})")
+
+    async def feed(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            if self.max_bytes < self.file_limit:
+                raise UploadRejected(413, f"Upload exceeds the {UPLOAD_MAX_REQUEST_MB:g} MB request limit")
+            raise UploadRejected(413, f"{self.filename} exceeds the {UPLOAD_MAX_FILE_MB:g} MB file limit")
+        if self.kind is None and len(self._head) < _SNIFF_BYTES:
+            self._head += data[:_SNIFF_BYTES - len(self._head)]
+            if len(self._head) >= _SNIFF_BYTES:
+                self._check_type()
+        self._sha.update(data)
+        await run_io(self._tmp.write, data)
+
+    async def finish(self) -> Dict[str, Any]:
+        await run_io(self._tmp.close)
+        if self.size == 0:
+            raise UploadRejected(400, f"{self.filename} is empty")
+        if self.kind is None:
+            self._check_type()
+        digest = self._sha.hexdigest()
+        path = object_path(digest, self.kind["ext"])
+        return {
+            "original_name": self.filename,
+            "saved_name": os.path.basename(path),
+            "path": path,
+            "sha256": digest,
+            "type": self.kind["type"],
+            "size": self.size
+        }
+
+    def discard(self):
+        if self._tmp is not None:
+            self._tmp.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class UploadStore:
+    """Streams multipart uploads into the store and indexes them per client"""
+
+    def __init__(self, root: str = UPLOAD_STORE_DIR):
+        self.root = root
+        self._tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self._tmp_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS client_documents ("
+            "client_id TEXT NOT NULL, sha256 TEXT NOT NULL, path TEXT NOT NULL, type TEXT NOT NULL, "
+            "original_name TEXT, uploaded_at REAL NOT NULL, PRIMARY KEY (client_id, sha256))"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS objects (path TEXT PRIMARY KEY, refs INTEGER NOT NULL)")
+
+    async def save_request(self, request, allowed: Iterable[str] = DOCUMENT_TYPES):
+        """Stream a multipart/form-data request body straight into the store
+
+        The body is read from request.stream() and parsed incrementally, so
+        nothing is buffered by the framework first and the size limits apply
+        to what the server receives. Every file part must be one of `allowed`.
+        Returns (entries, fields): one entry per stored file and the plain
+        form fields. On any rejection the files this request stored are
+        released again (see discard) and UploadRejected is raised.
+        """
+        allowed = set(allowed)
+        request_limit = int(UPLOAD_MAX_REQUEST_MB * 1024 * 1024)
+        file_limit = int(UPLOAD_MAX_FILE_MB * 1024 * 1024)
+
+        content_length = request.headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) > request_limit + _FORM_OVERHEAD:
+            raise UploadRejected(413, f"Upload exceeds the {UPLOAD_MAX_REQUEST_MB:g} MB request limit")
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise UploadRejected(400, "Expected a multipart/form-data body")
+
+        # The parser is push-based with sync callbacks; collect its events per
+        # chunk and handle them here so file writes can go to the I/O pool
+        events = []
+        parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": lambda: events.append(("begin", None)),
+            "on_header_field": lambda data, start, end: events.append(("field", data[start:end])),
+            "on_header_value": lambda data, start, end: events.append(("value", data[start:end])),
+            "on_header_end": lambda: events.append(("header_end", None)),
+            "on_headers_finished": lambda: events.append(("headers_done", None)),
+            "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+            "on_part_end": lambda: events.append(("end", None)),
+        })
+
+        entries, fields = [], {}
+        received = stored_bytes = 0
+        headers, field, value = {}, b"", b""
+        name, part, text = None, None, None
+        try:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > request_limit + _FORM_OVERHEAD:
+                    raise UploadRejected(413, f"Upload exceeds the {UPLOAD_MAX_REQUEST_MB:g} MB request limit")
+                parser.write(chunk)
+                for event, data in events:
+                    if event == "begin":
+                        headers, field, value = {}, b"", b""
+                    elif event == "field":
+                        field += data
+                    elif event == "value":
+                        value += data
+                    elif event == "header_end":
+                        headers[field.lower()] = value
+                        field, value = b"", b""
+                    elif event == "headers_done":
+                        _, options = parse_options_header(headers.get(b"content-disposition", b""))
+                        name = options.get(b"name", b"").decode("utf-8", errors="replace")
+                        filename = options.get(b"filename")
+                        if filename is not None:
+                            part = _FilePart(
+                                self._tmp_dir, filename.decode("utf-8", errors="replace"), allowed,
+                                min(file_limit, request_limit - stored_bytes), file_limit
+                            )
+                            await run_io(part.open)
+                        else:
+                            text = bytearray()
+                    elif event == "data":
+                        if part is not None:
+                            await part.feed(data)
+                        else:
+                            text += data
+                            if len(text) > _MAX_FIELD_BYTES:
+                                raise UploadRejected(413, f"Form field {name} is too large")
+                    elif event == "end":
+                        if part is not None:
+                            entry = await part.finish()
+                            entry["duplicate"] = await run_io(self._commit, part.tmp_path, entry["path"])
+                            part = None
+                            stored_bytes += entry["size"]
+                            entries.append(entry)
+                        else:
+                            fields[name] = text.decode("utf-8", errors="replace")
+                events.clear()
+            parser.finalize()
+        except BaseException:
+            if part is not None:
+                await run_io(part.discard)
+            await run_io(self.discard, entries)
+            raise
+        return entries, fields
+
+    def discard(self, entries: List[Dict[str, Any]]):
+        """Release the files a failed request stored; a file is removed only
+        once no other request refers to it"""
+        with self._lock:
+            # IMMEDIATE serializes with _commit() across worker processes
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for entry in entries:
+                    path = entry["path"]
+                    row = self._db.execute("SELECT refs FROM objects WHERE path = ?", (path,)).fetchone()
+                    if row is not None and row[0] > 1:
+                        self._db.execute("UPDATE objects SET refs = refs - 1 WHERE path = ?", (path,))
+                        continue
+                    self._db.execute("DELETE FROM objects WHERE path = ?", (path,))
+                    if row is not None and os.path.exists(path):
+                        try:
+                            os.remove(path)
+                        except OSError as e:
+                            logger.warning(f"Could not remove {path}: {e}")
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _commit(self, tmp_path: str, path: str) -> bool:
+        """Move a finished temp file into place and take a reference to it;
+        True if the content was already stored"""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                duplicate = os.path.exists(path)
+                if duplicate:
+                    os.remove(tmp_path)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(tmp_path, path)
+                # A stored file with no row predates the count: keep a reference for it
+                self._db.execute(
+                    "INSERT INTO objects (path, refs) VALUES (?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET refs = refs + 1",
+                    (path, 2 if duplicate else 1)
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return duplicate
+
+    def link_client(self, client_id: str, entries: List[Dict[str, Any]]):
+        """Record that stored documents belong to a client"""
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO client_documents "
+                "(client_id, sha256, path, type, original_name, uploaded_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(client_id, e["sha256"], e["path"], e["type"], e["original_name"], now) for e in entries]
+            )
+
+    def documents_for(self, client_id: str, types: Iterable[str] = DOCUMENT_TYPES) -> List[str]:
+        """Paths of a client's stored documents, oldest first"""
+        types = list(types)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT path FROM client_documents WHERE client_id = ? AND type IN ({','.join('?' * len(types))}) "
+                "ORDER BY uploaded_at",
+                (client_id, *types)
+            ).fetchall()
+        return [row[0] for row in rows if os.path.exists(row[0])]
+
+
+# ========= SINGLETON =========
+
+_upload_store = None
+_upload_store_lock = threading.Lock()
+
+
+def get_upload_store() -> UploadStore:
+    global _upload_store
+    if _upload_store is None:
+        with _upload_store_lock:
+            if _upload_store is None:
+                _upload_store = UploadStore()
+    return _upload_store
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the backend the way main.py does (`from services.x import ...`)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+@pytest.fixture
+def stub_llm():
+    from tests.stub_llm import StubLLM
+
+    stub = StubLLM().start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def oracle(stub_llm, tmp_path, monkeypatch):
+    """A real CreditOracle talking to the stub, with a fresh explanation cache"""
+    pytest.importorskip("google.generativeai")
+    from services import credit_oracle, explanation_cache
+
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    monkeypatch.setattr(credit_oracle, "ORACLE_API_ENDPOINT", stub_llm.endpoint)
+    monkeypatch.setattr(
+        explanation_cache, "_explanation_cache",
+        explanation_cache.ExplanationCache(path=str(tmp_path / "explanations.sqlite"))
+    )
+    instance = credit_oracle.CreditOracle()
+    assert instance.enabled
+    return instance
@@ -0,0 +1,105 @@
+"""
+Local stand-in for the Gemini REST API, for oracle tests
+
+Serves generateContent and streamGenerateContent on 127.0.0.1 so a real
+CreditOracle (REST transport, ORACLE_API_ENDPOINT pointed here) can be
+exercised without network access. Chunks, delays and failures are set per
+test; the server records how many requests ran at once.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _response(text):
+    return {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}]}
+
+
+class StubLLM(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.chunks = ["We found similar clients. ", "Most of them repaid."]
+        self.first_chunk_delay = 0.0
+        self.chunk_delay = 0.0
+        self.status = 200
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        stub = self.server
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with stub._lock:
+            stub.requests += 1
+            stub.active += 1
+            stub.max_active = max(stub.max_active, stub.active)
+        try:
+            if stub.status != 200:
+                body = json.dumps({"error": {"code": stub.status, "message": "stub failure", "status": "INTERNAL"}}).encode()
+                self.send_response(stub.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            time.sleep(stub.first_chunk_delay)
+            if ":streamGenerateContent" not in self.path:
+                body = json.dumps(_response("".join(stub.chunks))).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            # REST streaming: one JSON array, written element by element
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            parts = ["["]
+            for i, text in enumerate(stub.chunks):
+                if i:
+                    time.sleep(stub.chunk_delay)
+                    parts = [","]
+                parts.append(json.dumps(_response(text)))
+                self._write_chunk("".join(parts))
+                parts = []
+            self._write_chunk("]")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with stub._lock:
+                stub.active -= 1
+
+    def _write_chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
@@ -0,0 +1,77 @@
+"""/search/similar/batch keeps streaming past applicants that cannot be embedded"""
+
+import json
+from types import SimpleNamespace
+
+import httpx
+import numpy as np
+import pytest
+
+from services import embeddings
+from api.routers import search
+
+
+class _StubQdrant:
+    """Answers every query with one repaid neighbour and records the batch sizes"""
+
+    def __init__(self):
+        self.batches = []
+        self.client = self
+
+    async def query_batch_points(self, collection_name, requests):
+        self.batches.append(len(requests))
+        point = SimpleNamespace(score=0.9, payload={"client_id": "C-9", "actual_outcome": "REPAID"})
+        return [SimpleNamespace(points=[point]) for _ in requests]
+
+
+@pytest.fixture
+def stub_qdrant(monkeypatch):
+    # Skip the sentence transformer: the text block does not matter here
+    monkeypatch.setattr(
+        embeddings, "get_archetype_features",
+        lambda archetype: np.ones(embeddings.TEXT_FEATURE_DIM, dtype=np.float32)
+    )
+    stub = _StubQdrant()
+    monkeypatch.setattr(search, "qdrant", stub)
+    return stub
+
+
+async def _post(payload):
+    from fastapi import FastAPI
+
+    app = FastAPI()
+    app.include_router(search.router)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.post("/search/similar/batch", json=payload)
+    return response.status_code, [json.loads(line) for line in response.text.splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_bad_applicant_gets_an_error_line(stub_qdrant):
+    applicants = [
+        {"client_id": "A", "client_data": {"archetype": "teacher", "debt_ratio": 0.2}},
+        {"client_id": "B", "client_data": {"archetype": "teacher", "debt_ratio": None}},
+        {"client_id": "C", "client_data": {"archetype": "gig_worker", "debt_ratio": 0.6}},
+    ]
+
+    status, lines = await _post({"applicants": applicants})
+
+    assert status == 200
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert [line["client_id"] for line in lines] == ["A", "B", "C"]
+    assert "error" in lines[1] and "risk_level" not in lines[1]
+    assert lines[0]["risk_level"] == lines[2]["risk_level"] == "LOW"
+    # Only the applicants that embedded are searched
+    assert stub_qdrant.batches == [2]
+
+
+@pytest.mark.asyncio
+async def test_all_bad_applicants_skip_the_search(stub_qdrant):
+    status, lines = await _post({"applicants": [
+        {"client_id": "B", "client_data": {"debt_ratio": "n/a"}}
+    ]})
+
+    assert status == 200
+    assert lines[0]["client_id"] == "B" and "error" in lines[0]
+    assert stub_qdrant.batches == []
@@ -0,0 +1,31 @@
+"""Text-layer template signatures and the no-templates short circuit"""
+
+from services import document_text
+
+
+def test_no_templates_skips_extraction(tmp_path, monkeypatch):
+    missing = str(tmp_path / "templates.json")
+    monkeypatch.setattr(document_text, "load_templates", lambda path=missing: [])
+
+    def fail(*args, **kwargs):
+        raise AssertionError("poppler must not run without templates")
+
+    monkeypatch.setattr(document_text, "_poppler", fail)
+
+    assert not document_text.has_templates(missing)
+    assert document_text.check_text_layer("statement.pdf") == {"status": document_text.SKIPPED}
+
+
+def test_signature_ignores_filled_in_values():
+    def layer(name, balance):
+        return {
+            "text": f"Titulaire: {name}\nSolde au 12/03/2025: {balance} TND\n",
+            "fonts": [{"name": "Helvetica", "embedded": True}],
+            "producer": "ReportLab",
+            "creator": ""
+        }
+
+    assert document_text.template_signature(layer("Amine", "1 200,000")) == \
+        document_text.template_signature(layer("Salma", "87,500"))
+    assert document_text.template_signature(layer("Amine", "1")) != \
+        document_text.template_signature({**layer("Amine", "1"), "producer": "Microsoft Word"})
@@ -0,0 +1,47 @@
+"""Image embedding cache shared by several workers"""
+
+import threading
+
+import numpy as np
+
+from services.embedding_cache import EmbeddingCache
+
+# 4 slots of 256 KB: eviction and slot reuse on almost every put
+DIM = 64 * 1024
+
+
+def test_get_never_returns_another_digests_vector(tmp_path):
+    # Two instances on one directory stand in for two worker processes:
+    # they share the index and the memmap but not the thread lock
+    workers = [EmbeddingCache(str(tmp_path), dim=DIM, max_mb=1) for _ in range(2)]
+    assert workers[0].capacity == 4
+    wrong = []
+
+    def churn(cache, seed):
+        rng = np.random.default_rng(seed)
+        for _ in range(150):
+            value = int(rng.integers(10))
+            if rng.random() < 0.5:
+                cache.put(f"digest-{value}", "page", np.full(DIM, value, dtype=np.float32))
+            else:
+                vector = cache.get(f"digest-{value}", "page")
+                if vector is not None and not np.all(vector == value):
+                    wrong.append(value)
+
+    threads = [threading.Thread(target=churn, args=(cache, seed)) for seed, cache in enumerate(workers * 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert wrong == []
+    assert sum(cache.hits for cache in workers) > 0
+
+
+def test_evicted_key_is_a_miss(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dim=DIM, max_mb=1)
+    for value in range(cache.capacity + 1):
+        cache.put(f"digest-{value}", "page", np.full(DIM, value, dtype=np.float32))
+
+    assert cache.get("digest-0", "page") is None
+    assert np.all(cache.get(f"digest-{cache.capacity}", "page") == cache.capacity)
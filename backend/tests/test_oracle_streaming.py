@@ -0,0 +1,145 @@
+"""
+Streamed oracle explanations against a local stub of the Gemini REST API
+(tests/stub_llm.py): chunk streaming, the per-call deadline, the
+concurrency limit, the canned fallback and the SSE endpoint.
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from services import credit_oracle
+
+CLIENT = {"archetype": "market_vendor", "employment_type": "informal", "years_active": 6, "debt_ratio": 0.3}
+
+
+def collect(oracle, client=CLIENT, decision="approve", confidence=0.8):
+    async def run():
+        return [chunk async for chunk in oracle.stream_decision(
+            client_data=client, similar_clients=[], decision=decision,
+            confidence=confidence, repaid_count=8, total_count=10
+        )]
+    return asyncio.run(run())
+
+
+def test_stream_decision_returns_model_text(oracle, stub_llm):
+    chunks = collect(oracle)
+
+    assert "".join(chunks) == "We found similar clients. Most of them repaid."
+    assert stub_llm.requests == 1
+
+
+def test_repeat_prompt_is_served_from_cache(oracle, stub_llm):
+    first = collect(oracle)
+    second = collect(oracle)
+
+    assert "".join(second) == "".join(first).strip()
+    assert stub_llm.requests == 1
+
+
+def test_deadline_falls_back_to_canned_text(oracle, stub_llm, monkeypatch):
+    monkeypatch.setattr(credit_oracle, "ORACLE_TIMEOUT", 0.5)
+    stub_llm.first_chunk_delay = 3.0
+
+    started = time.monotonic()
+    chunks = collect(oracle)
+
+    assert time.monotonic() - started < 2.0
+    assert chunks == [oracle._fallback_explanation("approve", 0.8)]
+    assert oracle._semaphore._value == credit_oracle.ORACLE_MAX_CONCURRENCY
+
+
+def test_model_error_falls_back_to_canned_text(oracle, stub_llm):
+    stub_llm.status = 500
+
+    assert collect(oracle, decision="reject", confidence=0.3) == [oracle._fallback_explanation("reject", 0.3)]
+
+
+def test_disabled_oracle_uses_canned_text(monkeypatch, stub_llm):
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+    oracle = credit_oracle.CreditOracle()
+
+    assert not oracle.enabled
+    assert collect(oracle) == [oracle._fallback_explanation("approve", 0.8)]
+    assert stub_llm.requests == 0
+
+
+def test_concurrency_limit(oracle, stub_llm, monkeypatch):
+    monkeypatch.setattr(credit_oracle, "ORACLE_MAX_CONCURRENCY", 2)
+    stub_llm.first_chunk_delay = 0.3
+
+    async def run():
+        # Distinct debt ratios so every call is a separate prompt (no coalescing)
+        clients = [dict(CLIENT, debt_ratio=0.1 * i) for i in range(5)]
+        return await asyncio.gather(*[
+            _join(oracle.stream_decision(client_data=c, similar_clients=[], decision="approve",
+                                         confidence=0.8, repaid_count=8, total_count=10))
+            for c in clients
+        ])
+
+    texts = asyncio.run(run())
+
+    assert stub_llm.requests == 5
+    assert stub_llm.max_active == 2
+    assert all(text.startswith("We found") for text in texts)
+    assert oracle._semaphore._value == 2
+
+
+def test_abandoned_stream_releases_its_slot(oracle, stub_llm):
+    stub_llm.chunks = ["one ", "two ", "three"]
+    stub_llm.chunk_delay = 0.2
+
+    async def run():
+        stream = oracle.stream_decision(client_data=CLIENT, similar_clients=[], decision="approve",
+                                        confidence=0.8, repaid_count=8, total_count=10)
+        await stream.__anext__()
+        await stream.aclose()
+        return oracle._semaphore._value
+
+    assert asyncio.run(run()) == credit_oracle.ORACLE_MAX_CONCURRENCY
+
+
+async def _join(chunks):
+    return "".join([chunk async for chunk in chunks])
+
+
+def test_explanation_sse_endpoint(oracle, stub_llm, monkeypatch):
+    httpx = pytest.importorskip("httpx")
+    fastapi = pytest.importorskip("fastapi")
+    from services import explanations
+    from api.routers import search
+
+    monkeypatch.setattr(explanations, "_store", None)
+    stub_llm.chunks = ["We found ", "eight of ten ", "similar clients repaid."]
+    app = fastapi.FastAPI()
+    app.include_router(search.router)
+
+    async def run():
+        explanation_id = explanations.get_explanation_store().start(oracle.stream_decision(
+            client_data=CLIENT, similar_clients=[], decision="approve",
+            confidence=0.8, repaid_count=8, total_count=10
+        ))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            stream = await client.get(f"/search/explanations/{explanation_id}/stream")
+            status = await client.get(f"/search/explanations/{explanation_id}")
+            missing = await client.get("/search/explanations/unknown/stream")
+        return stream, status, missing
+
+    stream, status, missing = asyncio.run(run())
+
+    assert stream.status_code == 200
+    assert stream.headers["content-type"].startswith("text/event-stream")
+    events = [block for block in stream.text.split("\n\n") if block]
+    assert events[-1] == "event: done\ndata: {}"
+    chunks = [json.loads(block[len("data: "):]) for block in events[:-1]]
+    assert "".join(chunks) == "We found eight of ten similar clients repaid."
+
+    assert status.json() == {
+        "explanation_id": status.json()["explanation_id"],
+        "status": "done",
+        "oracle_explanation": "We found eight of ten similar clients repaid."
+    }
+    assert missing.status_code == 404
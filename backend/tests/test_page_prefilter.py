@@ -0,0 +1,88 @@
+"""The perceptual-hash prefilter also runs for pages whose vector is cached"""
+
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+from api.routers import applications
+from services.embedding_cache import EmbeddingCache
+from services.perceptual_hash import PerceptualIndex
+
+DIGEST = "ab" * 32
+FAKE = {"phash": "f0f0f0f0f0f0f0f0", "dhash": "0f0f0f0f0f0f0f0f"}
+GENUINE = {"phash": "0123456789abcdef", "dhash": "fedcba9876543210"}
+
+
+@pytest.fixture
+def image_cache(tmp_path, monkeypatch):
+    cache = EmbeddingCache(str(tmp_path), dim=8, max_mb=1)
+    monkeypatch.setattr(applications, "get_image_cache", lambda: cache)
+
+    # A fake ingested after the document was first analyzed
+    index = PerceptualIndex()
+    index._tree.add(int(FAKE["phash"], 16), {"id": 7, "dhash": int(FAKE["dhash"], 16), "filename": "fake_7.png"})
+    index._loaded_at = time.monotonic()
+    monkeypatch.setattr(applications, "get_perceptual_index", lambda: index)
+
+    def no_clip(images):
+        raise AssertionError("CLIP must not run for cached pages")
+
+    monkeypatch.setattr(applications, "get_document_vectors", no_clip)
+    return cache
+
+
+def _cache_page(cache, hashes=None):
+    variant = applications._page_cache_variant(1)
+    cache.put(DIGEST, variant, np.ones(8, dtype=np.float32))
+    if hashes is not None:
+        cache.put_hashes(DIGEST, variant, hashes)
+
+
+def _no_render(monkeypatch):
+    def fail():
+        raise AssertionError("a page with cached hashes must not be rendered")
+
+    monkeypatch.setattr(applications, "get_cpu_pool", fail)
+
+
+def test_cached_page_is_matched_against_new_fakes(image_cache, monkeypatch):
+    _cache_page(image_cache, FAKE)
+    _no_render(monkeypatch)
+
+    vectors, match = applications._page_vectors("statement.pdf", DIGEST, [1], True)
+
+    assert vectors is None
+    assert match[0] == 1 and match[1]["filename"] == "fake_7.png"
+
+
+def test_cached_page_without_a_match_keeps_its_vector(image_cache, monkeypatch):
+    _cache_page(image_cache, GENUINE)
+    _no_render(monkeypatch)
+
+    vectors, match = applications._page_vectors("statement.pdf", DIGEST, [1], True)
+
+    assert match is None
+    assert vectors.shape == (1, 8)
+
+
+def test_page_cached_without_hashes_is_hashed_once(image_cache, monkeypatch):
+    _cache_page(image_cache)
+    rendered = []
+
+    class Pool:
+        def submit(self, fn, path, pages, **kwargs):
+            rendered.append(pages)
+            future = Future()
+            future.set_result([f"image of page {page}" for page in pages])
+            return future
+
+    monkeypatch.setattr(applications, "get_cpu_pool", lambda: Pool())
+    monkeypatch.setattr(applications, "image_hashes", lambda image: GENUINE)
+
+    vectors, match = applications._page_vectors("statement.pdf", DIGEST, [1], True)
+
+    assert match is None and vectors.shape == (1, 8)
+    assert rendered == [[1]]
+    assert image_cache.get_hashes(DIGEST, applications._page_cache_variant(1)) == GENUINE
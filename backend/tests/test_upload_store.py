@@ -0,0 +1,89 @@
+"""Rolling back a rejected upload must not remove files other requests use"""
+
+import hashlib
+import os
+
+import pytest
+
+pytest.importorskip("python_multipart")
+
+from services import upload_store
+
+BOUNDARY = "vectorcm"
+PDF = b"%PDF-1.4\n" + b"statement " * 100
+
+
+def _part(filename: str, content: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="files"; filename="{filename}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + content + b"\r\n"
+
+
+class _Request:
+    """The parts of a Starlette request save_request reads; `pause` runs between chunks"""
+
+    def __init__(self, chunks, pause=None):
+        self.headers = {"content-type": f"multipart/form-data; boundary={BOUNDARY}"}
+        self._chunks = chunks
+        self._pause = pause
+
+    async def stream(self):
+        for i, chunk in enumerate(self._chunks):
+            if i and self._pause is not None:
+                await self._pause()
+            yield chunk
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_store, "UPLOAD_STORE_DIR", str(tmp_path))
+    return upload_store.UploadStore(root=str(tmp_path))
+
+
+@pytest.mark.asyncio
+async def test_rollback_keeps_a_file_a_concurrent_request_stored(store):
+    closing = f"--{BOUNDARY}--\r\n".encode()
+    accepted = []
+
+    async def upload_same_pdf():
+        entries, _ = await store.save_request(_Request([_part("copy.pdf", PDF) + closing]))
+        accepted.extend(entries)
+
+    # Request A stores the PDF first, request B stores the same bytes while A
+    # is still streaming, then A's second file is rejected
+    # (a part is committed once the next boundary arrives, so split after it)
+    body = _part("statement.pdf", PDF) + _part("notes.txt", b"plain text!") + closing
+    split = body.index(f"--{BOUNDARY}".encode(), 1) + len(BOUNDARY) + 4
+    rejected = _Request([body[:split], body[split:]], pause=upload_same_pdf)
+    with pytest.raises(upload_store.UploadRejected) as e:
+        await store.save_request(rejected)
+
+    assert e.value.status_code == 415
+    assert accepted[0]["duplicate"]
+    assert os.path.exists(accepted[0]["path"])
+
+
+@pytest.mark.asyncio
+async def test_rollback_removes_a_file_only_it_stored(store):
+    closing = f"--{BOUNDARY}--\r\n".encode()
+    request = _Request([_part("statement.pdf", PDF), _part("notes.txt", b"plain text!") + closing])
+
+    with pytest.raises(upload_store.UploadRejected):
+        await store.save_request(request)
+
+    digest = hashlib.sha256(PDF).hexdigest()
+    assert not os.path.exists(upload_store.object_path(digest, ".pdf"))
+    assert os.listdir(os.path.join(store.root, "tmp")) == []
+
+
+@pytest.mark.asyncio
+async def test_rollback_keeps_content_stored_before(store):
+    closing = f"--{BOUNDARY}--\r\n".encode()
+    first, _ = await store.save_request(_Request([_part("statement.pdf", PDF) + closing]))
+
+    with pytest.raises(upload_store.UploadRejected):
+        await store.save_request(_Request([_part("again.pdf", PDF), _part("notes.txt", b"plain text!") + closing]))
+
+    assert os.path.exists(first[0]["path"])
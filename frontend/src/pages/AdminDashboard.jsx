@@ -4,7 +4,7 @@ import { useQuery } from '@tanstack/react-query';
 import { Link } from 'react-router-dom';
 import { ArrowLeft, CheckCircle, XCircle } from 'lucide-react';
 import { Search, Users, TrendingUp } from 'lucide-react';
-import { searchSimilar, getStats } from '../services/api';
+import { searchSimilar, searchSimilarExisting, getStats, streamExplanation } from '../services/api';
 import { useEffect } from 'react';
 import axios from 'axios';
 import CounterfactualEngine from '../components/CounterfactualEngine';
@@ -20,16 +20,23 @@ export default function Dashboard() {
   const [selectedApp, setSelectedApp] = useState(null);
   const [declineReason, setDeclineReason] = useState('');
   const [showDeclineModal, setShowDeclineModal] = useState(false);
+  const [oracleText, setOracleText] = useState('');
   
   // Search query
   const { data: searchResults, isLoading, refetch, error: searchError } = useQuery({
     queryKey: ['search', selectedClientId],
-    queryFn: () => {
+    queryFn: async () => {
       const appToSearch = applications.find(app => app.client_id === selectedClientId);
       if (!appToSearch) {
         console.warn('No application found for client:', selectedClientId);
         return null;
       }
+      // Clients already in credit history are searched by their stored vector
+      try {
+        return await searchSimilarExisting(selectedClientId, 50);
+      } catch (err) {
+        if (err.response?.status !== 404) throw err;
+      }
       return searchSimilar({
         archetype: appToSearch.archetype || 'market_vendor',
         debt_ratio: appToSearch.debt_ratio || 0.45,
@@ -43,6 +50,15 @@ export default function Dashboard() {
     retry: 1
   });
   
+  // Oracle explanation streams in after the search results
+  useEffect(() => {
+    setOracleText('');
+    if (!searchResults?.explanation_id) return;
+    return streamExplanation(searchResults.explanation_id, (chunk) => {
+      setOracleText((text) => text + chunk);
+    });
+  }, [searchResults?.explanation_id]);
+  
   // Stats query
   const { data: stats } = useQuery({
     queryKey: ['stats'],
@@ -406,14 +422,14 @@ export default function Dashboard() {
               </div>
 
               {/* Oracle Explanation */}
-              {searchResults.oracle_explanation && (
+              {(oracleText || searchResults.oracle_explanation) && (
                 <div className="mb-8 p-6 bg-gradient-to-r from-blue-600/10 to-blue-500/10 rounded-lg border border-blue-400/30">
                   <div className="flex items-start gap-4">
                     <div className="text-3xl flex-shrink-0">✨</div>
                     <div className="flex-1 min-w-0">
                       <h4 className="font-semibold text-blue-300 mb-2 text-lg">Credit Oracle Insight</h4>
                       <p className="text-slate-300 leading-relaxed break-words whitespace-pre-wrap">
-                        {searchResults.oracle_explanation}
+                        {oracleText || searchResults.oracle_explanation}
                       </p>
                     </div>
                   </div>
@@ -18,6 +18,30 @@ export const searchSimilar = async (clientData, topK = 50, clientId = null) => {
   return response.data;
 };
 
+// Similar clients for a client already in credit history, using its stored vector
+export const searchSimilarExisting = async (clientId, topK = 50) => {
+  const response = await api.post('/search/similar/existing', {
+    client_id: clientId,
+    top_k: topK
+  });
+  return response.data;
+};
+
+// Stream the oracle explanation for a search; returns a function that stops the stream
+export const streamExplanation = (explanationId, onChunk, onDone) => {
+  const source = new EventSource(`${API_BASE}/search/explanations/${explanationId}/stream`);
+  source.onmessage = (event) => onChunk(JSON.parse(event.data));
+  source.addEventListener('done', () => {
+    source.close();
+    if (onDone) onDone();
+  });
+  source.onerror = () => {
+    source.close();
+    if (onDone) onDone();
+  };
+  return () => source.close();
+};
+
 export const getStats = async () => {
   const response = await api.get('/search/stats');
   return response.data;
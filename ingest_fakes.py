@@ -4,11 +4,12 @@ import glob
 import torch
 from PIL import Image
 from qdrant_client.models import Distance, VectorParams, PointStruct
-from transformers import CLIPProcessor, CLIPModel
 
 # Add backend to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
-from backend.services.qdrant_manager import QdrantManager
+from backend.services.qdrant_manager import get_sync_client
+from backend.services.model_registry import get_model, memory_report
+from backend.services.perceptual_hash import image_hashes
 
 # --- CONFIGURATION ---
 FAKE_DIR = "backend/doc_check/dataset/fakes"
@@ -17,14 +18,11 @@ COLLECTION_NAME = "document_risk_engine"
 
 def main():
     print("--- 1. Initializing Models ---")
-    # Load CLIP (The "Eye" that turns images into vectors)
-    model_id = "openai/clip-vit-base-patch32"
-    model = CLIPModel.from_pretrained(model_id)
-    processor = CLIPProcessor.from_pretrained(model_id)
+    # Load CLIP (The "Eye" that turns images into vectors) from the shared registry
+    model, processor = get_model("clip")
     
-    # Initialize Qdrant Manager
-    qdrant_manager = QdrantManager()
-    client = qdrant_manager.client   
+    # Shared sync Qdrant client (host/port from QDRANT_* env vars)
+    client = get_sync_client()
     # --- 2. Create Collection (Reset if exists) ---
     print(f"--- 2. Creating Collection: {COLLECTION_NAME} ---")
     client.recreate_collection(
@@ -77,7 +75,9 @@ def main():
                     "filename": filename,
                     "label": "fake",
                     "type": "generated_fraud_template",
-                    "risk_score": 1.0
+                    "risk_score": 1.0,
+                    # pHash / dHash for the pre-CLIP prefilter
+                    **image_hashes(image)
                 }
             )
             points.append(point)
@@ -99,5 +99,9 @@ def main():
     else:
         print("❌ No points to upload.")
 
+    for m in memory_report()["models"]:
+        if m["loaded"]:
+            print(f"   Model {m['name']}: {m['memory_mb']} MB resident")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
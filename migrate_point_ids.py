@@ -0,0 +1,118 @@
+"""
+One-shot migration to deterministic point ids
+
+Rewrites every point in credit_history_memory, temporal_risk_memory and
+fraud_patterns under its UUIDv5 id (see point_id_for) and deletes the old
+integer id, then gives credit history points without a `date` one (their
+T0 snapshot date, else now) so the pending listing can order by it.
+Safe to re-run: points already on their derived id are skipped.
+"""
+
+from datetime import datetime
+from qdrant_client.models import PointStruct, PointIdsList, Filter, IsEmptyCondition, PayloadField
+from backend.services.qdrant_manager import get_sync_client, point_id_for, ensure_payload_indexes
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 256
+
+
+def derived_id(collection, payload):
+    """New id for a point, or None if the payload lacks its key"""
+    if collection == "temporal_risk_memory":
+        if payload.get('client_id') and payload.get('timestamp'):
+            return point_id_for(payload['client_id'], payload['timestamp'])
+        return None
+    if collection == "fraud_patterns":
+        return point_id_for(payload['fraud_id']) if payload.get('fraud_id') else None
+    return point_id_for(payload['client_id']) if payload.get('client_id') else None
+
+
+def migrate_collection(client, collection):
+    # Collect first: rewriting while scrolling would revisit moved points
+    moves = []
+    offset = None
+    while True:
+        batch, offset = client.scroll(
+            collection_name=collection,
+            limit=BATCH_SIZE,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        for point in batch:
+            new_id = derived_id(collection, point.payload or {})
+            if new_id is None:
+                logger.warning(f"  {collection}: point {point.id} has no key, left as is")
+            elif str(point.id) != new_id:
+                moves.append((point, new_id))
+        if offset is None:
+            break
+
+    seen = set()
+    for start in range(0, len(moves), BATCH_SIZE):
+        chunk = moves[start:start + BATCH_SIZE]
+        for _, new_id in chunk:
+            if new_id in seen:
+                logger.warning(f"  {collection}: duplicate key for {new_id}, last point wins")
+            seen.add(new_id)
+        client.upsert(
+            collection_name=collection,
+            points=[PointStruct(id=new_id, vector=point.vector, payload=point.payload) for point, new_id in chunk]
+        )
+        client.delete(
+            collection_name=collection,
+            points_selector=PointIdsList(points=[point.id for point, _ in chunk])
+        )
+
+    logger.info(f"  ✅ {collection}: moved {len(moves)} points")
+
+
+def backfill_dates(client):
+    undated = Filter(must=[IsEmptyCondition(is_empty=PayloadField(key="date"))])
+    filled = 0
+    while True:
+        # Each pass sets `date`, so the filter shrinks until nothing is left
+        batch, _ = client.scroll(
+            collection_name="credit_history_memory",
+            scroll_filter=undated,
+            limit=BATCH_SIZE,
+            with_payload=["client_id"],
+            with_vectors=False
+        )
+        if not batch:
+            break
+        t0_points = client.retrieve(
+            collection_name="temporal_risk_memory",
+            ids=[point_id_for(p.payload.get('client_id', ''), 'T0_application') for p in batch],
+            with_payload=["client_id", "date"]
+        )
+        t0_dates = {p.payload.get('client_id'): p.payload.get('date') for p in t0_points}
+        now = datetime.utcnow().isoformat()
+        for point in batch:
+            date = t0_dates.get(point.payload.get('client_id')) or now
+            client.set_payload(
+                collection_name="credit_history_memory",
+                payload={'date': date},
+                points=[point.id]
+            )
+        filled += len(batch)
+
+    logger.info(f"  ✅ credit_history_memory: dated {filled} points")
+
+
+def main():
+    client = get_sync_client()
+    existing = {c.name for c in client.get_collections().collections}
+    for collection in ['credit_history_memory', 'temporal_risk_memory', 'fraud_patterns']:
+        if collection in existing:
+            migrate_collection(client, collection)
+    if 'credit_history_memory' in existing:
+        backfill_dates(client)
+    ensure_payload_indexes(client)
+
+
+if __name__ == "__main__":
+    main()
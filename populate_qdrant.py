@@ -1,8 +1,7 @@
-from qdrant_client import QdrantClient
 from qdrant_client.models import Distance, VectorParams, PointStruct
 import pandas as pd
-import numpy as np
-from backend.services.embeddings import create_embedding
+from backend.services.embeddings import create_embeddings
+from backend.services.qdrant_manager import get_sync_client, ensure_payload_indexes, point_id_for
 import logging
 import json
 
@@ -17,7 +16,7 @@ def populate_ultimate_dataset():
     logger.info("="*70)
     
     # Connect to Qdrant
-    client = QdrantClient(host="localhost", port=6333)
+    client = get_sync_client()
     
     # Delete old collections
     collections = ['credit_history_memory', 'fraud_patterns', 'temporal_risk_memory']
@@ -58,6 +57,9 @@ def populate_ultimate_dataset():
         )
     )
     logger.info("  ✅ Created temporal_risk_memory")
+
+    # Indexes for client_id / outcome / timestamp lookups and date ordering
+    ensure_payload_indexes(client)
     
     # Load clients
     logger.info("\n📊 Loading client data...")
@@ -67,19 +69,14 @@ def populate_ultimate_dataset():
     # Populate credit_history_memory
     logger.info("\n💾 Populating credit_history_memory...")
     
+    # Embed all clients in one vectorized call (rows are L2 normalized)
+    vectors = create_embeddings(clients_df)
+    
     points = []
-    for idx, row in clients_df.iterrows():
-        # Create embedding
-        vector = create_embedding(row)
-        
-        # Verify normalization
-        norm = np.linalg.norm(vector)
-        if abs(norm - 1.0) > 0.01:
-            vector = vector / norm
-        
+    for (idx, row), vector in zip(clients_df.iterrows(), vectors):
         # Create point
         point = PointStruct(
-            id=idx,
+            id=point_id_for(row['client_id']),
             vector=vector.tolist(),
             payload={
                 'client_id': row['client_id'],
@@ -95,6 +92,7 @@ def populate_ultimate_dataset():
                 'outcome': row['outcome'],
                 'actual_outcome': row['actual_outcome'],
                 'location': row['location'],
+                'date': row['application_date'],
                 'social_network': row['social_network']  # For Trust Rings
             }
         )
@@ -116,8 +114,8 @@ def populate_ultimate_dataset():
     # Populate temporal_risk_memory
     logger.info("\n⏰ Populating temporal_risk_memory...")
     
-    temporal_points = []
-    temporal_id = 0
+    temporal_records = []
+    temporal_payloads = []
     
     for idx, row in clients_df.iterrows():
         if row['outcome'] != 'approved':
@@ -129,41 +127,45 @@ def populate_ultimate_dataset():
         except:
             continue
         
-        # Create point for each snapshot
+        # Collect one record per snapshot
         for snapshot in snapshots:
-            temp_data = {
+            temporal_records.append({
                 'archetype': row['archetype'],
                 'debt_ratio': snapshot['debt_ratio'],
                 'years_active': row['years_active'],
                 'income_stability': snapshot['income_stability'],
                 'payment_regularity': snapshot['payment_regularity'],
                 'monthly_income': row['monthly_income']
-            }
-            
-            vector = create_embedding(temp_data)
-            vector = vector / np.linalg.norm(vector)
-            
-            point = PointStruct(
-                id=temporal_id,
-                vector=vector.tolist(),
-                payload={
-                    'client_id': row['client_id'],
-                    'timestamp': snapshot['timestamp'],
-                    'date': snapshot['date'],
-                    'risk_score': snapshot['risk_score'],
-                    'status': snapshot['status'],
-                    'debt_ratio': snapshot['debt_ratio'],
-                    'income_stability': snapshot['income_stability'],
-                    'payment_regularity': snapshot['payment_regularity']
-                }
-            )
-            temporal_points.append(point)
-            temporal_id += 1
-            
-            if len(temporal_points) >= 100:
-                client.upsert(collection_name="temporal_risk_memory", points=temporal_points)
-                logger.info(f"  Uploaded {len(temporal_points)} temporal points")
-                temporal_points = []
+            })
+            temporal_payloads.append({
+                'client_id': row['client_id'],
+                'timestamp': snapshot['timestamp'],
+                'date': snapshot['date'],
+                'risk_score': snapshot['risk_score'],
+                'status': snapshot['status'],
+                'debt_ratio': snapshot['debt_ratio'],
+                'income_stability': snapshot['income_stability'],
+                'payment_regularity': snapshot['payment_regularity']
+            })
+    
+    temporal_vectors = create_embeddings(temporal_records)
+    
+    temporal_points = []
+    temporal_id = 0
+    
+    for vector, payload in zip(temporal_vectors, temporal_payloads):
+        point = PointStruct(
+            id=point_id_for(payload['client_id'], payload['timestamp']),
+            vector=vector.tolist(),
+            payload=payload
+        )
+        temporal_points.append(point)
+        temporal_id += 1
+        
+        if len(temporal_points) >= 100:
+            client.upsert(collection_name="temporal_risk_memory", points=temporal_points)
+            logger.info(f"  Uploaded {len(temporal_points)} temporal points")
+            temporal_points = []
     
     if temporal_points:
         client.upsert(collection_name="temporal_risk_memory", points=temporal_points)
@@ -176,13 +178,12 @@ def populate_ultimate_dataset():
     frauds_df = pd.read_csv('data/synthetic_frauds_ultimate.csv')
     logger.info(f"  Loaded {len(frauds_df)} fraud patterns")
     
+    fraud_vectors = create_embeddings(frauds_df)
+    
     fraud_points = []
-    for idx, row in frauds_df.iterrows():
-        vector = create_embedding(row)
-        vector = vector / np.linalg.norm(vector)
-        
+    for (idx, row), vector in zip(frauds_df.iterrows(), fraud_vectors):
         point = PointStruct(
-            id=idx + 10000,  # Offset to avoid collision
+            id=point_id_for(row['fraud_id']),
             vector=vector.tolist(),
             payload={
                 'fraud_id': row['fraud_id'],